@@ -0,0 +1,15 @@
+from ukrdc_fastapi.dependencies.database import ukrdc3_session
+from ukrdc_fastapi.models.search import PhoneticName
+from ukrdc_fastapi.utils.search import (
+    NAME_TRIGRAM_INDEX,
+    create_name_trigram_index,
+    create_phonetic_name_table,
+)
+
+if __name__ == "__main__":
+    with ukrdc3_session() as ukrdc3:
+        create_name_trigram_index(ukrdc3.get_bind().engine)
+        create_phonetic_name_table(ukrdc3.get_bind().engine)
+
+    print(f"Created index {NAME_TRIGRAM_INDEX}")
+    print(f"Created table {PhoneticName.__tablename__}")
@@ -0,0 +1,80 @@
+"""
+Compare cache codecs on a facility list payload.
+
+Builds a synthetic facility list the same shape as `CacheKey.FACILITIES_LIST`,
+then times encoding it, and decoding it back into `FacilityDetailsSchema`
+objects the way `get_facilities` does, for each codec with and without
+compression. Also reports the encoded size stored in Redis.
+"""
+
+import datetime
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+from ukrdc_fastapi.schemas.facility import (
+    FacilityDataFlowSchema,
+    FacilityDetailsSchema,
+    FacilityStatisticsSchema,
+)
+from ukrdc_fastapi.utils.cache import BinaryCodec, CacheCodec, JsonCodec, decode_value
+
+N_FACILITIES = 400
+N_REPEATS = 50
+
+CODECS: dict[str, CacheCodec] = {
+    "json": JsonCodec(compress_min_bytes=0),
+    "json+zlib": JsonCodec(compress_min_bytes=1),
+    "binary": BinaryCodec(compress_min_bytes=0),
+    "binary+zlib": BinaryCodec(compress_min_bytes=1),
+}
+
+
+def build_facility_list() -> list[FacilityDetailsSchema]:
+    """Build a synthetic facility list, similar to `build_facilities_list`"""
+    start = datetime.datetime(2024, 1, 1, 9, 30)
+    return [
+        FacilityDetailsSchema(
+            id=f"RFAC{i:03d}",
+            description=f"Benchmark Renal Unit {i}",
+            last_message_received_at=(
+                start + datetime.timedelta(minutes=i) if i % 10 else None
+            ),
+            data_flow=FacilityDataFlowSchema(
+                pkb_in=bool(i % 2),
+                pkb_out=bool(i % 3),
+                pkb_message_exclusions=["MDM_T02_CP", "MDM_T02_DOC"][: i % 3],
+            ),
+            statistics=FacilityStatisticsSchema(
+                total_patients=i * 25,
+                patients_receiving_messages=i * 20,
+                patients_receiving_message_error=i,
+                patients_receiving_message_success=i * 19,
+            ),
+        )
+        for i in range(N_FACILITIES)
+    ]
+
+
+def time_per_call(func: Callable[[], Any]) -> float:
+    """Best-of-three mean time per call, in milliseconds"""
+    return min(timeit.repeat(func, number=N_REPEATS, repeat=3)) / N_REPEATS * 1000
+
+
+if __name__ == "__main__":
+    facilities = build_facility_list()
+
+    print(f"{N_FACILITIES} facilities, mean of {N_REPEATS} calls")
+    print(f"{'codec':<12} {'bytes':>8} {'encode ms':>10} {'decode ms':>10}")
+    for name, codec in CODECS.items():
+        data = codec.encode(facilities)
+
+        def decode(data: bytes = data) -> list[FacilityDetailsSchema]:
+            return [FacilityDetailsSchema(**item) for item in decode_value(data)]
+
+        # Both codecs must give back the same facilities
+        assert decode() == facilities
+
+        encode_ms = time_per_call(lambda codec=codec: codec.encode(facilities))
+        decode_ms = time_per_call(decode)
+        print(f"{name:<12} {len(data):>8} {encode_ms:>10.2f} {decode_ms:>10.2f}")
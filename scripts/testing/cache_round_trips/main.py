@@ -0,0 +1,75 @@
+"""
+Count Redis round trips made by the response cache for each cached route.
+
+Runs the same cache calls as the `facility`, `facility_extracts` and facility
+stats routes against an in-memory fakeredis server, once on a cold cache (miss)
+and once on a warm cache (hit), counting every request sent to the server.
+Pipelined commands are sent together, so count as a single round trip.
+"""
+
+from collections.abc import Callable
+from typing import Any
+
+import fakeredis
+from starlette.requests import Request
+from starlette.responses import Response
+
+from ukrdc_fastapi.utils.cache import (
+    DynamicCacheKey,
+    FacilityCachePrefix,
+    ResponseCache,
+)
+
+ROUTES: dict[str, DynamicCacheKey] = {
+    "facility": DynamicCacheKey(FacilityCachePrefix.ROOT, "BENCH"),
+    "facility_extracts": DynamicCacheKey(FacilityCachePrefix.EXTRACTS, "BENCH"),
+    "facility_stats_demographics": DynamicCacheKey(
+        FacilityCachePrefix.DEMOGRAPHICS, "BENCH"
+    ),
+    "facility_stats_krt": DynamicCacheKey(FacilityCachePrefix.KRT, "BENCH"),
+}
+
+PAYLOAD: dict[str, Any] = {"id": "BENCH", "counts": list(range(100))}
+
+
+class RoundTripCounter:
+    def __init__(self, redis: fakeredis.FakeRedis):
+        self.count = 0
+        self._redis = redis
+
+    def __enter__(self):
+        connection = self._redis.connection_pool.get_connection()
+        self._redis.connection_pool.release(connection)
+        original: Callable = type(connection).send_packed_command
+
+        def counted(conn, *args, **kwargs):
+            self.count += 1
+            return original(conn, *args, **kwargs)
+
+        self._original = original
+        type(connection).send_packed_command = counted  # type: ignore
+        self._cls = type(connection)
+        return self
+
+    def __exit__(self, *_):
+        self._cls.send_packed_command = self._original  # type: ignore
+
+
+def cached_route(redis: fakeredis.FakeRedis, key: DynamicCacheKey) -> None:
+    """Mirror the cache calls made by a cached route function"""
+    request = Request({"type": "http", "method": "GET", "headers": []})
+    cache = ResponseCache(redis, key, request, Response())
+    if not cache.exists:
+        cache.set(PAYLOAD, expire=3600)
+    cache.prepare_response()
+    cache.get()
+
+
+if __name__ == "__main__":
+    redis = fakeredis.FakeRedis(decode_responses=True)
+    for name, key in ROUTES.items():
+        with RoundTripCounter(redis) as miss:
+            cached_route(redis, key)
+        with RoundTripCounter(redis) as hit:
+            cached_route(redis, key)
+        print(f"{name}: {miss.count} round trips on miss, {hit.count} on hit")
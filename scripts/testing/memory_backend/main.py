@@ -0,0 +1,79 @@
+"""
+Time cache and task tracker operations against each Redis backend.
+
+Runs a cache miss (lookup and set), a cache hit, and a tracked task run
+against the in-process `MemoryRedis` backend, and against fakeredis, which
+parses the Redis protocol like a real server but with no network in between.
+Local caching is disabled so every cache hit reaches the backend.
+"""
+
+import asyncio
+import timeit
+from collections.abc import Callable
+from typing import Any
+
+import fakeredis
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.dependencies import auth
+from ukrdc_fastapi.utils.cache import BasicCache, DynamicCacheKey, PytestCachePrefix
+from ukrdc_fastapi.utils.memory_redis import MemoryRedis
+from ukrdc_fastapi.utils.tasks import TaskTracker
+
+N_REPEATS = 500
+
+PAYLOAD: dict[str, Any] = {"id": "BENCH", "counts": list(range(100))}
+
+
+def time_per_call(func: Callable[[], Any]) -> float:
+    """Best-of-three mean time per call, in microseconds"""
+    return min(timeit.repeat(func, number=N_REPEATS, repeat=3)) / N_REPEATS * 1e6
+
+
+def benchmark(cache_redis: Any, lock_redis: Any) -> tuple[float, float, float]:
+    """Time a cache miss, a cache hit, and a tracked task run"""
+    counter = iter(range(10**9))
+
+    def miss() -> None:
+        key = DynamicCacheKey(PytestCachePrefix.PYTEST, str(next(counter)))
+        cache = BasicCache(cache_redis, key)
+        if not cache.exists:
+            cache.set(PAYLOAD, expire=60)
+
+    hit_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "hit")
+    BasicCache(cache_redis, hit_key).set(PAYLOAD, expire=60)
+
+    def hit() -> None:
+        BasicCache(cache_redis, hit_key).get()
+
+    tracker = TaskTracker(cache_redis, lock_redis, user=auth.auth.superuser)
+
+    async def _noop() -> None:
+        pass
+
+    def task() -> None:
+        tracked = tracker.create(_noop, name="bench", lock="bench")
+        asyncio.run(tracked.tracked())
+
+    return time_per_call(miss), time_per_call(hit), time_per_call(task)
+
+
+if __name__ == "__main__":
+    settings.cache_local_enabled = False
+
+    backends = {
+        "memory": (
+            MemoryRedis(decode_responses=True),
+            MemoryRedis(decode_responses=False),
+        ),
+        "fakeredis": (
+            fakeredis.FakeStrictRedis(decode_responses=True, db=0),
+            fakeredis.FakeStrictRedis(decode_responses=False, db=2),
+        ),
+    }
+
+    print(f"Mean of {N_REPEATS} calls")
+    print(f"{'backend':<10} {'miss us':>10} {'hit us':>10} {'task us':>10}")
+    for name, (cache_redis, lock_redis) in backends.items():
+        miss_us, hit_us, task_us = benchmark(cache_redis, lock_redis)
+        print(f"{name:<10} {miss_us:>10.1f} {hit_us:>10.1f} {task_us:>10.1f}")
@@ -60,7 +60,11 @@ from ukrdc_fastapi.dependencies import (
 )
 from ukrdc_fastapi.dependencies.auth import Permissions, UKRDCUser
 from ukrdc_fastapi.models.audit import Base as AuditBase
+from ukrdc_fastapi.models.search import Base as SearchBase
 from ukrdc_fastapi.models.users import Base as UsersBase
+from ukrdc_fastapi.utils.cache import local_cache
+from ukrdc_fastapi.utils.cache_stats import cache_stats
+from ukrdc_fastapi.utils.facility_codes import facility_codes
 from ukrdc_fastapi.utils.tasks import TaskTracker
 
 from .utils import create_basic_facility, create_basic_patient, days_ago
@@ -851,6 +855,30 @@ def populate_all(ukrdc3: Session, jtrace: Session, errorsdb: Session, statsdb: S
     populate_basic_stats(statsdb)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def clear_local_cache():
+    """Stop in-process cached values leaking between tests"""
+    local_cache.clear()
+    yield
+    local_cache.clear()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_facility_codes():
+    """Stop facility codes loaded from one test's database leaking into the next"""
+    facility_codes.invalidate()
+    yield
+    facility_codes.invalidate()
+
+
+@pytest.fixture(scope="function", autouse=True)
+def clear_cache_stats():
+    """Stop unflushed cache statistics leaking between tests"""
+    cache_stats.clear()
+    yield
+    cache_stats.clear()
+
+
 @pytest.fixture(scope="function")
 def jtrace_sessionmaker(postgresql_my):
     """
@@ -892,6 +920,7 @@ def ukrdc3_sessionmaker(postgresql_my):
         bind=engine,
     )
     UKRDC3Base.metadata.create_all(bind=engine)
+    SearchBase.metadata.create_all(bind=engine)
     return ukrdc_test_session
 
 
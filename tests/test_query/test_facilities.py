@@ -58,6 +58,24 @@ def test_get_facilities_cached(ukrdc3_session, errorsdb_session, redis_session):
     }
 
 
+def test_get_facilities_refresh(ukrdc3_session, errorsdb_session, redis_session):
+    BasicCache(redis_session, CacheKey.FACILITIES_LIST).set([])
+    assert get_facilities(ukrdc3_session, errorsdb_session, redis_session) == []
+
+    # Rebuilt, even though the cached list still exists
+    all_facils = get_facilities(
+        ukrdc3_session,
+        errorsdb_session,
+        redis_session,
+        include_inactive=True,
+        refresh=True,
+    )
+    assert {facil.id for facil in all_facils} == {
+        "TSF01",
+        "TSF02",
+    }
+
+
 @pytest.mark.parametrize("facility_code", ["TSF01", "TSF02"])
 def test_get_facility(facility_code, ukrdc3_session, errorsdb_session):
     facility = get_facility(
@@ -1,4 +1,5 @@
 from ukrdc_fastapi.config import configuration
+from ukrdc_fastapi.utils.cache import BasicCache, DynamicCacheKey, FacilityCachePrefix
 
 
 async def test_full_workitem_history(client_superuser):
@@ -65,3 +66,56 @@ async def test_record_workitem_counts_denied(client_authenticated):
         f"{configuration.base_url}/admin/datahealth/record_workitem_counts"
     )
     assert response.status_code == 403
+
+
+async def test_redis_pools(client_superuser):
+    response = await client_superuser.get(f"{configuration.base_url}/admin/redis_pools")
+    assert response.status_code == 200
+
+
+async def test_redis_pools_denied(client_authenticated):
+    response = await client_authenticated.get(
+        f"{configuration.base_url}/admin/redis_pools"
+    )
+    assert response.status_code == 403
+
+
+async def test_invalidate_cache(client_superuser, redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01")
+    BasicCache(redis_session, cache_key).set({"foo": "bar"}, expire=60)
+
+    response = await client_superuser.post(
+        f"{configuration.base_url}/admin/cache/invalidate?facility=TSF01"
+    )
+    assert response.status_code == 200
+    assert response.json()["invalidated"] == 1
+    assert not redis_session.exists(cache_key.value)
+
+
+async def test_invalidate_cache_denied(client_authenticated):
+    response = await client_authenticated.post(
+        f"{configuration.base_url}/admin/cache/invalidate?facility=TSF01"
+    )
+    assert response.status_code == 403
+
+
+async def test_cache_stats(client_superuser):
+    # Populate the facility cache, then hit it
+    await client_superuser.get(f"{configuration.base_url}/facilities/TSF01")
+    await client_superuser.get(f"{configuration.base_url}/facilities/TSF01")
+
+    response = await client_superuser.get(f"{configuration.base_url}/admin/cache/stats")
+    assert response.status_code == 200
+
+    stats = {item["prefix"]: item for item in response.json()}
+    root_stats = stats[FacilityCachePrefix.ROOT.value]
+    assert root_stats["hits"] == 1
+    assert root_stats["misses"] == 1
+    assert root_stats["writes"] == 1
+
+
+async def test_cache_stats_denied(client_authenticated):
+    response = await client_authenticated.get(
+        f"{configuration.base_url}/admin/cache/stats"
+    )
+    assert response.status_code == 403
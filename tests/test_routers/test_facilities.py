@@ -1,5 +1,8 @@
+from pydantic import TypeAdapter
+
 from tests.conftest import populate_main_satellite_relationship
 from ukrdc_fastapi.config import configuration
+from ukrdc_fastapi.query.facilities import FacilityDetailsSchema, get_facility
 
 from ..utils import days_ago
 
@@ -33,6 +36,36 @@ async def test_facility_detail(client_authenticated):
     assert json["id"] == "TSF01"
 
 
+async def test_facility_detail_not_modified(client_authenticated):
+    response = await client_authenticated.get(
+        f"{configuration.base_url}/facilities/TSF01"
+    )
+    etag = response.headers["ETag"]
+
+    # Revalidating with a matching ETag returns an empty 304
+    revalidated = await client_authenticated.get(
+        f"{configuration.base_url}/facilities/TSF01",
+        headers={"If-None-Match": etag},
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["ETag"] == etag
+    assert revalidated.content == b""
+
+
+async def test_facility_detail_cached_body(
+    client_authenticated, ukrdc3_session, errorsdb_session
+):
+    miss = await client_authenticated.get(f"{configuration.base_url}/facilities/TSF01")
+    hit = await client_authenticated.get(f"{configuration.base_url}/facilities/TSF01")
+
+    # The cached response body is byte-for-byte what FastAPI would serialise
+    facility = get_facility(ukrdc3_session, errorsdb_session, "TSF01")
+    expected = TypeAdapter(FacilityDetailsSchema).dump_json(facility, by_alias=True)
+    assert miss.content == expected
+    assert hit.content == expected
+    assert hit.headers["Content-Type"] == "application/json"
+
+
 async def test_facility_detail_denied(client_authenticated):
     response = await client_authenticated.get(
         f"{configuration.base_url}/facilities/TSF02"
@@ -40,6 +73,18 @@ async def test_facility_detail_denied(client_authenticated):
     assert response.status_code == 403
 
 
+async def test_facility_detail_missing(client_superuser):
+    response = await client_superuser.get(f"{configuration.base_url}/facilities/NOPE")
+    assert response.status_code == 404
+
+
+async def test_facility_extracts_missing(client_superuser):
+    response = await client_superuser.get(
+        f"{configuration.base_url}/facilities/NOPE/extracts"
+    )
+    assert response.status_code == 404
+
+
 async def test_facility_error_history(client_authenticated):
     response = await client_authenticated.get(
         f"{configuration.base_url}/facilities/TSF01/error_history"
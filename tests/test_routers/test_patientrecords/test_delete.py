@@ -3,6 +3,7 @@ from ukrdc_sqla.ukrdc import PatientRecord
 
 from ukrdc_fastapi.config import configuration
 from ukrdc_fastapi.schemas.delete import DeletePIDResponseSchema
+from ukrdc_fastapi.utils.cache import BasicCache, DynamicCacheKey, FacilityCachePrefix
 
 
 async def test_delete_summary(client_superuser, ukrdc3_session, jtrace_session):
@@ -94,3 +95,21 @@ async def test_delete_denied(client_authenticated):
         f"{configuration.base_url}/patientrecords/PYTEST03:PV:00000000A/delete"
     )
     assert response.status_code == 403
+
+
+async def test_delete_invalidates_facility_cache(
+    client_superuser, ukrdc3_session, redis_session
+):
+    record = ukrdc3_session.get(PatientRecord, "PYTEST03:PV:00000000A")
+    cache_key = DynamicCacheKey(FacilityCachePrefix.ROOT, record.sendingfacility)
+    BasicCache(redis_session, cache_key).set({"foo": "bar"}, expire=60)
+
+    summary_response = await client_superuser.post(
+        f"{configuration.base_url}/patientrecords/PYTEST03:PV:00000000A/delete"
+    )
+    await client_superuser.post(
+        f"{configuration.base_url}/patientrecords/PYTEST03:PV:00000000A/delete",
+        json={"hash": summary_response.json()["hash"]},
+    )
+
+    assert not redis_session.exists(cache_key.value)
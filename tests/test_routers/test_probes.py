@@ -0,0 +1,54 @@
+import pytest
+
+from ukrdc_fastapi.config import configuration
+from ukrdc_fastapi.routers import probes
+from ukrdc_fastapi.utils.cache import CacheKey
+
+
+@pytest.fixture(autouse=True)
+def cold_process(monkeypatch):
+    monkeypatch.setattr(probes, "_warmed", set())
+
+
+async def test_live(client):
+    response = await client.get(f"{configuration.base_url}/live")
+    assert response.status_code == 200
+    assert response.json() == {"live": True}
+
+
+async def test_ready_cold(client, redis_session):
+    redis_session.flushdb()
+
+    response = await client.get(f"{configuration.base_url}/ready")
+    assert response.status_code == 503
+    assert response.json().get("ready") is False
+    assert response.json().get("redis") is True
+    assert response.json().get("caches") == {
+        "facilities": False,
+        "mirth_channels": False,
+    }
+
+
+async def test_ready_warm(client, redis_session):
+    redis_session.set(CacheKey.FACILITIES_LIST.value, "[]")
+    redis_session.set(CacheKey.MIRTH_CHANNEL_INFO.value, "[]")
+
+    response = await client.get(f"{configuration.base_url}/ready")
+    assert response.status_code == 200
+    assert response.json().get("ready") is True
+
+
+async def test_ready_stays_warm(client, redis_session):
+    redis_session.set(CacheKey.FACILITIES_LIST.value, "[]")
+    redis_session.set(CacheKey.MIRTH_CHANNEL_INFO.value, "[]")
+    response = await client.get(f"{configuration.base_url}/ready")
+    assert response.status_code == 200
+
+    # Warm caches expiring before they are rebuilt don't make the process unready
+    redis_session.delete(CacheKey.FACILITIES_LIST.value)
+    response = await client.get(f"{configuration.base_url}/ready")
+    assert response.status_code == 200
+    assert response.json().get("caches") == {
+        "facilities": True,
+        "mirth_channels": True,
+    }
@@ -1,6 +1,7 @@
 from urllib.parse import quote
 
 from ukrdc_fastapi.config import configuration
+from ukrdc_fastapi.models.search import PhoneticName
 
 from .utils import TEST_NUMBERS, commit_extra_patients
 
@@ -218,3 +219,12 @@ async def test_search_permissions_superuser(client_superuser):
     assert response.status_code == 200
     returned_ids = {item["pid"] for item in response.json()["items"]}
     assert returned_ids == {"PYTEST02:PV:00000000A"}
+
+
+async def test_search_phonetic_unbuilt(ukrdc3_session, client_superuser):
+    ukrdc3_session.commit()
+    PhoneticName.__table__.drop(ukrdc3_session.get_bind())
+
+    url = f"{configuration.base_url}/search/records?full_name=starr&phonetic=true"
+    response = await client_superuser.get(url)
+    assert response.status_code == 503
@@ -27,6 +27,8 @@ class TaskSubmitModel(BaseModel):
     bad: bool = False
     private: bool = False
     force_owner: str | None = None
+    coalesce: bool = False
+    store_result: bool = False
 
 
 @pytest.mark.anyio
@@ -40,6 +42,13 @@ async def task_bad(time_to_wait: int):
     raise RuntimeError("bad task finished")
 
 
+@pytest.mark.anyio
+async def task_with_result(time_to_wait: int, result):
+    await asyncio.sleep(time_to_wait)
+    result.set_media_type("text/plain", filename="result.txt")
+    result.write("task result")
+
+
 @pytest.fixture(scope="function")
 def app_with_tasks(app_authenticated):
     @app_authenticated.post(
@@ -52,6 +61,8 @@ def app_with_tasks(app_authenticated):
     ):
         if params.bad:
             task_func = task_bad
+        elif params.store_result:
+            task_func = task_with_result
         else:
             task_func = task_good
 
@@ -59,6 +70,7 @@ def app_with_tasks(app_authenticated):
             task_func,
             lock=f"task-{params.time_to_wait}-{'bad' if params.bad else 'good'}",
             visibility="private" if params.private else "public",
+            coalesce=params.coalesce,
         )
 
         if params.force_owner:
@@ -173,3 +185,66 @@ async def test_submit_task_lock_error(client_with_tasks):
     codes.sort()
     # Assert that only one of the identical tasks was started
     assert codes == [202, 409, 409]
+
+
+@pytest.mark.asyncio
+async def test_submit_task_coalesced(client_with_tasks):
+    results = await asyncio.gather(
+        client_with_tasks.post(
+            "/start_task", json={"time_to_wait": 1, "coalesce": True}
+        ),
+        client_with_tasks.post(
+            "/start_task", json={"time_to_wait": 1, "coalesce": True}
+        ),
+    )
+    # Assert that both identical requests were given the same task
+    assert [r.status_code for r in results] == [202, 202]
+    assert results[0].json().get("id") == results[1].json().get("id")
+
+
+@pytest.mark.asyncio
+async def test_cancel_task(client_with_tasks, task_redis_sessions):
+    response = await client_with_tasks.post("/start_task", json={"time_to_wait": 0.1})
+    task_id = response.json().get("id")
+    # Pretend the task is still running
+    task_redis_sessions[0].hset(task_id.replace("-", ""), "status", "running")
+
+    cancelled = await client_with_tasks.post(
+        f"{configuration.base_url}/tasks/{task_id}/cancel"
+    )
+    assert cancelled.status_code == 200
+    assert cancelled.json().get("cancelRequested")
+
+
+@pytest.mark.asyncio
+async def test_cancel_task_missing(client_with_tasks):
+    cancelled = await client_with_tasks.post(
+        f"{configuration.base_url}/tasks/00000000-0000-0000-0000-000000000000/cancel"
+    )
+    assert cancelled.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_get_task_result(client_with_tasks):
+    response = await client_with_tasks.post(
+        "/start_task", json={"time_to_wait": 0.1, "store_result": True}
+    )
+    task_id = response.json().get("id")
+
+    task_result = await client_with_tasks.get(
+        f"{configuration.base_url}/tasks/{task_id}/result"
+    )
+    assert task_result.status_code == 200
+    assert task_result.text == "task result"
+    assert task_result.headers["content-type"].startswith("text/plain")
+
+
+@pytest.mark.asyncio
+async def test_get_task_result_missing(client_with_tasks):
+    response = await client_with_tasks.post("/start_task", json={"time_to_wait": 0.1})
+    task_id = response.json().get("id")
+
+    task_result = await client_with_tasks.get(
+        f"{configuration.base_url}/tasks/{task_id}/result"
+    )
+    assert task_result.status_code == 404
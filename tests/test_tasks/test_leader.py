@@ -0,0 +1,54 @@
+import fakeredis
+import pytest
+
+from ukrdc_fastapi.tasks.leader import LEADER_LEASE_KEY, LeaderElection, get_leader
+
+
+@pytest.fixture(scope="function")
+def lock_redis():
+    redis = fakeredis.FakeStrictRedis(db=2)
+    redis.flushdb()
+    return redis
+
+
+def test_single_leader(lock_redis):
+    first = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+    second = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+
+    assert first.campaign()
+    assert not second.campaign()
+
+    # The leader keeps the lease when renewing it
+    assert first.campaign()
+    assert not second.campaign()
+
+
+def test_failover(lock_redis):
+    first = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+    second = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+    first.campaign()
+
+    # The leader stops renewing, and its lease expires
+    lock_redis.delete("pytest:leader")
+
+    assert second.campaign()
+    assert not first.campaign()
+    assert not first.is_leader
+
+
+async def test_stop_hands_over(lock_redis):
+    first = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+    second = LeaderElection(lock_redis, "pytest:leader", lease_seconds=30)
+
+    first.start()
+    assert first.is_leader
+    first.stop()
+    assert not first.is_leader
+
+    assert second.campaign()
+
+
+def test_get_leader():
+    # Created on first use, then shared by the whole process
+    assert get_leader() is get_leader()
+    assert get_leader().key == LEADER_LEASE_KEY
@@ -0,0 +1,177 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from tests.conftest import PID_1
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.models.search import PhoneticName
+from ukrdc_fastapi.tasks import repeated
+from ukrdc_fastapi.utils import search
+
+
+@pytest.fixture(scope="function")
+def precalculation(monkeypatch, ukrdc3_session, redis_session):
+    """Run dialysis stats pre-calculation against the test databases, in threads"""
+
+    @contextmanager
+    def _ukrdc3_session():
+        yield ukrdc3_session
+
+    calculated: list[str] = []
+    calculate = repeated._calculate_facility_stats
+
+    def _calculate_facility_stats(facility, windows):
+        calculated.append(facility)
+        return calculate(facility, windows)
+
+    monkeypatch.setattr(settings, "cache_facilities_stats_dialysis_min", 0)
+    monkeypatch.setattr(repeated, "ukrdc3_session", _ukrdc3_session)
+    monkeypatch.setattr(repeated, "get_redis", lambda: redis_session)
+    monkeypatch.setattr(
+        repeated, "_get_stats_executor", lambda: ThreadPoolExecutor(max_workers=1)
+    )
+    monkeypatch.setattr(
+        repeated, "_calculate_facility_stats", _calculate_facility_stats
+    )
+    return calculated
+
+
+async def test_precalculate_dialysis_stats(precalculation, redis_session):
+    await repeated._precalculate_facility_stats_dialysis()
+
+    facilities = repeated._facilities_to_precalculate()
+    assert facilities
+    assert sorted(precalculation) == sorted(facilities)
+
+    # High-water marks and timings are recorded for each facility
+    updated = redis_session.hgetall(repeated.DIALYSIS_STATS_UPDATED_KEY)
+    assert updated == {
+        facility: last_update.isoformat()
+        for facility, last_update in facilities.items()
+    }
+    timings = redis_session.hgetall(repeated.DIALYSIS_STATS_TIMINGS_KEY)
+    assert set(timings) == set(facilities)
+
+
+async def test_precalculate_dialysis_stats_unchanged(precalculation, redis_session):
+    await repeated._precalculate_facility_stats_dialysis()
+    first_run = list(precalculation)
+    precalculation.clear()
+
+    # Only facilities whose stats failed to cache are recalculated
+    await repeated._precalculate_facility_stats_dialysis()
+    unchanged = [facility for facility in first_run if facility not in precalculation]
+    assert unchanged
+
+    # A facility with new data is recalculated
+    redis_session.hset(repeated.DIALYSIS_STATS_UPDATED_KEY, unchanged[0], "2000-01-01")
+    precalculation.clear()
+    await repeated._precalculate_facility_stats_dialysis()
+    assert unchanged[0] in precalculation
+
+
+async def test_precalculate_dialysis_stats_no_update_date(
+    precalculation, monkeypatch, redis_session
+):
+    facilities = repeated._facilities_to_precalculate()
+    facility = next(iter(facilities))
+    # None of the facility's records have an update date
+    monkeypatch.setattr(
+        repeated,
+        "_facilities_to_precalculate",
+        lambda: {**facilities, facility: None},
+    )
+
+    # Facilities with no update dates are recalculated every run
+    await repeated._precalculate_facility_stats_dialysis()
+    precalculation.clear()
+    await repeated._precalculate_facility_stats_dialysis()
+    assert facility in precalculation
+    assert not redis_session.hexists(repeated.DIALYSIS_STATS_UPDATED_KEY, facility)
+
+
+@pytest.fixture(scope="function")
+def phonetic_index(monkeypatch, ukrdc3_session, redis_session):
+    """Build the phonetic name index against the test databases"""
+
+    @contextmanager
+    def _ukrdc3_session():
+        yield ukrdc3_session
+
+    monkeypatch.setattr(settings, "search_phonetic_index_batch_size", 2)
+    monkeypatch.setattr(repeated, "ukrdc3_session", _ukrdc3_session)
+    monkeypatch.setattr(repeated, "get_redis", lambda: redis_session)
+    return ukrdc3_session
+
+
+async def test_build_phonetic_name_index(phonetic_index, redis_session):
+    await repeated._build_phonetic_name_index()
+
+    keys = set(phonetic_index.execute(select(PhoneticName.pid, PhoneticName.key)))
+    # Patient 1 is Patrick Star
+    assert {(PID_1, "P362"), (PID_1, "S360")} <= keys
+    assert redis_session.get(repeated.PHONETIC_INDEX_UPDATED_KEY)
+
+
+async def test_build_phonetic_name_index_since(phonetic_index, redis_session):
+    await repeated._build_phonetic_name_index()
+
+    # Nothing has been updated since the last run
+    indexed = repeated._build_phonetic_index(
+        phonetic_index,
+        datetime.fromisoformat(redis_session.get(repeated.PHONETIC_INDEX_UPDATED_KEY))
+        + timedelta(seconds=1),
+    )
+    assert indexed == 0
+
+
+def test_build_phonetic_index_removes_deleted(phonetic_index):
+    phonetic_index.add(PhoneticName(pid="DELETED", key="D434"))
+    phonetic_index.commit()
+
+    assert repeated._build_phonetic_index(phonetic_index) > 0
+    assert phonetic_index.get(PhoneticName, ("DELETED", "D434")) is None
+
+
+def test_build_phonetic_index_since_removes_deleted(phonetic_index):
+    phonetic_index.add(PhoneticName(pid="DELETED", key="D434"))
+    phonetic_index.commit()
+
+    # Incremental builds prune deleted records too
+    repeated._build_phonetic_index(phonetic_index, datetime.now() + timedelta(days=1))
+    assert phonetic_index.get(PhoneticName, ("DELETED", "D434")) is None
+
+
+async def test_build_phonetic_name_index_no_table(phonetic_index, redis_session):
+    phonetic_index.commit()
+    PhoneticName.__table__.drop(phonetic_index.get_bind())
+
+    # The task never creates the table itself
+    await repeated._build_phonetic_name_index()
+    assert not search.phonetic_name_table_exists(phonetic_index)
+    assert not redis_session.get(repeated.PHONETIC_INDEX_UPDATED_KEY)
+
+
+async def test_flush_cache_stats(monkeypatch, redis_session):
+    monkeypatch.setattr(repeated, "get_redis", lambda: redis_session)
+    repeated.cache_stats.record("pytest:flush", hits=1)
+
+    await repeated.flush_cache_stats()
+    assert redis_session.hget("cache-stats:pytest:flush", "hits") == "1"
+
+
+def test_shutdown_stats_executor(monkeypatch):
+    monkeypatch.setattr(settings, "cache_facilities_stats_dialysis_processes", 1)
+    executor = repeated._get_stats_executor()
+    assert repeated._get_stats_executor() is executor
+
+    repeated.shutdown_stats_executor()
+    assert repeated._stats_executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(print)
+
+    # Safe to call when not started
+    repeated.shutdown_stats_executor()
@@ -0,0 +1,192 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+
+from ukrdc_fastapi.tasks.leader import LeaderElection
+from ukrdc_fastapi.tasks.scheduler import (
+    LOCK_KEY_PREFIX,
+    STATS_KEY_PREFIX,
+    Cron,
+    Interval,
+    Scheduler,
+)
+
+
+@pytest.fixture(scope="function")
+def scheduler(task_redis_sessions):
+    task_redis_sessions[0].flushdb()
+    task_redis_sessions[1].flushdb()
+    return Scheduler(lambda: task_redis_sessions[0], lambda: task_redis_sessions[1])
+
+
+def test_interval_aligned():
+    schedule = Interval(60)
+    assert schedule.next_after(
+        datetime.datetime(2024, 1, 1, 12, 0, 30)
+    ) == datetime.datetime(2024, 1, 1, 12, 1, 0)
+    # Strictly after the given time
+    assert schedule.next_after(
+        datetime.datetime(2024, 1, 1, 12, 1, 0)
+    ) == datetime.datetime(2024, 1, 1, 12, 2, 0)
+
+
+@pytest.mark.parametrize(
+    ["expression", "after", "expected"],
+    [
+        ("30 2 * * *", (2024, 1, 1, 3, 0), (2024, 1, 2, 2, 30)),
+        ("*/15 * * * *", (2024, 1, 1, 12, 7), (2024, 1, 1, 12, 15)),
+        ("0 9-17/4 * * *", (2024, 1, 1, 13, 0), (2024, 1, 1, 17, 0)),
+        # Mondays
+        ("0 0 * * 1", (2024, 1, 7, 12, 0), (2024, 1, 8, 0, 0)),
+        # Sundays, written as 7
+        ("0 0 * * 7", (2024, 1, 1, 0, 0), (2024, 1, 7, 0, 0)),
+        # The 13th, or any Friday
+        ("0 0 13 * 5", (2024, 1, 1, 0, 0), (2024, 1, 5, 0, 0)),
+        ("0 0 1 1,7 *", (2024, 2, 1, 0, 0), (2024, 7, 1, 0, 0)),
+        ("0 0 1 1 *", (2024, 2, 1, 0, 0), (2025, 1, 1, 0, 0)),
+    ],
+)
+def test_cron_next_after(expression, after, expected):
+    assert Cron(expression).next_after(datetime.datetime(*after)) == datetime.datetime(
+        *expected
+    )
+
+
+@pytest.mark.parametrize("expression", ["* * * *", "61 * * * *", "5-1 * * * *"])
+def test_cron_invalid(expression):
+    with pytest.raises(ValueError):
+        Cron(expression)
+
+
+def test_cron_never_runs():
+    with pytest.raises(ValueError):
+        Cron("0 0 31 2 *").next_after(datetime.datetime(2024, 1, 1))
+
+
+async def test_run_records_history(scheduler):
+    @scheduler.job("pytest", Interval(60))
+    async def _job():
+        pass
+
+    assert await scheduler.run(scheduler.jobs["pytest"])
+
+    history = scheduler.history("pytest")
+    assert len(history) == 1
+    assert history[0]["status"] == "finished"
+
+    stats = scheduler.stats("pytest")
+    assert stats["runs"] == 1
+    assert stats["failures"] == 0
+    assert stats["max_seconds"] >= stats["last_seconds"]
+
+
+async def test_run_records_failure(scheduler):
+    @scheduler.job("pytest", Interval(60))
+    async def _job():
+        raise RuntimeError("pytest failure")
+
+    assert await scheduler.run(scheduler.jobs["pytest"])
+
+    assert scheduler.history("pytest")[0]["error"] == "pytest failure"
+    assert scheduler.stats("pytest")["failures"] == 1
+    # The lock is released, so the next run isn't blocked
+    assert not scheduler.lock_redis.exists(f"{LOCK_KEY_PREFIX}pytest")
+
+
+async def test_run_no_overlap(scheduler):
+    ran = []
+
+    @scheduler.job("pytest", Interval(60))
+    async def _job():
+        ran.append(True)
+
+    # Another process is running the job
+    scheduler.lock_redis.set(f"{LOCK_KEY_PREFIX}pytest", "someone-else")
+
+    assert not await scheduler.run(scheduler.jobs["pytest"])
+    assert not ran
+
+
+async def test_run_leader_only(task_redis_sessions):
+    leader = LeaderElection(task_redis_sessions[1], "pytest:leader", lease_seconds=30)
+    scheduler = Scheduler(
+        lambda: task_redis_sessions[0],
+        lambda: task_redis_sessions[1],
+        leader=lambda: leader,
+    )
+
+    @scheduler.job("pytest", Interval(60), leader_only=True)
+    async def _job():
+        pass
+
+    # Followers don't run the job, or record anything
+    assert not await scheduler.run(scheduler.jobs["pytest"])
+    assert scheduler.history("pytest") == []
+
+    leader.campaign()
+    assert await scheduler.run(scheduler.jobs["pytest"])
+
+
+async def test_new_leader_runs_missed(task_redis_sessions):
+    task_redis_sessions[0].flushdb()
+    task_redis_sessions[1].flushdb()
+    leader = LeaderElection(task_redis_sessions[1], "pytest:leader", lease_seconds=1)
+    scheduler = Scheduler(
+        lambda: task_redis_sessions[0],
+        lambda: task_redis_sessions[1],
+        leader=lambda: leader,
+    )
+    ran = asyncio.Event()
+
+    @scheduler.job("pytest", Interval(3600), jitter=0, leader_only=True)
+    async def _job():
+        ran.set()
+
+    # The missed run is skipped, as this worker isn't the leader yet
+    scheduler.start()
+    try:
+        await asyncio.sleep(0.1)
+        assert not ran.is_set()
+
+        # Once it becomes leader, it catches up without waiting for the next run
+        leader.campaign()
+        await asyncio.wait_for(ran.wait(), 5)
+    finally:
+        scheduler.stop()
+
+
+def test_missed(scheduler):
+    @scheduler.job("pytest", Interval(3600))
+    async def _job():
+        pass
+
+    job = scheduler.jobs["pytest"]
+    now = datetime.datetime.now()
+    stats_key = f"{STATS_KEY_PREFIX}pytest"
+
+    # Never run
+    assert scheduler._missed(job, now)
+
+    # Ran recently
+    scheduler.redis.hset(stats_key, "last_run", time.time())
+    assert not scheduler._missed(job, now)
+
+    # Ran before the last scheduled time
+    scheduler.redis.hset(stats_key, "last_run", time.time() - 7200)
+    assert scheduler._missed(job, now)
+
+
+async def test_start_runs_at_start(scheduler):
+    ran = asyncio.Event()
+
+    @scheduler.job("pytest", Interval(3600), jitter=0, run_at_start=True)
+    async def _job():
+        ran.set()
+
+    scheduler.start()
+    try:
+        await asyncio.wait_for(ran.wait(), 5)
+    finally:
+        scheduler.stop()
@@ -0,0 +1,323 @@
+import asyncio
+import datetime
+import time
+
+import pytest
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.exceptions import TaskLockError
+from ukrdc_fastapi.utils.tasks import (
+    _EXPIRY_INDEX_KEY,
+    _HEARTBEAT_INDEX_KEY,
+    _PUBLIC_INDEX_KEY,
+    TaskProgressSchema,
+    TaskTracker,
+    _private_index_key,
+    _result_key,
+)
+
+
+async def _noop():
+    pass
+
+
+@pytest.fixture(scope="function")
+def tracker(task_redis_sessions, superuser):
+    task_redis_sessions[0].flushdb()
+    return TaskTracker(task_redis_sessions[0], task_redis_sessions[1], user=superuser)
+
+
+def test_get_page(tracker):
+    tasks = [tracker.create(_noop, name=f"task-{i}") for i in range(5)]
+
+    page, total = tracker.get_page(offset=1, limit=2)
+    assert total == 5
+    # Newest first
+    assert [task.id for task in page] == [tasks[3].id, tasks[2].id]
+
+    all_tasks = tracker.get_all()
+    assert [task.id for task in all_tasks] == [task.id for task in reversed(tasks)]
+
+
+def test_get_page_private(tracker):
+    public_task = tracker.create(_noop)
+    own_task = tracker.create(_noop, visibility="private")
+    other_task = tracker.create(_noop, visibility="private")
+
+    # Reassigning the owner moves the task to the other owner's index
+    other_task.owner = "TEST2@UKRDC_FASTAPI"
+    other_task._sync()
+    assert tracker.task_redis.zcard(_private_index_key("TEST2@UKRDC_FASTAPI")) == 1
+
+    page, total = tracker.get_page()
+    assert total == 2
+    assert [task.id for task in page] == [own_task.id, public_task.id]
+
+
+async def test_get_page_prunes_expired(tracker, monkeypatch):
+    task = tracker.create(_noop)
+    await task.tracked()
+    assert tracker.task_redis.zcard(_EXPIRY_INDEX_KEY) == 1
+
+    # Jump past the task expiry time
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 10**6)
+    tracker.task_redis.delete(task.id.hex)
+
+    assert tracker.get_page() == ([], 0)
+    assert tracker.task_redis.zcard(_PUBLIC_INDEX_KEY) == 0
+    assert tracker.task_redis.zcard(_EXPIRY_INDEX_KEY) == 0
+
+
+def test_get_page_removes_missing(tracker):
+    task = tracker.create(_noop)
+    tracker.create(_noop)
+    tracker.task_redis.delete(task.id.hex)
+
+    page, total = tracker.get_page()
+    assert total == 1
+    assert len(page) == 1
+    assert tracker.task_redis.zcard(_PUBLIC_INDEX_KEY) == 1
+
+
+async def test_tracked_progress(tracker):
+    async def _count(progress):
+        progress.set_total(4)
+        for _ in range(4):
+            progress.advance()
+
+    task = tracker.create(_count)
+    await task.tracked()
+
+    progress = tracker.get(task.id.hex).progress
+    assert progress.processed == 4
+    assert progress.total == 4
+
+
+async def test_progress_throttled(tracker, monkeypatch):
+    monkeypatch.setattr(settings, "redis_tasks_progress_seconds", 60)
+    task = tracker.create(_noop)
+
+    # The first update is written immediately, later ones are held back
+    task._progress.advance()
+    task._progress.advance()
+    assert tracker.task_redis.hget(task.id.hex, "progress_processed") == "1"
+    assert task._progress.processed == 2
+
+    task._progress.flush()
+    assert tracker.task_redis.hget(task.id.hex, "progress_processed") == "2"
+
+
+def test_progress_rate_and_eta():
+    started = datetime.datetime(2024, 1, 1, 12, 0, 0)
+    updated = started + datetime.timedelta(seconds=10)
+
+    progress = TaskProgressSchema.measure(5, 20, started, updated)
+    assert progress.rate == 0.5
+    assert progress.eta == updated + datetime.timedelta(seconds=30)
+
+    # No ETA without a total
+    assert TaskProgressSchema.measure(5, None, started, updated).eta is None
+
+
+def test_lock_error_names_holder(tracker):
+    task = tracker.create(_noop, lock="pytest")
+
+    with pytest.raises(TaskLockError) as e:
+        tracker.create(_noop, lock="pytest")
+    assert e.value.task_id == task.id.hex
+
+
+def test_lock_expires_until_started(tracker):
+    task = tracker.create(_noop, lock="pytest")
+    assert (
+        0 < tracker.lock_redis.ttl(task._lock_key) <= settings.redis_tasks_expire_lock
+    )
+
+
+async def test_lock_released_by_holder_only(tracker):
+    task = tracker.create(_noop, lock="pytest")
+
+    # The lock expired, and was taken by another task
+    tracker.lock_redis.delete(task._lock_key)
+    other = tracker.create(_noop, lock="pytest")
+
+    await task.tracked()
+    assert tracker.lock_redis.get(task._lock_key) == other.id.hex
+
+
+async def test_coalesce(tracker):
+    ran = []
+
+    async def _run():
+        ran.append(True)
+
+    task = tracker.create(_run, lock="pytest")
+    duplicate = tracker.create(_run, lock="pytest", coalesce=True)
+    assert duplicate.joined
+    assert duplicate.id == task.id
+    assert duplicate.response().status == "pending"
+
+    # Only one execution runs
+    await task.tracked()
+    await duplicate.tracked()
+    assert ran == [True]
+    assert tracker.get(task.id.hex).status == "finished"
+
+
+def test_coalesce_private_task(tracker):
+    task = tracker.create(_noop, lock="pytest", visibility="private")
+    tracker.task_redis.hset(task.id.hex, "owner", "someone@else")
+
+    # Other users' private tasks aren't shared
+    with pytest.raises(TaskLockError):
+        tracker.create(_noop, lock="pytest", coalesce=True)
+
+
+async def test_cancel_pending(tracker):
+    ran = []
+
+    async def _run():
+        ran.append(True)
+
+    task = tracker.create(_run, lock="pytest")
+    assert tracker.cancel(task.id.hex).cancel_requested
+
+    await task.tracked()
+    assert not ran
+    assert tracker.get(task.id.hex).status == "cancelled"
+    assert not tracker.lock_redis.exists(task._lock_key)
+
+
+async def test_cancel_running(tracker, monkeypatch):
+    monkeypatch.setattr(settings, "redis_tasks_heartbeat_seconds", 0.01)
+    started = asyncio.Event()
+
+    async def _forever():
+        started.set()
+        await asyncio.sleep(60)
+
+    task = tracker.create(_forever)
+    running = asyncio.ensure_future(task.tracked())
+    await started.wait()
+    tracker.cancel(task.id.hex)
+
+    await asyncio.wait_for(running, 5)
+    assert tracker.get(task.id.hex).status == "cancelled"
+
+
+async def test_timeout(tracker):
+    async def _slow():
+        await asyncio.sleep(60)
+
+    task = tracker.create(_slow, timeout=0.05)
+    await asyncio.wait_for(task.tracked(), 5)
+
+    task_status = tracker.get(task.id.hex)
+    assert task_status.status == "failed"
+    assert task_status.error == "Task timed out after 0.05 seconds"
+
+
+async def test_timeout_raised_by_task(tracker):
+    async def _request():
+        raise TimeoutError("Connection timed out")
+
+    # Only the task's own timeout is reported as a timeout
+    task = tracker.create(_request)
+    await asyncio.wait_for(task.tracked(), 5)
+
+    task_status = tracker.get(task.id.hex)
+    assert task_status.status == "failed"
+    assert task_status.error == "Connection timed out"
+
+
+async def test_heartbeat_renews_lock(tracker):
+    async def _check_lock():
+        # The lock expires, so it is freed if this process dies
+        assert tracker.lock_redis.ttl(task._lock_key) > 0
+        assert tracker.task_redis.hget(task.id.hex, "heartbeat")
+
+    task = tracker.create(_check_lock, lock="pytest")
+    await task.tracked()
+    assert tracker.get(task.id.hex).status == "finished"
+    assert tracker.task_redis.zscore(_HEARTBEAT_INDEX_KEY, task.id.hex) is None
+
+
+def test_sweep(tracker):
+    orphan = tracker.create(_noop, lock="pytest")
+    live = tracker.create(_noop, lock="pytest-live")
+    tracker.task_redis.hset(orphan.id.hex, "status", "running")
+    # The orphan's last heartbeat was long ago
+    tracker.task_redis.zadd(_HEARTBEAT_INDEX_KEY, {orphan.id.hex: 0})
+
+    assert tracker.sweep() == [orphan.id.hex]
+
+    task_status = tracker.get(orphan.id.hex)
+    assert task_status.status == "failed"
+    assert task_status.error == "Task stopped responding"
+    assert not tracker.lock_redis.exists(orphan._lock_key)
+    assert tracker.task_redis.ttl(orphan.id.hex) > 0
+
+    assert tracker.get(live.id.hex).status == "pending"
+    assert tracker.lock_redis.exists(live._lock_key)
+
+
+def test_sweep_pending(tracker):
+    task = tracker.create(_noop, lock="pytest")
+    # Past the heartbeat timeout, but pending tasks get longer to start
+    tracker.task_redis.zadd(_HEARTBEAT_INDEX_KEY, {task.id.hex: 0})
+
+    assert tracker.sweep() == []
+    assert tracker.get(task.id.hex).status == "pending"
+    assert tracker.lock_redis.exists(task._lock_key)
+
+    # Once the pending timeout has passed, the task is swept
+    created = datetime.datetime.now() - datetime.timedelta(
+        seconds=settings.redis_tasks_pending_timeout + 1
+    )
+    tracker.task_redis.hset(task.id.hex, "created", created.isoformat())
+
+    assert tracker.sweep() == [task.id.hex]
+    assert tracker.get(task.id.hex).status == "failed"
+    assert not tracker.lock_redis.exists(task._lock_key)
+
+
+def test_sweep_finished(tracker):
+    task = tracker.create(_noop)
+    tracker.task_redis.hset(task.id.hex, "status", "finished")
+    tracker.task_redis.zadd(_HEARTBEAT_INDEX_KEY, {task.id.hex: 0})
+
+    # Finished tasks are only dropped from the heartbeat index
+    assert tracker.sweep() == []
+    assert tracker.get(task.id.hex).status == "finished"
+    assert tracker.task_redis.zcard(_HEARTBEAT_INDEX_KEY) == 0
+
+
+async def test_result_chunked(tracker, monkeypatch):
+    monkeypatch.setattr(settings, "redis_tasks_result_chunk_bytes", 4)
+
+    async def _report(result):
+        result.set_media_type("text/csv", filename="report.csv")
+        result.write("hello ")
+        result.write(b"world")
+
+    task = tracker.create(_report)
+    await task.tracked()
+
+    # Stored in chunks, which expire along with the task
+    assert tracker.task_redis.llen(_result_key(task.id.hex)) == 3
+    assert tracker.task_redis.ttl(_result_key(task.id.hex)) > 0
+
+    task_result = tracker.get(task.id.hex).result
+    assert task_result.media_type == "text/csv"
+    assert task_result.filename == "report.csv"
+    assert task_result.size == 11
+    assert list(tracker.iter_result(task.id.hex)) == [b"hell", b"o wo", b"rld"]
+
+
+async def test_result_none(tracker):
+    task = tracker.create(_noop)
+    await task.tracked()
+
+    assert tracker.get(task.id.hex).result is None
+    assert list(tracker.iter_result(task.id.hex)) == []
@@ -0,0 +1,166 @@
+import json
+
+import pytest
+
+from ukrdc_fastapi.exceptions import TaskLockError
+from ukrdc_fastapi.utils.tasks import (
+    PROCESSING_KEY_PREFIX,
+    QUEUE_KEY,
+    WORKER_ALIVE_PREFIX,
+    WORKERS_KEY,
+    TaskTracker,
+    job,
+)
+from ukrdc_fastapi.worker import Worker
+
+calls: list[dict] = []
+
+
+@job("pytest_job")
+async def _pytest_job(value: int, fail: bool = False):
+    calls.append({"value": value})
+    if fail:
+        raise RuntimeError("pytest job failed")
+
+
+@pytest.fixture(scope="function")
+def tracker(task_redis_sessions, superuser):
+    task_redis_sessions[0].flushdb()
+    task_redis_sessions[1].flushdb()
+    calls.clear()
+    return TaskTracker(task_redis_sessions[0], task_redis_sessions[1], user=superuser)
+
+
+def test_enqueue(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1}, name="Pytest Job")
+
+    assert tracker.get(task.id.hex).status == "pending"
+    queued = json.loads(tracker.task_redis.lindex(QUEUE_KEY, 0))
+    assert queued["job"] == "pytest_job"
+    assert queued["kwargs"] == {"value": 1}
+    assert queued["task"]["id"] == task.id.hex
+
+
+def test_enqueue_unknown_job(tracker):
+    with pytest.raises(KeyError):
+        tracker.enqueue("not_a_job")
+
+
+def test_enqueue_lock_held_until_started(tracker):
+    tracker.enqueue("pytest_job", {"value": 1}, lock="pytest-lock")
+    # Queued tasks may wait any time for a worker, so their lock doesn't expire
+    assert tracker.lock_redis.ttl("_LOCK_pytest-lock") == -1
+
+    # A second run can't be queued while the first waits
+    with pytest.raises(TaskLockError):
+        tracker.enqueue("pytest_job", {"value": 2}, lock="pytest-lock")
+
+
+async def _run_queue(worker):
+    """Run queued jobs until the queue is empty"""
+    original_run = worker._run
+
+    async def _run(payload):
+        await original_run(payload)
+        if not worker.tracker.task_redis.llen(QUEUE_KEY):
+            worker.stop()
+
+    worker._run = _run
+    await worker.run()
+
+
+async def test_worker_runs_job(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1}, lock="pytest-lock")
+    worker = Worker(0, tracker=tracker)
+    await _run_queue(worker)
+
+    assert calls == [{"value": 1}]
+    assert tracker.get(task.id.hex).status == "finished"
+    # Lock is released, and the job is no longer in progress
+    assert not tracker.lock_redis.exists("_LOCK_pytest-lock")
+    assert tracker.task_redis.llen(worker.processing_key) == 0
+
+
+async def test_worker_job_failed(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1, "fail": True})
+    worker = Worker(0, tracker=tracker)
+    tracker.task_redis.lmove(QUEUE_KEY, worker.processing_key)
+
+    # Resumes the job left in its processing list, then stops
+    worker.stop()
+    await worker.run()
+
+    task_status = tracker.get(task.id.hex)
+    assert task_status.status == "failed"
+    assert task_status.error == "pytest job failed"
+    assert tracker.task_redis.llen(worker.processing_key) == 0
+
+
+async def test_worker_reclaims_released_lock(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1}, lock="pytest-lock")
+    # E.g. released by the sweeper after a worker running the task died
+    tracker.lock_redis.delete("_LOCK_pytest-lock")
+
+    await _run_queue(Worker(0, tracker=tracker))
+
+    assert calls == [{"value": 1}]
+    assert tracker.get(task.id.hex).status == "finished"
+
+
+async def test_worker_lock_taken(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1}, lock="pytest-lock")
+    # Another task took the lock while this one was queued
+    tracker.lock_redis.set("_LOCK_pytest-lock", "other")
+
+    await _run_queue(Worker(0, tracker=tracker))
+
+    assert calls == []
+    assert tracker.get(task.id.hex).status == "failed"
+    assert tracker.lock_redis.get("_LOCK_pytest-lock") == "other"
+
+
+async def test_worker_unknown_job(tracker):
+    task = tracker.enqueue("pytest_job", {"value": 1}, lock="pytest-lock")
+    payload = json.loads(tracker.task_redis.rpop(QUEUE_KEY))
+    tracker.task_redis.lpush(QUEUE_KEY, json.dumps({**payload, "job": "not_a_job"}))
+
+    await _run_queue(Worker(0, tracker=tracker))
+
+    assert tracker.get(task.id.hex).status == "failed"
+    assert not tracker.lock_redis.exists("_LOCK_pytest-lock")
+
+
+async def test_worker_liveness(tracker):
+    worker = Worker(0, tracker=tracker)
+    worker._beat()
+    assert tracker.task_redis.exists(worker.alive_key)
+    assert tracker.task_redis.sismember(WORKERS_KEY, worker.processing_key)
+
+    # Stopped cleanly, with an empty processing list
+    worker.stop()
+    await worker.run()
+    assert not tracker.task_redis.exists(worker.alive_key)
+
+
+def test_requeue_orphaned_jobs(tracker):
+    tracker.enqueue("pytest_job", {"value": 1})
+    tracker.enqueue("pytest_job", {"value": 2})
+
+    # One worker died running a job, on a host which never came back
+    dead_key = f"{PROCESSING_KEY_PREFIX}gone:0"
+    tracker.task_redis.sadd(WORKERS_KEY, dead_key)
+    tracker.task_redis.lmove(QUEUE_KEY, dead_key, "RIGHT", "LEFT")
+    # Another is alive, and running a job
+    live_key = f"{PROCESSING_KEY_PREFIX}here:0"
+    tracker.task_redis.sadd(WORKERS_KEY, live_key)
+    tracker.task_redis.set(f"{WORKER_ALIVE_PREFIX}here:0", 1)
+    tracker.task_redis.lmove(QUEUE_KEY, live_key, "RIGHT", "LEFT")
+
+    assert tracker.requeue_orphaned_jobs() == 1
+    assert json.loads(tracker.task_redis.lindex(QUEUE_KEY, -1))["kwargs"] == {
+        "value": 1
+    }
+    assert tracker.task_redis.llen(dead_key) == 0
+    assert not tracker.task_redis.sismember(WORKERS_KEY, dead_key)
+    # Live workers keep their jobs
+    assert tracker.task_redis.llen(live_key) == 1
@@ -1,11 +1,45 @@
+import asyncio
+import datetime
+import time
+from decimal import Decimal
+
+import httpx
 import pytest
-from pydantic import BaseModel
+from fastapi import Depends, FastAPI, HTTPException
+from pydantic import BaseModel, Field
+from redis import RedisError
+from starlette.requests import Request
+from starlette.responses import Response
 
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.schemas.base import JSONModel
+from ukrdc_fastapi.utils import cache
 from ukrdc_fastapi.utils.cache import (
+    _PROCESS_ID,
+    LOCK_KEY_PREFIX,
+    META_KEY_PREFIX,
+    TAG_KEY_PREFIX,
     BasicCache,
+    BinaryCodec,
     CacheNotSetException,
     DynamicCacheKey,
+    FacilityCachePrefix,
+    JsonCodec,
+    LocalCache,
     PytestCachePrefix,
+    ResponseBodyCodec,
+    ResponseCache,
+    _handle_invalidation,
+    content_digest,
+    decode_value,
+    facility_tag,
+    flush_delayed_invalidations,
+    invalidate_facility,
+    invalidate_facility_later,
+    invalidate_tags,
+    local_cache,
+    prefix_tag,
+    watch_key,
 )
 
 
@@ -106,3 +140,545 @@ def test_basic_cache_restore(redis_session):
 
     # Redis value should match in-memory value
     assert cache_1.get() == cache_2.get()
+
+
+def test_basic_cache_restore_ttl(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "6")
+
+    cache_1 = BasicCache(redis_session, cache_key)
+    cache_1.set("foo", expire=60)
+
+    # TTL should be fetched alongside the value
+    cache_2 = BasicCache(redis_session, cache_key)
+    assert cache_2._ttl is not None
+    assert 0 < cache_2._ttl <= 60
+
+
+def test_basic_cache_restore_no_expiry(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "7")
+
+    cache_1 = BasicCache(redis_session, cache_key)
+    cache_1.set("foo")
+
+    cache_2 = BasicCache(redis_session, cache_key)
+    assert cache_2.get() == "foo"
+    assert cache_2._ttl is None
+
+
+def test_local_cache_lru_eviction():
+    cache = LocalCache(max_items=2, max_seconds=60)
+    cache.put("a", '"a"', "a", "digest", None)
+    cache.put("b", '"b"', "b", "digest", None)
+
+    # Touch "a" so "b" becomes the least recently used entry
+    assert cache.get("a") is not None
+    cache.put("c", '"c"', "c", "digest", None)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+
+def test_local_cache_expiry():
+    cache = LocalCache(max_items=2, max_seconds=60)
+    # Local entries never outlive their Redis key
+    cache.put("a", '"a"', "a", "digest", 0)
+    assert cache.get("a") is None
+
+
+def test_basic_cache_local(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "8")
+
+    cache_1 = BasicCache(redis_session, cache_key, local=True)
+    cache_1.set({"foo": "bar"}, expire=60)
+
+    # Remove the value from Redis, the local tier should still serve it
+    redis_session.delete(cache_key.value)
+    cache_2 = BasicCache(redis_session, cache_key, local=True)
+    assert cache_2.get() == {"foo": "bar"}
+    assert cache_2._ttl is not None
+
+    # Non-local caches always read from Redis
+    cache_3 = BasicCache(redis_session, cache_key)
+    assert cache_3.exists is False
+
+
+def test_basic_cache_local_invalidation(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "9")
+
+    cache_1 = BasicCache(redis_session, cache_key, local=True)
+    cache_1.set("foo", expire=60)
+    assert local_cache.get(cache_key.value) is not None
+
+    # Our own invalidation messages are ignored
+    _handle_invalidation({"data": f"{_PROCESS_ID}:{cache_key.value}"})
+    assert local_cache.get(cache_key.value) is not None
+
+    # Messages from other workers evict the local copy
+    _handle_invalidation({"data": f"otherprocess:{cache_key.value}"})
+    assert local_cache.get(cache_key.value) is None
+
+
+def test_watch_key(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "watched")
+    changes = []
+    watch_key(cache_key, lambda: changes.append(True))
+
+    # Our own writes
+    BasicCache(redis_session, cache_key).set("foo", expire=60)
+    assert len(changes) == 1
+
+    # Writes or invalidations by other workers
+    _handle_invalidation({"data": f"otherprocess:{cache_key.value}"})
+    assert len(changes) == 2
+
+    # Tag invalidation
+    invalidate_tags(redis_session, [prefix_tag(PytestCachePrefix.PYTEST)])
+    assert len(changes) == 3
+
+
+def _request(headers: dict[str, str] | None = None) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "headers": [
+                (key.lower().encode(), value.encode())
+                for key, value in (headers or {}).items()
+            ],
+        }
+    )
+
+
+def test_response_cache_etag_stable(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "10")
+
+    cache_1 = ResponseCache(redis_session, cache_key, _request(), Response())
+    cache_1.set({"foo": "bar"}, expire=60)
+
+    # ETag is a digest of the cached content, so matches across processes
+    cache_2 = ResponseCache(redis_session, cache_key, _request(), Response())
+    assert cache_2.etag == cache_1.etag
+    assert cache_2.etag == f'W/"{content_digest(cache_1._cached_data)}"'
+
+    # The digest is stored alongside the value, rather than recomputed
+    assert (
+        redis_session.hget(f"{META_KEY_PREFIX}{cache_key.value}", "digest")
+        == cache_1.digest
+    )
+
+
+def test_response_cache_not_modified(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "11")
+
+    cache_1 = ResponseCache(redis_session, cache_key, _request(), Response())
+    cache_1.set({"foo": "bar"}, expire=60)
+    cache_1.prepare_response()
+    assert cache_1.etag
+
+    request = _request({"If-None-Match": cache_1.etag})
+    cache_2 = ResponseCache(redis_session, cache_key, request, Response())
+    with pytest.raises(HTTPException) as exc:
+        cache_2.prepare_response()
+    assert exc.value.status_code == 304
+    assert exc.value.headers["ETag"] == cache_1.etag
+
+
+def test_response_cache_modified(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "12")
+
+    cache_1 = ResponseCache(redis_session, cache_key, _request(), Response())
+    cache_1.set({"foo": "bar"}, expire=60)
+
+    request = _request({"If-None-Match": 'W/"outdated"'})
+    response = Response()
+    cache_2 = ResponseCache(redis_session, cache_key, request, response)
+    cache_2.prepare_response()
+    assert response.headers["ETag"] == cache_1.etag
+
+
+def _make_stale(redis_session, cache_key: DynamicCacheKey):
+    # Move the soft expiry into the past, leaving the hard expiry in place
+    redis_session.hset(
+        f"{META_KEY_PREFIX}{cache_key.value}", "fresh_until", str(time.time() - 1)
+    )
+
+
+def test_basic_cache_stale(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "13")
+
+    cache_1 = BasicCache(redis_session, cache_key)
+    cache_1.set("foo", expire=60, stale_for=60)
+
+    cache_2 = BasicCache(redis_session, cache_key)
+    assert cache_2.stale is False
+    assert 0 < cache_2._ttl <= 60
+
+    # Value outlives its soft expiry in Redis
+    assert redis_session.ttl(cache_key.value) > 60
+
+    _make_stale(redis_session, cache_key)
+    cache_3 = BasicCache(redis_session, cache_key)
+    assert cache_3.exists is True
+    assert cache_3.stale is True
+    assert cache_3._ttl == 0
+    assert cache_3.get() == "foo"
+
+
+def test_populate_missing(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "14")
+
+    cache = BasicCache(redis_session, cache_key)
+    cache.populate(lambda: "foo", expire=60, stale_for=60)
+
+    assert cache.get() == "foo"
+    assert BasicCache(redis_session, cache_key).get() == "foo"
+    # The recompute lock is released afterwards
+    assert not redis_session.exists(f"{LOCK_KEY_PREFIX}{cache_key.value}")
+
+
+def test_populate_fresh(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "15")
+    BasicCache(redis_session, cache_key).set("foo", expire=60, stale_for=60)
+
+    def compute():
+        raise AssertionError("Fresh values should not be recomputed")
+
+    cache = BasicCache(redis_session, cache_key)
+    cache.populate(compute, expire=60, stale_for=60)
+    assert cache.get() == "foo"
+
+
+def test_populate_stale(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "16")
+    BasicCache(redis_session, cache_key).set("foo", expire=60, stale_for=60)
+    _make_stale(redis_session, cache_key)
+
+    cache = BasicCache(redis_session, cache_key)
+    cache.populate(lambda: "bar", expire=60, stale_for=60)
+
+    assert cache.get() == "bar"
+    assert cache.stale is False
+    assert BasicCache(redis_session, cache_key).stale is False
+
+
+def test_populate_stale_while_locked(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "17")
+    BasicCache(redis_session, cache_key).set("foo", expire=60, stale_for=60)
+    _make_stale(redis_session, cache_key)
+
+    # Another request is already recomputing the value
+    redis_session.set(f"{LOCK_KEY_PREFIX}{cache_key.value}", "other")
+
+    def compute():
+        raise AssertionError("Only the lock holder should recompute")
+
+    cache = BasicCache(redis_session, cache_key)
+    cache.populate(compute, expire=60, stale_for=60)
+    assert cache.get() == "foo"
+    assert cache.stale is True
+
+
+def test_populate_missing_while_locked(redis_session, monkeypatch):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "25")
+    monkeypatch.setattr(settings, "cache_lock_wait_seconds", 1)
+
+    # Another request is computing the value, but never finishes
+    redis_session.set(f"{LOCK_KEY_PREFIX}{cache_key.value}", "other")
+
+    started = time.monotonic()
+    cache = BasicCache(redis_session, cache_key)
+    cache.populate(lambda: "foo", expire=60)
+
+    # The wait is bounded, after which the value is computed anyway
+    assert time.monotonic() - started < 5
+    assert cache.get() == "foo"
+    # The other request's lock is left alone
+    assert redis_session.get(f"{LOCK_KEY_PREFIX}{cache_key.value}") == "other"
+
+
+def test_binary_codec_round_trip():
+    obj = {
+        "datetime": datetime.datetime(2022, 1, 2, 3, 4, 5, tzinfo=datetime.UTC),
+        "date": datetime.date(2022, 1, 2),
+        "decimal": Decimal("1.10"),
+        "tuple": (1, 2.5, None, True),
+        "model": PydanticModel(
+            string="string",
+            int=1,
+            float=1.0,
+            bool=True,
+            sub_model=PydanticSubModel(inner_string="inner", inner_int=2),
+        ),
+    }
+
+    assert decode_value(BinaryCodec().encode(obj)) == {
+        "datetime": datetime.datetime(2022, 1, 2, 3, 4, 5, tzinfo=datetime.UTC),
+        "date": datetime.date(2022, 1, 2),
+        "decimal": Decimal("1.10"),
+        "tuple": [1, 2.5, None, True],
+        "model": {
+            "string": "string",
+            "int": 1,
+            "float": 1.0,
+            "bool": True,
+            "sub_model": {"inner_string": "inner", "inner_int": 2},
+        },
+    }
+
+
+@pytest.mark.parametrize("codec_class", [JsonCodec, BinaryCodec])
+def test_codec_compression(codec_class):
+    obj = ["foo"] * 1000
+
+    compressed = codec_class(compress_min_bytes=1024).encode(obj)
+    uncompressed = codec_class(compress_min_bytes=0).encode(obj)
+
+    assert compressed[:2] == codec_class.tag + b"z"
+    assert uncompressed[:2] == codec_class.tag + b"-"
+    assert len(compressed) < len(uncompressed)
+    assert decode_value(compressed) == decode_value(uncompressed) == obj
+
+
+def test_basic_cache_binary_codec(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "18")
+    timestamp = datetime.datetime(2022, 1, 2, 3, 4, 5)
+
+    cache_1 = BasicCache(redis_session, cache_key, codec=BinaryCodec())
+    cache_1.set({"timestamp": timestamp})
+
+    # Values are decoded with the codec that wrote them, regardless of our own
+    cache_2 = BasicCache(redis_session, cache_key)
+    assert cache_2.get() == {"timestamp": timestamp}
+    assert cache_2.digest == cache_1.digest
+
+
+def test_basic_cache_legacy_json(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "19")
+    redis_session.set(cache_key.value, '{"foo": "bar"}')
+
+    cache = BasicCache(redis_session, cache_key)
+    assert cache.get() == {"foo": "bar"}
+
+
+def test_basic_cache_undecodable(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "20")
+    redis_session.set(cache_key.value, b"m-\xff\x00")
+
+    cache = BasicCache(redis_session, cache_key)
+    assert cache.exists is False
+
+
+class ResponseBodyModel(JSONModel):
+    snake_case: str
+    timestamp: datetime.datetime
+    ratio: float
+    items: list[PydanticSubModel] = Field(default_factory=list)
+
+
+def _response_body_app(redis_session) -> FastAPI:
+    app = FastAPI()
+    value = ResponseBodyModel(
+        snake_case="foo",
+        timestamp=datetime.datetime(2022, 1, 2, 3, 4, 5, 678, tzinfo=datetime.UTC),
+        ratio=0.1,
+        items=[PydanticSubModel(inner_string="bar", inner_int=1)],
+    )
+
+    def _cache(request: Request, response: Response) -> ResponseCache:
+        cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "21")
+        return ResponseCache(
+            redis_session,
+            cache_key,
+            request,
+            response,
+            response_model=ResponseBodyModel,
+        )
+
+    @app.get("/uncached", response_model=ResponseBodyModel)
+    def uncached():
+        return value
+
+    @app.get("/cached", response_model=ResponseBodyModel)
+    def cached(cache: ResponseCache = Depends(_cache)):
+        if not cache.exists:
+            cache.set(value, expire=60)
+        cache.prepare_response()
+        return cache.json_response()
+
+    return app
+
+
+async def test_response_cache_json_response(redis_session):
+    app = _response_body_app(redis_session)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        uncached = await client.get("/uncached")
+        miss = await client.get("/cached")
+        hit = await client.get("/cached")
+
+    # Cached bodies match FastAPI's own serialisation exactly, on miss and hit
+    assert miss.content == uncached.content
+    assert hit.content == uncached.content
+    assert hit.headers["Content-Type"] == uncached.headers["Content-Type"]
+    assert hit.headers["ETag"] == miss.headers["ETag"]
+    assert "Cache-Control" in hit.headers
+
+
+def test_response_cache_json_response_legacy_value(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "22")
+    request = _request()
+
+    # Value cached before the route opted in to caching response bodies
+    BasicCache(redis_session, cache_key).set(
+        {"snake_case": "foo", "timestamp": "2022-01-02T03:04:05", "ratio": 0.5}
+    )
+
+    cache = ResponseCache(
+        redis_session, cache_key, request, Response(), response_model=ResponseBodyModel
+    )
+    assert cache.json_response().body == ResponseBodyCodec(ResponseBodyModel).dumps(
+        cache.get()
+    )
+
+
+def test_response_cache_json_response_no_model(redis_session):
+    cache_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "23")
+    cache = ResponseCache(redis_session, cache_key, _request(), Response())
+    cache.set({"foo": "bar"})
+
+    with pytest.raises(ValueError):
+        cache.json_response()
+
+
+def test_dynamic_cache_key_tags():
+    cache_key = DynamicCacheKey(FacilityCachePrefix.KRT, "tsf01", "2022-01-01")
+    assert cache_key.tags == [prefix_tag(FacilityCachePrefix.KRT), "facility:TSF01"]
+
+    pytest_key = DynamicCacheKey(PytestCachePrefix.PYTEST, "24")
+    assert pytest_key.tags == [prefix_tag(PytestCachePrefix.PYTEST)]
+
+
+def test_tags_written_with_value(redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.KRT, "TSF01", "2022-01-01")
+    BasicCache(redis_session, cache_key).set("foo", expire=60, stale_for=60)
+
+    tag_key = f"{TAG_KEY_PREFIX}{facility_tag('TSF01')}"
+    assert redis_session.smembers(tag_key) == {cache_key.value}
+    # Tag sets live as long as their longest-lived key
+    assert 60 < redis_session.ttl(tag_key) <= 120
+
+
+def test_tag_set_persists_with_unexpiring_key(redis_session):
+    expiring_key = DynamicCacheKey(FacilityCachePrefix.KRT, "TSF01", "2022-01-01")
+    BasicCache(redis_session, expiring_key).set("foo", expire=60)
+    unexpiring_key = DynamicCacheKey(FacilityCachePrefix.KRT, "TSF01", "2022-02-01")
+    BasicCache(redis_session, unexpiring_key).set("bar")
+
+    tag_key = f"{TAG_KEY_PREFIX}{facility_tag('TSF01')}"
+    assert redis_session.ttl(tag_key) == -1
+
+    invalidate_facility(redis_session, "TSF01")
+    assert not redis_session.exists(unexpiring_key.value)
+
+
+def test_invalidate_facility(redis_session):
+    facility_keys = [
+        DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01"),
+        DynamicCacheKey(FacilityCachePrefix.KRT, "TSF01", "2022-01-01", "2022-02-01"),
+    ]
+    other_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF02")
+    for cache_key in [*facility_keys, other_key]:
+        BasicCache(redis_session, cache_key).set("foo", expire=60)
+
+    result = invalidate_facility(redis_session, "TSF01")
+    assert result.invalidated == 2
+
+    for cache_key in facility_keys:
+        assert BasicCache(redis_session, cache_key).exists is False
+        assert not redis_session.exists(f"{META_KEY_PREFIX}{cache_key.value}")
+    assert BasicCache(redis_session, other_key).exists is True
+
+    # Nothing left to invalidate
+    assert invalidate_facility(redis_session, "TSF01").invalidated == 0
+
+
+def test_invalidate_prefix(redis_session):
+    krt_keys = [
+        DynamicCacheKey(FacilityCachePrefix.KRT, "TSF01"),
+        DynamicCacheKey(FacilityCachePrefix.KRT, "TSF02"),
+    ]
+    root_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01")
+    for cache_key in [*krt_keys, root_key]:
+        BasicCache(redis_session, cache_key).set("foo", expire=60)
+
+    result = invalidate_tags(redis_session, [prefix_tag(FacilityCachePrefix.KRT)])
+    assert result.invalidated == 2
+    assert BasicCache(redis_session, root_key).exists is True
+
+
+def test_invalidate_evicts_local_cache(redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01")
+    BasicCache(redis_session, cache_key, local=True).set("foo", expire=60)
+    assert local_cache.get(cache_key.value) is not None
+
+    invalidate_facility(redis_session, "TSF01")
+    assert local_cache.get(cache_key.value) is None
+
+
+async def test_invalidate_facility_later(redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01")
+    BasicCache(redis_session, cache_key).set("foo")
+
+    task = invalidate_facility_later(redis_session, "TSF01", 0)
+    assert redis_session.exists(cache_key.value)
+
+    await task
+    assert not redis_session.exists(cache_key.value)
+
+
+async def test_invalidate_facility_later_error(redis_session, monkeypatch, caplog):
+    def _fail(*_):
+        raise RedisError("Connection lost")
+
+    monkeypatch.setattr(cache, "invalidate_facility", _fail)
+
+    task = invalidate_facility_later(redis_session, "TSF01", 0)
+    await asyncio.wait([task])
+    # Let the done callback run
+    await asyncio.sleep(0)
+    assert "Delayed cache invalidation failed for facility TSF01" in caplog.text
+
+
+async def test_flush_delayed_invalidations(redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TSF01")
+    BasicCache(redis_session, cache_key).set("foo")
+
+    task = invalidate_facility_later(redis_session, "TSF01", 60)
+    flush_delayed_invalidations(redis_session)
+    assert not redis_session.exists(cache_key.value)
+
+    await asyncio.wait([task])
+    assert task.cancelled()
+
+
+def test_basic_cache_renew(redis_session):
+    cache = BasicCache(redis_session, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    cache.set({"value": 1}, expire=10)
+    digest = cache.digest
+
+    cache = BasicCache(redis_session, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    cache.renew(expire=100, stale_for=50)
+
+    # Same value, with the new expiry
+    assert redis_session.ttl(cache.key) > 100
+    cache = BasicCache(redis_session, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    assert cache.get() == {"value": 1}
+    assert cache.digest == digest
+    assert not cache.stale
+
+
+def test_basic_cache_renew_empty(redis_session):
+    cache = BasicCache(redis_session, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    with pytest.raises(CacheNotSetException):
+        cache.renew(expire=100)
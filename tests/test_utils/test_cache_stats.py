@@ -0,0 +1,63 @@
+import fakeredis
+from redis.exceptions import ConnectionError
+
+from ukrdc_fastapi.utils.cache import (
+    BasicCache,
+    DynamicCacheKey,
+    FacilityCachePrefix,
+)
+from ukrdc_fastapi.utils.cache_stats import CacheStats, cache_stats, get_cache_stats
+
+
+def _stats_by_prefix(redis):
+    return {item.prefix: item for item in get_cache_stats(redis)}
+
+
+def test_cache_stats_lookups(redis_session):
+    cache_key = DynamicCacheKey(FacilityCachePrefix.EXTRACTS, "TSF01")
+
+    cache = BasicCache(redis_session, cache_key)
+    cache.set({"foo": "bar"}, expire=60)
+    BasicCache(redis_session, cache_key)
+    BasicCache(redis_session, cache_key)
+
+    stats = _stats_by_prefix(redis_session)[FacilityCachePrefix.EXTRACTS.value]
+    assert stats.misses == 1
+    assert stats.hits == 2
+    assert stats.hit_ratio == 2 / 3
+    assert stats.recomputes == 1
+    assert stats.mean_recompute_seconds is not None
+    assert stats.writes == 1
+    assert stats.mean_payload_bytes == len(cache._cached_data)
+    # Three lookups and one write
+    assert stats.redis_calls == 4
+    assert stats.mean_redis_seconds is not None
+
+
+def test_cache_stats_merged_across_workers(redis_session):
+    worker_1 = CacheStats()
+    worker_2 = CacheStats()
+
+    worker_1.record("pytest:stats", hits=2, misses=1)
+    worker_2.record("pytest:stats", hits=3)
+    worker_1.flush(redis_session)
+    worker_2.flush(redis_session)
+
+    stats = _stats_by_prefix(redis_session)["pytest:stats"]
+    assert stats.hits == 5
+    assert stats.misses == 1
+
+
+def test_cache_stats_flush_error(redis_session):
+    broken_redis = fakeredis.FakeRedis(decode_responses=True)
+    broken_redis.connection_pool.connection_kwargs["connected"] = False
+
+    cache_stats.record("pytest:broken", hits=1)
+    try:
+        cache_stats.flush(broken_redis)
+    except ConnectionError:  # pragma: no cover
+        raise AssertionError("Flush errors should not be raised")
+
+    # Counters are kept, and flushed on the next attempt
+    cache_stats.flush(redis_session)
+    assert redis_session.hget("cache-stats:pytest:broken", "hits") == "1"
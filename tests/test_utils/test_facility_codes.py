@@ -0,0 +1,63 @@
+from tests.utils import create_basic_facility
+from ukrdc_fastapi.query.facilities import get_facilities
+from ukrdc_fastapi.utils.facility_codes import FacilityCodeIndex, facility_codes
+
+
+def test_facility_codes_loaded(ukrdc3_session):
+    index = FacilityCodeIndex(max_seconds=60)
+    codes = index.get(ukrdc3_session)
+    assert isinstance(codes, frozenset)
+    assert {"TSF01", "TSF02"} <= codes
+    assert index.contains("TSF01", ukrdc3_session)
+    assert not index.contains("NOPE", ukrdc3_session)
+
+
+def test_facility_codes_held_until_invalidated(ukrdc3_session):
+    index = FacilityCodeIndex(max_seconds=60)
+    index.get(ukrdc3_session)
+
+    create_basic_facility("TSF99", "TSF99_DESCRIPTION", ukrdc3_session)
+    ukrdc3_session.commit()
+
+    # No query until the index is invalidated
+    assert not index.contains("TSF99", ukrdc3_session)
+    index.invalidate()
+    assert index.contains("TSF99", ukrdc3_session)
+
+
+def test_facility_codes_expire(ukrdc3_session):
+    index = FacilityCodeIndex(max_seconds=0)
+    index.get(ukrdc3_session)
+
+    create_basic_facility("TSF99", "TSF99_DESCRIPTION", ukrdc3_session)
+    ukrdc3_session.commit()
+
+    assert index.contains("TSF99", ukrdc3_session)
+
+
+def test_facility_codes_invalidated_with_facilities_cache(
+    ukrdc3_session, errorsdb_session, redis_session
+):
+    facility_codes.get(ukrdc3_session)
+
+    create_basic_facility("TSF99", "TSF99_DESCRIPTION", ukrdc3_session)
+    ukrdc3_session.commit()
+    assert not facility_codes.contains("TSF99", ukrdc3_session)
+
+    # Rebuilding the facilities list cache drops the loaded codes
+    get_facilities(ukrdc3_session, errorsdb_session, redis_session)
+    assert facility_codes.contains("TSF99", ukrdc3_session)
+
+
+def test_facility_codes_exists(ukrdc3_session):
+    index = FacilityCodeIndex(max_seconds=60)
+    index.get(ukrdc3_session)
+
+    create_basic_facility("TSF99", "TSF99_DESCRIPTION", ukrdc3_session)
+    ukrdc3_session.commit()
+
+    # Codes not yet loaded are looked up, and picked up by the next reload
+    assert not index.contains("TSF99", ukrdc3_session)
+    assert index.exists("TSF99", ukrdc3_session)
+    assert index.contains("TSF99", ukrdc3_session)
+    assert not index.exists("NOPE", ukrdc3_session)
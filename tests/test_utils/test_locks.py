@@ -0,0 +1,47 @@
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock, renew_lock
+
+
+def test_acquire_lock(redis_session):
+    token = acquire_lock(redis_session, "pytest:lock", 60)
+    assert token is not None
+    assert redis_session.ttl("pytest:lock") > 0
+
+    # Lock is already held
+    assert acquire_lock(redis_session, "pytest:lock", 60) is None
+
+
+def test_acquire_lock_with_token(redis_session):
+    assert (
+        acquire_lock(redis_session, "pytest:lock", 60, token="my-token") == "my-token"
+    )
+    assert redis_session.get("pytest:lock") == "my-token"
+
+
+def test_release_lock(redis_session):
+    token = acquire_lock(redis_session, "pytest:lock", 60)
+    assert release_lock(redis_session, "pytest:lock", token)
+
+    # Lock can be acquired again once released
+    assert acquire_lock(redis_session, "pytest:lock", 60) is not None
+
+
+def test_release_lock_wrong_token(redis_session):
+    acquire_lock(redis_session, "pytest:lock", 60)
+
+    # Locks held by someone else are left alone
+    assert not release_lock(redis_session, "pytest:lock", "not-my-token")
+    assert redis_session.exists("pytest:lock")
+
+
+def test_renew_lock(redis_session):
+    token = acquire_lock(redis_session, "pytest:lock", 10)
+    assert renew_lock(redis_session, "pytest:lock", token, 60)
+    assert redis_session.ttl("pytest:lock") > 10
+
+
+def test_renew_lock_wrong_token(redis_session):
+    acquire_lock(redis_session, "pytest:lock", 10)
+
+    # Locks held by someone else are left alone
+    assert not renew_lock(redis_session, "pytest:lock", "not-my-token", 60)
+    assert redis_session.ttl("pytest:lock") <= 10
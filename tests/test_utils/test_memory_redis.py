@@ -0,0 +1,227 @@
+import time
+
+import pytest
+from redis.client import NEVER_DECODE
+from redis.exceptions import ResponseError, WatchError
+
+from ukrdc_fastapi.dependencies import auth
+from ukrdc_fastapi.exceptions import TaskLockError
+from ukrdc_fastapi.utils.cache import (
+    BasicCache,
+    DynamicCacheKey,
+    FacilityCachePrefix,
+    PytestCachePrefix,
+    invalidate_facility,
+)
+from ukrdc_fastapi.utils.cache_stats import cache_stats, get_cache_stats
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock
+from ukrdc_fastapi.utils.memory_redis import MemoryRedis
+from ukrdc_fastapi.utils.tasks import TaskTracker
+
+
+@pytest.fixture
+def memory_redis():
+    return MemoryRedis(decode_responses=True)
+
+
+def test_strings(memory_redis):
+    assert memory_redis.get("key") is None
+    assert memory_redis.set("key", 1)
+    assert memory_redis.get("key") == "1"
+    assert memory_redis.exists("key", "missing") == 1
+    assert memory_redis.delete("key", "missing") == 1
+
+
+def test_decode_responses():
+    raw_redis = MemoryRedis(decode_responses=False)
+    raw_redis.set("key", "value")
+    assert raw_redis.get("key") == b"value"
+
+
+def test_set_nx(memory_redis):
+    assert memory_redis.set("key", "first", nx=True)
+    assert memory_redis.set("key", "second", nx=True) is None
+    assert memory_redis.get("key") == "first"
+
+
+def test_expiry(memory_redis, monkeypatch):
+    memory_redis.set("key", "value", ex=10)
+    assert memory_redis.ttl("key") == 10
+    assert memory_redis.ttl("missing") == -2
+
+    # Jump past the expiry time
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert memory_redis.get("key") is None
+    assert memory_redis.ttl("key") == -2
+
+
+def test_expire_conditions(memory_redis):
+    memory_redis.set("key", "value")
+    assert memory_redis.ttl("key") == -1
+
+    assert memory_redis.expire("key", 10, nx=True)
+    assert not memory_redis.expire("key", 100, nx=True)
+    assert not memory_redis.expire("key", 5, gt=True)
+    assert memory_redis.expire("key", 100, gt=True)
+    assert memory_redis.ttl("key") == 100
+
+    assert memory_redis.persist("key")
+    assert memory_redis.ttl("key") == -1
+
+
+def test_hashes_and_sets(memory_redis):
+    memory_redis.hset("hash", mapping={"a": 1, "b": "two"})
+    assert memory_redis.hgetall("hash") == {"a": "1", "b": "two"}
+    assert memory_redis.hincrby("hash", "a", 2) == 3
+    assert memory_redis.hincrbyfloat("hash", "c", 0.5) == 0.5
+
+    assert memory_redis.sadd("set", "a", "b", "a") == 2
+    assert memory_redis.smembers("set") == {"a", "b"}
+
+
+def test_sorted_sets(memory_redis):
+    assert memory_redis.zadd("zset", {"a": 1, "b": 2, "c": 3}) == 3
+    assert memory_redis.zrange("zset", 0, -1) == ["a", "b", "c"]
+    assert memory_redis.zrevrange("zset", 0, 1, withscores=True) == [
+        ("c", 3.0),
+        ("b", 2.0),
+    ]
+    assert memory_redis.zrangebyscore("zset", "-inf", 2) == ["a", "b"]
+    assert memory_redis.zrem("zset", "a") == 1
+    assert memory_redis.zcard("zset") == 2
+
+
+def test_wrong_type(memory_redis):
+    memory_redis.set("key", "value")
+    with pytest.raises(ResponseError):
+        memory_redis.hgetall("key")
+
+
+def test_scan_iter(memory_redis):
+    memory_redis.set("cache:1", 1)
+    memory_redis.set("cache:2", 2)
+    memory_redis.set("other", 3)
+    assert sorted(memory_redis.scan_iter(match="cache:*")) == ["cache:1", "cache:2"]
+
+    memory_redis.flushdb()
+    assert list(memory_redis.scan_iter()) == []
+
+
+def test_pipeline(memory_redis):
+    pipe = memory_redis.pipeline()
+    pipe.set("key", "value")
+    pipe.get("key")
+    assert pipe.execute() == [True, "value"]
+
+
+def test_pipeline_watch_error(memory_redis):
+    memory_redis.set("key", "value")
+    with memory_redis.pipeline() as pipe:
+        pipe.watch("key")
+        # Commands run immediately while watching
+        assert pipe.get("key") == "value"
+
+        # Another client changes the watched key before we commit
+        memory_redis.set("key", "changed")
+
+        pipe.multi()
+        pipe.delete("key")
+        with pytest.raises(WatchError):
+            pipe.execute()
+
+    assert memory_redis.get("key") == "changed"
+
+
+def test_pubsub(memory_redis):
+    messages = []
+    pubsub = memory_redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel=messages.append)
+    worker = pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    assert memory_redis.publish("channel", "hello") == 1
+    assert messages[0]["data"] == "hello"
+
+    worker.stop()
+    assert memory_redis.publish("channel", "hello") == 0
+
+
+def test_basic_cache(memory_redis):
+    cache = BasicCache(memory_redis, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    assert not cache.exists
+
+    cache.set({"value": 1}, expire=60)
+
+    cache = BasicCache(memory_redis, DynamicCacheKey(PytestCachePrefix.PYTEST, "1"))
+    assert cache.exists
+    assert cache.get() == {"value": 1}
+
+
+def test_basic_cache_invalidate_facility(memory_redis):
+    key = DynamicCacheKey(FacilityCachePrefix.ROOT, "TEST_SENDING_FACILITY_1")
+    BasicCache(memory_redis, key).set({"value": 1}, expire=60)
+
+    assert invalidate_facility(memory_redis, "TEST_SENDING_FACILITY_1").invalidated == 1
+    assert not BasicCache(memory_redis, key).exists
+
+
+def test_locks():
+    # Lock data is not decoded, as with the Redis locks database
+    lock_redis = MemoryRedis(decode_responses=False)
+    token = acquire_lock(lock_redis, "pytest:lock", 60)
+    assert token is not None
+    assert acquire_lock(lock_redis, "pytest:lock", 60) is None
+    assert release_lock(lock_redis, "pytest:lock", token)
+    assert acquire_lock(lock_redis, "pytest:lock", 60) is not None
+
+
+def test_cache_stats(memory_redis):
+    cache_stats.record("pytest", hits=2, misses=1, redis_seconds=0.5)
+    stats = get_cache_stats(memory_redis)
+    assert stats[0].hits == 2
+    assert stats[0].misses == 1
+
+
+async def test_task_tracker(memory_redis):
+    tracker = TaskTracker(
+        memory_redis, MemoryRedis(decode_responses=False), user=auth.auth.superuser
+    )
+
+    async def _func():
+        pass
+
+    task = tracker.create(_func, name="pytest", lock="pytest-lock")
+    # Lock is held until the task finishes
+    with pytest.raises(TaskLockError):
+        tracker.create(_func, name="pytest", lock="pytest-lock")
+
+    await task.tracked()
+
+    assert tracker.get(task.id.hex).status == "finished"
+    assert [task.id for task in tracker.get_all()] == [task.id]
+    tracker.create(_func, name="pytest", lock="pytest-lock")
+
+
+def test_lists(memory_redis):
+    memory_redis.lpush("queue", "a", "b")
+    assert memory_redis.lrange("queue", 0, -1) == ["b", "a"]
+
+    assert (
+        memory_redis.blmove("queue", "processing", 1, src="RIGHT", dest="LEFT") == "a"
+    )
+    assert memory_redis.llen("queue") == 1
+    assert memory_redis.lrem("processing", 1, "a") == 1
+    assert not memory_redis.exists("processing")
+
+    memory_redis.lpush("history", "a", "b", "c")
+    assert memory_redis.ltrim("history", 0, 1)
+    assert memory_redis.lrange("history", 0, -1) == ["c", "b"]
+
+
+def test_never_decode(memory_redis):
+    memory_redis.rpush("chunks", b"\xff\x00")
+
+    # Binary values can be read from a decoding client
+    assert memory_redis.execute_command(
+        "LRANGE", "chunks", 0, 0, **{NEVER_DECODE: []}
+    ) == [b"\xff\x00"]
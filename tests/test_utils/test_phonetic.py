@@ -0,0 +1,37 @@
+import pytest
+
+from ukrdc_fastapi.utils import phonetic
+
+
+@pytest.mark.parametrize(
+    "word,expected",
+    [
+        ("Smith", "S530"),
+        ("Smyth", "S530"),
+        ("Mohammed", "M530"),
+        ("Muhammad", "M530"),
+        ("Robert", "R163"),
+        ("Rupert", "R163"),
+        ("Tymczak", "T522"),
+        ("Pfister", "P236"),
+        ("Ashcraft", "A261"),
+        ("Lee", "L000"),
+        ("Zoë", "Z000"),
+        ("O'Brien", "O165"),
+    ],
+)
+def test_soundex(word, expected):
+    assert phonetic.soundex(word) == expected
+
+
+@pytest.mark.parametrize("word", ["", "123", "-"])
+def test_soundex_no_letters(word):
+    assert phonetic.soundex(word) is None
+
+
+def test_phonetic_keys():
+    assert phonetic.phonetic_keys(["Mary-Jane", "Smyth", None]) == {
+        "M600",
+        "J500",
+        "S530",
+    }
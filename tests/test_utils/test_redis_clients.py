@@ -0,0 +1,34 @@
+import redis
+
+from ukrdc_fastapi.dependencies import redis_clients
+from ukrdc_fastapi.dependencies.redis_clients import RedisDatabase
+
+
+def _pool_stats(monkeypatch, pool):
+    monkeypatch.setattr(redis_clients, "_pools", {RedisDatabase.CACHE: pool})
+    (stats,) = redis_clients.get_redis_pool_stats()
+    return stats
+
+
+def test_pool_stats(monkeypatch):
+    pool = redis.BlockingConnectionPool(max_connections=5)
+    stats = _pool_stats(monkeypatch, pool)
+
+    assert stats.database == "cache"
+    assert stats.max_connections == 5
+    assert stats.created_connections == 0
+    assert stats.in_use_connections == 0
+    assert stats.available_connections == 0
+
+
+def test_pool_stats_internals_missing(monkeypatch):
+    class _Pool:
+        max_connections = 5
+
+    # Pool internals may change between redis-py versions
+    stats = _pool_stats(monkeypatch, _Pool())
+
+    assert stats.max_connections == 5
+    assert stats.created_connections is None
+    assert stats.in_use_connections is None
+    assert stats.available_connections is None
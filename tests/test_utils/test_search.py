@@ -1,5 +1,15 @@
+from datetime import datetime
+
 import pytest
+from sqlalchemy import select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import SQLAlchemyError
+from ukrdc_sqla.ukrdc import PatientRecord
 
+from tests.conftest import NI_3, UKRDCID_1, UKRDCID_3, UKRDCID_4
+from tests.utils import create_basic_patient
+from ukrdc_fastapi.models.search import PhoneticName
+from ukrdc_fastapi.tasks import repeated
 from ukrdc_fastapi.utils import search
 
 
@@ -62,3 +72,189 @@ def test_nhs_number_normalization(term, expected):
 
     assert len(s.mrn_numbers) == 1
     assert s.mrn_numbers[0] == expected
+
+
+def _search(ukrdc3_session, **kwargs):
+    params = {
+        key: kwargs.get(key, [])
+        for key in ["mrn_number", "ukrdc_number", "full_name", "pids", "dob"]
+        + ["facility", "search"]
+    }
+    return search.search_ukrdcids(ukrdc3=ukrdc3_session, **params)
+
+
+def test_search_ukrdcids_single_group(ukrdc3_session):
+    assert _search(ukrdc3_session, dob=["1984-03-17"]) == {UKRDCID_1, UKRDCID_3}
+    assert _search(ukrdc3_session, full_name=["familyname3"]) == {UKRDCID_3}
+
+
+def test_search_ukrdcids_multiple_records(ukrdc3_session, jtrace_session):
+    # Add a second record for patient 3, from another facility
+    create_basic_patient(
+        5,
+        "PYTEST05:PV:00000000A",
+        UKRDCID_3,
+        NI_3,
+        "TSF01",
+        "UKRDC",
+        "00000000C",
+        "FAMILYNAME3",
+        "GIVENNAME3",
+        datetime(1984, 3, 17),
+        ukrdc3_session,
+        jtrace_session,
+    )
+    ukrdc3_session.commit()
+    jtrace_session.commit()
+
+    assert _search(ukrdc3_session, full_name=["familyname3"]) == {UKRDCID_3}
+    assert _search(ukrdc3_session, full_name=["familyname3"], facility=["TSF01"]) == {
+        UKRDCID_3
+    }
+
+
+def test_search_ukrdcids_intersection(ukrdc3_session):
+    assert _search(ukrdc3_session, dob=["1984-03-17"], facility=["TSF01"]) == {
+        UKRDCID_1
+    }
+    # Groups with no matches in common
+    assert (
+        _search(ukrdc3_session, dob=["1975-10-09"], full_name=["familyname3"]) == set()
+    )
+
+
+def test_search_ukrdcids_ignores_empty_groups(ukrdc3_session):
+    # "TSF01" is also searched as a name and MRN, which match nothing
+    assert _search(ukrdc3_session, search=["1984-03-17", "TSF01"]) == {UKRDCID_1}
+    assert _search(ukrdc3_session, full_name=["familyname3"], facility=["NOPE"]) == {
+        UKRDCID_3
+    }
+
+
+def test_search_ukrdcids_no_terms(ukrdc3_session):
+    assert _search(ukrdc3_session) == set()
+
+
+def _rank(ukrdc3_session, within=None, limit=None, **kwargs):
+    params = {
+        key: kwargs.get(key, [])
+        for key in ["mrn_number", "ukrdc_number", "full_name", "pids", "dob"]
+        + ["facility", "search"]
+    }
+    stmt = search.rank_ukrdcids(
+        ukrdc3=ukrdc3_session, within=within, limit=limit, **params
+    )
+    return [tuple(row) for row in ukrdc3_session.execute(stmt)]
+
+
+def test_rank_ukrdcids_exact_names_first(ukrdc3_session):
+    # Both prefix matches score the same, so are ordered by UKRDC ID
+    assert _rank(ukrdc3_session, full_name=["givenname"]) == [
+        (UKRDCID_3, search.SCORE_PREFIX_NAME),
+        (UKRDCID_4, search.SCORE_PREFIX_NAME),
+    ]
+    # Patient 4 matches a second term, exactly
+    assert _rank(ukrdc3_session, full_name=["givenname", "givenname4"]) == [
+        (UKRDCID_4, search.SCORE_PREFIX_NAME + search.SCORE_EXACT_NAME),
+        (UKRDCID_3, search.SCORE_PREFIX_NAME),
+    ]
+
+
+def test_rank_ukrdcids_sums_groups(ukrdc3_session):
+    assert _rank(ukrdc3_session, mrn_number=[NI_3], dob=["1984-03-17"]) == [
+        (UKRDCID_3, search.SCORE_EXACT_ID + search.SCORE_DOB)
+    ]
+
+
+def test_rank_ukrdcids_limit(ukrdc3_session):
+    assert _rank(ukrdc3_session, full_name=["givenname"], limit=1) == [
+        (UKRDCID_3, search.SCORE_PREFIX_NAME)
+    ]
+
+
+def test_rank_ukrdcids_within(ukrdc3_session):
+    within = select(PatientRecord.ukrdcid).where(
+        PatientRecord.sendingfacility == "TSF01"
+    )
+    assert _rank(ukrdc3_session, within=within, full_name=["givenname"]) == [
+        (UKRDCID_4, search.SCORE_PREFIX_NAME)
+    ]
+
+
+def test_rank_ukrdcids_no_terms(ukrdc3_session):
+    assert search.rank_ukrdcids([], [], [], [], [], [], [], ukrdc3_session) is None
+
+
+def _compile(stmt) -> str:
+    return str(
+        stmt.compile(
+            dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+        )
+    )
+
+
+def test_fuzzy_name_uses_indexed_expression():
+    # Queries only use the index if they match its expression exactly
+    expression = _compile(search._full_name_expression()).replace("name.", "")
+    assert f"(({expression}) gin_trgm_ops)" in search._NAME_TRIGRAM_INDEX_DDL
+
+    compiled = _compile(search.ukrdcids_from_fuzzy_name(['"smyth"']))
+    assert f"'smyth' <%% ({_compile(search._full_name_expression())})" in compiled
+
+
+@pytest.fixture(scope="function")
+def trigram_session(ukrdc3_session):
+    try:
+        ukrdc3_session.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        ukrdc3_session.commit()
+    except SQLAlchemyError:
+        pytest.skip("pg_trgm is not available")
+    return ukrdc3_session
+
+
+def test_search_ukrdcids_fuzzy(trigram_session):
+    # Typo in the family name
+    assert _search(trigram_session, full_name=["familynane3"]) == set()
+    assert search.search_ukrdcids(
+        [], [], ["familynane3"], [], [], [], [], trigram_session, fuzzy=True
+    ) == {UKRDCID_3}
+
+
+@pytest.fixture(scope="function")
+def phonetic_session(ukrdc3_session):
+    repeated._build_phonetic_index(ukrdc3_session)
+    return ukrdc3_session
+
+
+def _phonetic_search(ukrdc3_session, full_name, dob=()):
+    return search.search_ukrdcids(
+        [], [], full_name, [], list(dob), [], [], ukrdc3_session, phonetic=True
+    )
+
+
+def test_phonetic_name_table(ukrdc3_session):
+    assert search.phonetic_name_table_exists(ukrdc3_session)
+
+    ukrdc3_session.commit()
+    PhoneticName.__table__.drop(ukrdc3_session.get_bind())
+    assert not search.phonetic_name_table_exists(ukrdc3_session)
+
+    ukrdc3_session.commit()
+    search.create_phonetic_name_table(ukrdc3_session.get_bind())
+    assert search.phonetic_name_table_exists(ukrdc3_session)
+
+
+def test_search_ukrdcids_phonetic(phonetic_session):
+    # Patient 1 is Patrick Star
+    assert _search(phonetic_session, full_name=["starr"]) == set()
+    assert _phonetic_search(phonetic_session, ["starr"]) == {UKRDCID_1}
+    assert _phonetic_search(phonetic_session, ["Patrik Starr"]) == {UKRDCID_1}
+    # Every word in a term must match
+    assert _phonetic_search(phonetic_session, ["Squidward Starr"]) == set()
+
+
+def test_search_ukrdcids_phonetic_intersection(phonetic_session):
+    assert _phonetic_search(phonetic_session, ["starr"], dob=["1984-03-17"]) == {
+        UKRDCID_1
+    }
+    assert _phonetic_search(phonetic_session, ["starr"], dob=["1975-10-09"]) == set()
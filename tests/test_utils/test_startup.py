@@ -0,0 +1,18 @@
+from ukrdc_fastapi.utils.startup import StartupTimer
+
+
+def test_startup_timer():
+    timer = StartupTimer()
+
+    # Nothing is recorded until timing starts
+    timer.mark("serving")
+    assert timer.stages == {}
+
+    timer.start()
+    timer.mark("serving")
+    first = timer.stages["serving"]
+    assert first >= 0
+
+    # Only the first time a stage is reached is recorded
+    timer.mark("serving")
+    assert timer.stages["serving"] == first
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from . import __version__ as package_ver
@@ -52,8 +54,38 @@ class Settings(BaseSettings):
     cache_facilities_stats_demographics_seconds: int = 28800
     cache_facilities_stats_dialysis_seconds: int = 28800
 
+    # Extra time facility stats may be served stale while one request recomputes them
+    cache_facilities_stats_stale_seconds: int = 3600
+
+    # Maximum time one request may spend recomputing a cached value while others wait
+    cache_lock_timeout_seconds: int = 300
+    # Maximum time a request waits for another to cache a missing value, before
+    # computing it itself. Waiting blocks a worker thread, so keep this short.
+    cache_lock_wait_seconds: int = 5
+
+    # Mirth applies record updates asynchronously, so cached values derived from
+    # an updated record are invalidated again once it has likely been applied
+    cache_update_invalidate_delay_seconds: int = 60
+
     # Minimum number of records required to pre-cache facility dialysis stats
     cache_facilities_stats_dialysis_min: int = 1
+    # Processes used to pre-calculate facility dialysis stats in parallel
+    cache_facilities_stats_dialysis_processes: int = 4
+    # Cron expression to pre-calculate facility dialysis stats on, e.g. "0 2 * * *".
+    # Defaults to every `cache_facilities_stats_dialysis_seconds`.
+    cache_facilities_stats_dialysis_cron: str | None = None
+
+    # In-process cache tier for hot keys, invalidated across workers via pub/sub
+    cache_local_enabled: bool = True
+    cache_local_max_items: int = 128
+    cache_local_max_seconds: int = 300
+
+    # Cached values at least this many bytes are zlib compressed (0 to disable)
+    cache_compress_min_bytes: int = 16384
+
+    # Cache hit/miss/latency statistics, merged across workers every few seconds
+    cache_stats_enabled: bool = True
+    cache_stats_flush_seconds: int = 10
 
     # Authentication settings
 
@@ -71,6 +103,10 @@ class Settings(BaseSettings):
 
     # Redis settings
 
+    # "memory" keeps cache, task, and lock data in process memory instead of
+    # Redis. Only suitable for a single worker process, e.g. development and tests.
+    redis_backend: Literal["redis", "memory"] = "redis"
+
     redis_host: str = "localhost"
     redis_port: int = 6379
 
@@ -84,6 +120,22 @@ class Settings(BaseSettings):
     redis_tasks_expire: int = 86400
     redis_tasks_expire_error: int = 259200
     redis_tasks_expire_lock: int = 60
+    # Minimum time between writes of a running task's progress to Redis
+    redis_tasks_progress_seconds: float = 2.0
+    # Time between heartbeats of running tasks, and the time without one after
+    # which a task is considered orphaned, failed, and its lock released
+    redis_tasks_heartbeat_seconds: float = 10.0
+    redis_tasks_heartbeat_timeout: int = 60
+    # Time a task may wait to start, without heartbeats, before it is considered
+    # orphaned, failed, and its lock released
+    redis_tasks_pending_timeout: int = 600
+    # Size of the chunks task results are stored and streamed in
+    redis_tasks_result_chunk_bytes: int = 262144
+
+    # Shared Redis connection pools (one pool per logical database)
+    redis_max_connections: int = 50
+    redis_pool_timeout: int = 20
+    redis_health_check_interval: int = 30
 
     # SQLite databases
     sqlite_data_dir: str = "./data"
@@ -126,9 +178,36 @@ class Settings(BaseSettings):
     audit_name: str = "auditdb"
     audit_driver: str = "postgresql+psycopg2"
 
+    # Minimum word similarity (0-1) of names matched by fuzzy search, which
+    # needs the pg_trgm name index created by `scripts/search/create_name_index.py`
+    search_fuzzy_name_threshold: float = 0.6
+    # Phonetic name index, updated for changed records by a repeated task
+    search_phonetic_index_seconds: int = 3600
+    search_phonetic_index_batch_size: int = 5000
+    # Most relevant patients returned by record search, however broad the query
+    search_max_results: int = 1000
+
     # Threading
     background_threads: int = 4
 
+    # Repeated tasks run on one worker at a time, holding a lease in Redis.
+    # Another worker takes over if the lease is not renewed in time.
+    leader_lease_seconds: int = 30
+
+    # Maximum random delay added to each scheduled run of a repeated task
+    scheduler_jitter_seconds: float = 10
+    # Lock timeout of a running exclusive repeated task, renewed while it runs
+    scheduler_lock_seconds: int = 300
+    # Number of recent runs of each repeated task recorded in Redis
+    scheduler_history_length: int = 50
+
+    # Queue heavy background tasks to run in separate worker processes, started
+    # with `python -m ukrdc_fastapi.worker`, instead of in the API process
+    task_queue_enabled: bool = False
+    worker_concurrency: int = 2
+    # Longest a worker waits on an empty queue before checking if it should stop
+    worker_poll_seconds: int = 5
+
     # CORS settings
     allow_origins: list[str] = [
         "http://host.docker.internal:3000",
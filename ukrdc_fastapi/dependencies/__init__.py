@@ -5,7 +5,6 @@ from fastapi import Security
 from mirth_client import MirthAPI
 from sqlalchemy.orm import Session
 
-from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies import auth
 from ukrdc_fastapi.utils.tasks import TaskTracker
 
@@ -18,6 +17,7 @@ from .database import (
     users_session,
 )
 from .mirth import mirth_session
+from .redis_clients import RedisDatabase, get_redis_client
 
 
 async def get_mirth() -> AsyncGenerator[MirthAPI, None]:
@@ -91,17 +91,12 @@ def get_usersdb() -> Generator[Session, None, None]:
 
 
 def get_redis() -> redis.Redis:
-    """Return a new Redis database session
+    """Return the shared Redis cache client
 
     Returns:
         redis.Redis: Redis database session
     """
-    return redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=settings.redis_db,
-        decode_responses=True,
-    )
+    return get_redis_client(RedisDatabase.CACHE)
 
 
 def get_task_tracker(
@@ -109,17 +104,8 @@ def get_task_tracker(
 ) -> TaskTracker:
     """Creates a TaskTracker pre-populated with a User and Redis session"""
     return TaskTracker(
-        redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_tasks_db,
-            decode_responses=True,
-        ),
-        redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_locks_db,
-        ),
+        get_redis_client(RedisDatabase.TASKS),
+        get_redis_client(RedisDatabase.LOCKS),
         user,
     )
 
@@ -127,16 +113,7 @@ def get_task_tracker(
 def get_root_task_tracker() -> TaskTracker:
     """Creates a TaskTracker pre-populated with a SuperUser and Redis session"""
     return TaskTracker(
-        redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_tasks_db,
-            decode_responses=True,
-        ),
-        redis.Redis(
-            host=settings.redis_host,
-            port=settings.redis_port,
-            db=settings.redis_locks_db,
-        ),
+        get_redis_client(RedisDatabase.TASKS),
+        get_redis_client(RedisDatabase.LOCKS),
         auth.auth.superuser,
     )
@@ -1,9 +1,15 @@
+from typing import Any
+
 from fastapi import Depends
 from redis import Redis
 from starlette.requests import Request
 from starlette.responses import Response
 
 from ukrdc_fastapi.dependencies import get_redis
+from ukrdc_fastapi.schemas.facility import (
+    FacilityDetailsSchema,
+    FacilityExtractsSchema,
+)
 from ukrdc_fastapi.utils.cache import (
     CacheKey,
     DynamicCacheKey,
@@ -12,13 +18,15 @@ from ukrdc_fastapi.utils.cache import (
 )
 
 
-def cache_factory(cachekey: CacheKey | DynamicCacheKey):
+def cache_factory(cachekey: CacheKey | DynamicCacheKey, response_model: Any = None):
     """
     Build a cache dependency function. The returned function
     can be used as a FastAPI dependency.
 
     Args:
         cachekey (Union[CacheKey, DynamicCacheKey]): Key describing the cached data
+        response_model (Any, optional): Opt in to caching the final JSON response
+            body for this response model. Defaults to None.
     """
 
     def cache_factory_dependency(
@@ -38,12 +46,14 @@ def cache_factory(cachekey: CacheKey | DynamicCacheKey):
         Returns:
             ResponseCache: ResponseCache instance with pre-populated key
         """
-        return ResponseCache(redis, cachekey, request, response)
+        return ResponseCache(
+            redis, cachekey, request, response, response_model=response_model
+        )
 
     return cache_factory_dependency
 
 
-def facility_cache_factory(prefix: FacilityCachePrefix):
+def facility_cache_factory(prefix: FacilityCachePrefix, response_model: Any = None):
     """
     Build a facility cache dependency function. The returned function
     can be used as a FastAPI dependency, and will generate a cache key
@@ -51,6 +61,8 @@ def facility_cache_factory(prefix: FacilityCachePrefix):
 
     Args:
         prefix (FacilityCachePrefix): Key prefix enum attribute describing the cached data
+        response_model (Any, optional): Opt in to caching the final JSON response
+            body for this response model. Defaults to None.
     """
 
     def facility_cache_factory_dependency(
@@ -74,15 +86,21 @@ def facility_cache_factory(prefix: FacilityCachePrefix):
             ResponseCache: ResponseCache instance with pre-populated key
         """
         cachekey = DynamicCacheKey(prefix, code)
-        return ResponseCache(redis, cachekey, request, response)
+        return ResponseCache(
+            redis, cachekey, request, response, response_model=response_model
+        )
 
     return facility_cache_factory_dependency
 
 
 ADMIN_COUNTS_CACHE = Depends(cache_factory(CacheKey.ADMIN_COUNTS))
-EXTRACT_FACILITY_CACHE = Depends(facility_cache_factory(FacilityCachePrefix.EXTRACTS))
+EXTRACT_FACILITY_CACHE = Depends(
+    facility_cache_factory(FacilityCachePrefix.EXTRACTS, FacilityExtractsSchema)
+)
 
-ROOT_FACILITY_CACHE = Depends(facility_cache_factory(FacilityCachePrefix.ROOT))
+ROOT_FACILITY_CACHE = Depends(
+    facility_cache_factory(FacilityCachePrefix.ROOT, FacilityDetailsSchema)
+)
 
 FEEDSHARE_FACILITY_CACHE = Depends(
     facility_cache_factory(FacilityCachePrefix.FEEDSHARE)
@@ -25,6 +25,7 @@ from starlette.requests import Request
 from ukrdc_stats.exceptions import EmptyCohortError, NoCohortError, NoTestsError
 
 from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.utils.startup import startup_timer
 
 APP_LOG_LEVEL = "DEBUG" if settings.debug else settings.log_level
 ACCESS_LOG_LEVEL = settings.access_log_level
@@ -208,6 +209,7 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
             return response
         finally:
             duration_ms = (time.perf_counter() - start) * 1000
+            startup_timer.mark("first_request")
             access_logger.info(
                 "",
                 extra={
@@ -0,0 +1,177 @@
+import threading
+from collections import Counter
+from enum import Enum
+from typing import cast
+
+import redis
+from pydantic import Field
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.schemas.base import JSONModel
+from ukrdc_fastapi.utils.memory_redis import MemoryRedis
+
+
+class RedisDatabase(Enum):
+    """Logical Redis databases used by the application"""
+
+    CACHE = "cache"
+    TASKS = "tasks"
+    LOCKS = "locks"
+
+
+class RedisPoolStatsSchema(JSONModel):
+    """Connection pool usage for a single logical Redis database"""
+
+    database: str = Field(..., description="Logical Redis database name")
+    max_connections: int = Field(..., description="Maximum pool size")
+    created_connections: int | None = Field(
+        None,
+        description="Number of connections currently opened by the pool, if known",
+    )
+    in_use_connections: int | None = Field(
+        None,
+        description="Number of connections currently checked out of the pool, if known",
+    )
+    available_connections: int | None = Field(
+        None, description="Number of idle connections ready for reuse, if known"
+    )
+    client_requests: int = Field(
+        ..., description="Number of times the shared client has been requested"
+    )
+
+
+# Process-wide clients, one per logical database, created on first use
+_clients: dict[RedisDatabase, redis.Redis] = {}
+_pools: dict[RedisDatabase, redis.BlockingConnectionPool] = {}
+_clients_lock = threading.Lock()
+_client_requests: Counter[RedisDatabase] = Counter()
+
+
+# Whether responses from each logical database are decoded to str
+_DECODE_RESPONSES: dict[RedisDatabase, bool] = {
+    RedisDatabase.CACHE: True,
+    RedisDatabase.TASKS: True,
+    RedisDatabase.LOCKS: False,
+}
+
+
+def _build_pool(database: RedisDatabase) -> redis.BlockingConnectionPool:
+    """Create a new blocking connection pool for a logical database
+
+    Args:
+        database (RedisDatabase): Logical database to connect to
+
+    Returns:
+        redis.BlockingConnectionPool: Connection pool
+    """
+    db_index = {
+        RedisDatabase.CACHE: settings.redis_db,
+        RedisDatabase.TASKS: settings.redis_tasks_db,
+        RedisDatabase.LOCKS: settings.redis_locks_db,
+    }[database]
+
+    # A blocking pool makes callers wait for a free connection rather than
+    # erroring when the pool is exhausted under load
+    return redis.BlockingConnectionPool(
+        host=settings.redis_host,
+        port=settings.redis_port,
+        db=db_index,
+        decode_responses=_DECODE_RESPONSES[database],
+        max_connections=settings.redis_max_connections,
+        timeout=settings.redis_pool_timeout,
+        health_check_interval=settings.redis_health_check_interval,
+    )
+
+
+def get_redis_client(database: RedisDatabase) -> redis.Redis:
+    """Return the shared Redis client for a logical database, creating it if needed
+
+    Args:
+        database (RedisDatabase): Logical database to connect to
+
+    Returns:
+        redis.Redis: Shared Redis client
+    """
+    client = _clients.get(database)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(database)
+            if client is None:
+                if settings.redis_backend == "memory":
+                    # MemoryRedis implements the subset of the client API we use
+                    client = cast(
+                        redis.Redis,
+                        MemoryRedis(decode_responses=_DECODE_RESPONSES[database]),
+                    )
+                else:
+                    pool = _build_pool(database)
+                    client = redis.Redis(connection_pool=pool)
+                    _pools[database] = pool
+                _clients[database] = client
+    _client_requests[database] += 1
+    return client
+
+
+def close_redis_clients() -> None:
+    """Disconnect and discard all shared Redis clients. Used on app shutdown."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        for pool in _pools.values():
+            pool.disconnect()
+        _clients.clear()
+        _pools.clear()
+
+
+def _pool_occupancy(
+    pool: redis.BlockingConnectionPool,
+) -> tuple[int | None, int | None]:
+    """Count the connections created by a pool, and those idle in it.
+
+    redis-py doesn't expose these publicly, so they are read from the pool's
+    internals where present, and reported as unknown otherwise.
+
+    Args:
+        pool (redis.BlockingConnectionPool): Connection pool
+
+    Returns:
+        tuple[Optional[int], Optional[int]]: Created and available connections
+    """
+    connections = getattr(pool, "_connections", None)
+    queue = getattr(getattr(pool, "pool", None), "queue", None)
+    created = len(connections) if isinstance(connections, list) else None
+    # Idle connections sit in the pool queue, alongside `None` placeholders
+    # for connections that have not been created yet
+    available = (
+        len([conn for conn in list(queue) if conn is not None])
+        if queue is not None
+        else None
+    )
+    return created, available
+
+
+def get_redis_pool_stats() -> list[RedisPoolStatsSchema]:
+    """Get connection pool usage for each Redis client created so far.
+    In-memory clients have no pool, so are not included.
+
+    Returns:
+        list[RedisPoolStatsSchema]: Pool usage, one item per logical database
+    """
+    stats: list[RedisPoolStatsSchema] = []
+    for database, pool in list(_pools.items()):
+        created, available = _pool_occupancy(pool)
+        stats.append(
+            RedisPoolStatsSchema(
+                database=database.value,
+                max_connections=pool.max_connections,
+                created_connections=created,
+                in_use_connections=(
+                    created - available
+                    if created is not None and available is not None
+                    else None
+                ),
+                available_connections=available,
+                client_requests=_client_requests[database],
+            )
+        )
+    return stats
@@ -66,6 +66,15 @@ class RecordTypeError(RuntimeError):
 class TaskLockError(RuntimeError):
     """Backbground task lock could not be acquired"""
 
+    def __init__(self, message: str, task_id: str | None = None):
+        super().__init__(message)
+        # Key of the task holding the lock, if known
+        self.task_id = task_id
+
 
 class TaskNotFoundError(RuntimeError):
     """Requested background task does not exist"""
+
+
+class TaskTimeoutError(RuntimeError):
+    """Background task ran for longer than its timeout"""
@@ -8,16 +8,25 @@ from fastapi.routing import APIRoute
 from fastapi_pagination import add_pagination
 
 from ukrdc_fastapi.config import configuration, settings
+from ukrdc_fastapi.dependencies import get_redis
 from ukrdc_fastapi.dependencies.auth import Permissions, auth
 from ukrdc_fastapi.dependencies.logging import (
     RequestLoggingMiddleware,
     configure_logging,
     register_ukrdc_stats_exception_handlers,
 )
+from ukrdc_fastapi.dependencies.redis_clients import close_redis_clients
 from ukrdc_fastapi.dependencies.sentry import add_sentry
 from ukrdc_fastapi.exceptions import ResourceNotFoundError
-from ukrdc_fastapi.routers import api
+from ukrdc_fastapi.routers import api, probes
 from ukrdc_fastapi.tasks import repeated, startup
+from ukrdc_fastapi.tasks.leader import get_leader
+from ukrdc_fastapi.utils.cache import (
+    flush_delayed_invalidations,
+    listen_for_invalidations,
+)
+from ukrdc_fastapi.utils.cache_stats import cache_stats
+from ukrdc_fastapi.utils.startup import startup_timer
 
 # Set up logging before anything else so startup/lifespan logs use it too
 configure_logging()
@@ -46,14 +55,29 @@ def _dev_token_override():
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    # Clear the task tracker
-    startup.clear_task_tracker()
-    # Start repeated tasks
-    await repeated.update_channel_id_name_map()
-    await repeated.update_facilities_cache()
-    await repeated.precalculate_facility_stats_dialysis()
+    startup_timer.start()
+    # Recover tasks orphaned by dead processes
+    startup.recover_task_tracker()
+    # Evict in-process cached values when another worker updates them
+    invalidation_listener = (
+        listen_for_invalidations(get_redis()) if settings.cache_local_enabled else None
+    )
+    # Elect one worker to run repeated tasks, before they first run
+    get_leader().start()
+    # Start repeated tasks. These run in the background, so cache warmup doesn't
+    # delay serving, and /ready reports when it is done
+    repeated.scheduler.start()
+    startup_timer.mark("serving")
     yield
     # Anything here will be executed on app shutdown
+    repeated.scheduler.stop()
+    repeated.shutdown_stats_executor()
+    get_leader().stop()
+    if invalidation_listener:
+        invalidation_listener.stop()
+    flush_delayed_invalidations(get_redis())
+    cache_stats.flush(get_redis())
+    close_redis_clients()
 
 
 app = FastAPI(
@@ -82,6 +106,9 @@ app.include_router(
     dependencies=[Depends(auth.okta_jwt_scheme)],
 )
 
+# Health probes are served without authentication
+app.include_router(probes.router, prefix=configuration.base_url)
+
 # Dev okta override
 if settings.disable_auth:
     app.dependency_overrides[auth.okta_jwt_scheme] = _dev_token_override
@@ -0,0 +1,21 @@
+from sqlalchemy import Index, String
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+class PhoneticName(Base):
+    """Phonetic keys of the words in each patient record's names.
+
+    Stored in the UKRDC3 database alongside the records it indexes, and
+    maintained by the `build_phonetic_name_index` repeated task.
+    """
+
+    __tablename__ = "phonetic_name"
+
+    pid: Mapped[str] = mapped_column(String, primary_key=True)  # Patient record PID
+    key: Mapped[str] = mapped_column(String, primary_key=True)  # Phonetic key
+
+    __table_args__ = (Index("ix_phonetic_name_key", "key"),)
@@ -1,6 +1,9 @@
+from sqlalchemy.orm import Session
+
 from ukrdc_fastapi.dependencies.auth import Permissions, UKRDCUser
-from ukrdc_fastapi.exceptions import PermissionsError
+from ukrdc_fastapi.exceptions import MissingFacilityError, PermissionsError
 from ukrdc_fastapi.schemas.facility import FacilityDetailsSchema
+from ukrdc_fastapi.utils.facility_codes import facility_codes
 
 
 def assert_facility_permission(facility_code: str, user: UKRDCUser):
@@ -19,6 +22,22 @@ def assert_facility_permission(facility_code: str, user: UKRDCUser):
         raise PermissionsError()
 
 
+def assert_facility_exists(facility_code: str, ukrdc3: Session):
+    """
+    Assert that the given facility exists, without querying the database
+    unless the known facility codes need reloading, or don't include it
+
+    Args:
+        facility_code (str): Facility/unit code
+        ukrdc3 (Session): SQLAlchemy session
+
+    Raises:
+        MissingFacilityError: If the facility does not exist
+    """
+    if not facility_codes.exists(facility_code, ukrdc3):
+        raise MissingFacilityError(facility_code)
+
+
 def apply_facility_list_permissions(
     facilities: list[FacilityDetailsSchema], user: UKRDCUser
 ) -> list[FacilityDetailsSchema]:
@@ -16,7 +16,7 @@ from ukrdc_fastapi.schemas.facility import (
     FacilitySchema,
     FacilityStatisticsSchema,
 )
-from ukrdc_fastapi.utils.cache import BasicCache, CacheKey
+from ukrdc_fastapi.utils.cache import BasicCache, BinaryCodec, CacheKey
 from ukrdc_fastapi.utils.records import ABSTRACT_FACILITIES
 
 # Facility with error statistics
@@ -308,6 +308,7 @@ def get_facilities(
     redis: Redis,
     include_inactive: bool = False,
     include_empty: bool = False,
+    refresh: bool = False,
 ) -> list[FacilityDetailsSchema]:
     """Get a list of all unit/facility summaries available to the current user.
 
@@ -317,13 +318,15 @@ def get_facilities(
         redis (Redis): Redis session
         include_inactive (bool, optional): Include inactive facilities (default: False)
         include_empty (bool, optional): Include empty facilities (default: False)
+        refresh (bool, optional): Rebuild the cached list, even if present (default: False)
     Returns:
         list[FacilityDetailsSchema]: List of units/facilities
     """
 
     # Look for a pre-calculated cache of the facilities list (see `ukrdc_fastapi.tasks.repeated`)
-    cache = BasicCache(redis, CacheKey.FACILITIES_LIST)
-    if not cache.exists:
+    # Stored in binary, so timestamps don't need re-parsing on every read
+    cache = BasicCache(redis, CacheKey.FACILITIES_LIST, local=True, codec=BinaryCodec())
+    if refresh or not cache.exists:
         stmt = select(Facility).where(Facility.facilitycode.notin_(ABSTRACT_FACILITIES))
         cache.set(
             build_facilities_list(stmt, ukrdc3, errorsdb),
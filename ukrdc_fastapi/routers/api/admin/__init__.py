@@ -1,16 +1,36 @@
 import datetime
 
 from fastapi import APIRouter, Depends, Security
+from fastapi import Query as QueryParam
+from redis import Redis
 from sqlalchemy.orm import Session
 
-from ukrdc_fastapi.dependencies import get_errorsdb, get_jtrace, get_statsdb, get_ukrdc3
+from ukrdc_fastapi.dependencies import (
+    get_errorsdb,
+    get_jtrace,
+    get_redis,
+    get_statsdb,
+    get_ukrdc3,
+)
 from ukrdc_fastapi.dependencies.auth import Permissions, auth
 from ukrdc_fastapi.dependencies.cache import ADMIN_COUNTS_CACHE
+from ukrdc_fastapi.dependencies.redis_clients import (
+    RedisPoolStatsSchema,
+    get_redis_pool_stats,
+)
 from ukrdc_fastapi.query.admin import AdminCountsSchema, get_admin_counts
 from ukrdc_fastapi.query.stats import get_full_errors_history
 from ukrdc_fastapi.query.workitems import get_full_workitem_history
 from ukrdc_fastapi.schemas.common import HistoryPoint
-from ukrdc_fastapi.utils.cache import ResponseCache
+from ukrdc_fastapi.utils.cache import (
+    CacheInvalidationSchema,
+    FacilityCachePrefix,
+    ResponseCache,
+    facility_tag,
+    invalidate_tags,
+    prefix_tag,
+)
+from ukrdc_fastapi.utils.cache_stats import CachePrefixStatsSchema, get_cache_stats
 
 from . import datahealth
 
@@ -97,3 +117,39 @@ def admin_counts(
 
     # Fetch the cached value, coerse into the correct type, and return
     return AdminCountsSchema(**cache.get())
+
+
+@router.get(
+    "/redis_pools",
+    response_model=list[RedisPoolStatsSchema],
+    dependencies=[Security(auth.permission(Permissions.UNIT_ALL))],
+)
+def redis_pools():
+    """Retreive connection pool usage for this worker's shared Redis clients"""
+    return get_redis_pool_stats()
+
+
+@router.post(
+    "/cache/invalidate",
+    response_model=CacheInvalidationSchema,
+    dependencies=[Security(auth.permission(Permissions.UNIT_ALL))],
+)
+def invalidate_cache(
+    facility: list[str] = QueryParam([]),
+    prefix: list[FacilityCachePrefix] = QueryParam([]),
+    redis: Redis = Depends(get_redis),
+):
+    """Remove all cached data for the given facilities, and/or facility cache prefixes"""
+    tags = [facility_tag(code) for code in facility]
+    tags += [prefix_tag(cache_prefix) for cache_prefix in prefix]
+    return invalidate_tags(redis, tags)
+
+
+@router.get(
+    "/cache/stats",
+    response_model=list[CachePrefixStatsSchema],
+    dependencies=[Security(auth.permission(Permissions.UNIT_ALL))],
+)
+def cache_stats(redis: Redis = Depends(get_redis)):
+    """Retreive cache hit, miss, latency, and size statistics for each cache key prefix"""
+    return get_cache_stats(redis)
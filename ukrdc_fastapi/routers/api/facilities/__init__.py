@@ -29,6 +29,7 @@ from ukrdc_fastapi.dependencies.cache import (
 from ukrdc_fastapi.dependencies.sorters import ERROR_SORTER, FACILITY_ENUM_SORTER
 from ukrdc_fastapi.permissions.facilities import (
     apply_facility_list_permissions,
+    assert_facility_exists,
     assert_facility_permission,
 )
 from ukrdc_fastapi.query.facilities import (
@@ -121,6 +122,7 @@ def facility_satellites(
 ):
     """Retrieve id/description for satellites of a given main unit"""
     assert_facility_permission(facility_code, user)
+    assert_facility_exists(facility_code, ukrdc3)
 
     cachekey = DynamicCacheKey(FacilityCachePrefix.SATELLITES, facility_code)
     cache = ResponseCache(redis, cachekey, request, response)
@@ -150,6 +152,7 @@ def facility(
 ):
     """Retreive information and current status of a particular facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     # If no cached value exists, or the cached value has expired
     if not cache.exists:
@@ -159,8 +162,8 @@ def facility(
     # Add response cache headers to the response
     cache.prepare_response()
 
-    # Fetch the cached value, coerse into the correct type, and return
-    return FacilityDetailsSchema(**cache.get())
+    # Return the cached response body as-is
+    return cache.json_response()
 
 
 @router.get(
@@ -179,6 +182,7 @@ def facility_patients_latest_errors(
 ):
     """Retreive time-series new error counts for the last year for a particular facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     stmt = query_patients_latest_errors(ukrdc3, code, channels=channel)
 
@@ -203,6 +207,7 @@ def facility_errrors_history(
 ):
     """Retreive time-series new error counts for the last year for a particular facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     return get_errors_history(ukrdc3, statsdb, code, since=since, until=until)
 
@@ -216,6 +221,7 @@ def facility_extracts(
 ):
     """Retreive extract counts for a particular facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     # If no cached value exists, or the cached value has expired
     if not cache.exists:
@@ -227,5 +233,5 @@ def facility_extracts(
     # Add response cache headers to the response
     cache.prepare_response()
 
-    # Fetch the cached value, coerse into the correct type, and return
-    return FacilityExtractsSchema(**cache.get())
+    # Return the cached response body as-is
+    return cache.json_response()
@@ -8,7 +8,10 @@ from ukrdc_fastapi.dependencies.auth import (
     auth,
     get_current_user,
 )
-from ukrdc_fastapi.permissions.facilities import assert_facility_permission
+from ukrdc_fastapi.permissions.facilities import (
+    assert_facility_exists,
+    assert_facility_permission,
+)
 from ukrdc_fastapi.query.facilities.reports import (
     select_facility_report_cc001,
     select_facility_report_pm001,
@@ -41,6 +44,7 @@ def facility_reports_cc001(
         Excludes patients with a known date of death prior to 5 years ago from the time of query.
     """
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     return paginate(ukrdc3, select_facility_report_cc001(ukrdc3, code))
 
@@ -66,6 +70,7 @@ def facility_reports_pm001(
         Patients with no *active* PKB membership record
     """
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     return paginate(ukrdc3, select_facility_report_pm001(ukrdc3, code))
 
@@ -88,5 +93,6 @@ def facility_radar_missing(
     returns the membership records of patients known to radar but not the ukrdc
     """
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     return paginate(ukrdc3, select_missing_radar_patients(ukrdc3, code))
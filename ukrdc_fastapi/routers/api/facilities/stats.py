@@ -10,7 +10,10 @@ from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies import get_ukrdc3
 from ukrdc_fastapi.dependencies.auth import UKRDCUser, get_current_user
 from ukrdc_fastapi.dependencies.cache import cache_factory, get_redis
-from ukrdc_fastapi.permissions.facilities import assert_facility_permission
+from ukrdc_fastapi.permissions.facilities import (
+    assert_facility_exists,
+    assert_facility_permission,
+)
 from ukrdc_fastapi.query.facilities.stats import (
     get_facility_demographic_stats,
     get_facility_dialysis_stats,
@@ -36,6 +39,7 @@ def facility_stats_demographics(
 ):
     """Retreive demographic statistics for a given facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     if since and until:
         cache_key = DynamicCacheKey(
@@ -48,32 +52,32 @@ def facility_stats_demographics(
     else:
         cache_key = DynamicCacheKey(FacilityCachePrefix.DEMOGRAPHICS, code)
 
-    cache = cache_factory(cache_key)(request=request, response=response, redis=redis)
-
-    # If no cached value exists, or the cached value has expired
-    if not cache.exists:
-        from_time = (
-            datetime.strptime(since + " 00:00:00", "%Y-%m-%d %H:%M:%S")
-            if since
-            else None
-        )
-        to_time = (
-            datetime.strptime(until + " 23:59:59", "%Y-%m-%d %H:%M:%S")
-            if until
-            else None
-        )
-        # Cache a computed value, and expire after 8 hours
-        cache.set(
-            get_facility_demographic_stats(
-                ukrdc3, code, since=from_time, until=to_time
-            ),
-            expire=settings.cache_facilities_stats_demographics_seconds,
-        )
+    cache = cache_factory(cache_key, DemographicsStats)(
+        request=request, response=response, redis=redis
+    )
+
+    from_time = (
+        datetime.strptime(since + " 00:00:00", "%Y-%m-%d %H:%M:%S") if since else None
+    )
+    to_time = (
+        datetime.strptime(until + " 23:59:59", "%Y-%m-%d %H:%M:%S") if until else None
+    )
+
+    # If no fresh cached value exists, compute one. Only one request at a time
+    # recomputes, while others are served the stale value or wait for the new one.
+    cache.populate(
+        lambda: get_facility_demographic_stats(
+            ukrdc3, code, since=from_time, until=to_time
+        ),
+        expire=settings.cache_facilities_stats_demographics_seconds,
+        stale_for=settings.cache_facilities_stats_stale_seconds,
+    )
 
     # Add response cache headers to the response
     cache.prepare_response()
 
-    return DemographicsStats(**cache.get())
+    # Return the cached response body as-is
+    return cache.json_response()
 
 
 @router.get("/krt", response_model=UnitLevelKRTStats)
@@ -89,6 +93,7 @@ def facility_stats_krt(
 ):
     """Retreive KRT statistics for a given facility"""
     assert_facility_permission(code, user)
+    assert_facility_exists(code, ukrdc3)
 
     if since and until:
         cache_key = DynamicCacheKey(FacilityCachePrefix.KRT, code, since, until)
@@ -99,28 +104,29 @@ def facility_stats_krt(
     else:
         cache_key = DynamicCacheKey(FacilityCachePrefix.KRT, code)
 
-    cache = cache_factory(cache_key)(request=request, response=response, redis=redis)
-
-    # If no cached value exists, or the cached value has expired
-    if not cache.exists:
-        from_time = (
-            datetime.strptime(since + " 00:00:00", "%Y-%m-%d %H:%M:%S")
-            if since
-            else None
-        )
-        to_time = (
-            datetime.strptime(until + " 23:59:59", "%Y-%m-%d %H:%M:%S")
-            if until
-            else None
-        )
-        # Cache a computed value, and expire after 8 hours
-        cache.set(
-            get_facility_dialysis_stats(ukrdc3, code, since=from_time, until=to_time),
-            expire=settings.cache_facilities_stats_dialysis_seconds,
-        )
+    cache = cache_factory(cache_key, UnitLevelKRTStats)(
+        request=request, response=response, redis=redis
+    )
+
+    from_time = (
+        datetime.strptime(since + " 00:00:00", "%Y-%m-%d %H:%M:%S") if since else None
+    )
+    to_time = (
+        datetime.strptime(until + " 23:59:59", "%Y-%m-%d %H:%M:%S") if until else None
+    )
+
+    # If no fresh cached value exists, compute one. Only one request at a time
+    # recomputes, while others are served the stale value or wait for the new one.
+    cache.populate(
+        lambda: get_facility_dialysis_stats(
+            ukrdc3, code, since=from_time, until=to_time
+        ),
+        expire=settings.cache_facilities_stats_dialysis_seconds,
+        stale_for=settings.cache_facilities_stats_stale_seconds,
+    )
 
     # Add response cache headers to the response
     cache.prepare_response()
 
-    # Fetch the cached value, coerse into the correct type, and return
-    return UnitLevelKRTStats(**cache.get())
+    # Return the cached response body as-is
+    return cache.json_response()
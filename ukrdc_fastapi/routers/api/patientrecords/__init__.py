@@ -3,6 +3,7 @@ import datetime
 from fastapi import APIRouter, Depends, Security
 from fastapi import Query as QueryParam
 from fastapi.responses import Response
+from redis import Redis
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 from starlette.status import HTTP_204_NO_CONTENT
@@ -19,7 +20,13 @@ from ukrdc_sqla.ukrdc import (
     Treatment,
 )
 
-from ukrdc_fastapi.dependencies import get_auditdb, get_errorsdb, get_jtrace, get_ukrdc3
+from ukrdc_fastapi.dependencies import (
+    get_auditdb,
+    get_errorsdb,
+    get_jtrace,
+    get_redis,
+    get_ukrdc3,
+)
 from ukrdc_fastapi.dependencies.audit import (
     Auditer,
     AuditOperation,
@@ -65,6 +72,7 @@ from ukrdc_fastapi.schemas.patientrecord.observation import ObservationSchema
 from ukrdc_fastapi.schemas.patientrecord.procedure import TransplantSchema
 from ukrdc_fastapi.schemas.patientrecord.survey import SurveySchema
 from ukrdc_fastapi.schemas.patientrecord.treatments import TreatmentSchema
+from ukrdc_fastapi.utils.cache import invalidate_facility
 from ukrdc_fastapi.utils.paginate import Page, paginate
 from ukrdc_fastapi.utils.sort import SQLASorter
 
@@ -244,6 +252,7 @@ def patient_delete(
     patient_record: PatientRecord = Depends(_get_patientrecord),
     ukrdc3: Session = Depends(get_ukrdc3),
     jtrace: Session = Depends(get_jtrace),
+    redis: Redis = Depends(get_redis),
     audit: Auditer = Depends(get_auditer),
     args: DeletePidRequest | None = None,
 ):
@@ -252,8 +261,11 @@ def patient_delete(
     audit_op: AuditOperation
 
     if args and args.hash:
+        sending_facility = patient_record.sendingfacility
         summary = delete_patientrecord(patient_record, ukrdc3, jtrace, args.hash)
         audit_op = AuditOperation.DELETE
+        # Cached facility statistics no longer include this record
+        invalidate_facility(redis, sending_facility)
     else:
         summary = summarise_delete_patientrecord(patient_record, jtrace)
         audit_op = AuditOperation.READ
@@ -3,6 +3,7 @@ from mirth_client.mirth import MirthAPI
 from redis import Redis
 from ukrdc_sqla.ukrdc import PatientRecord
 
+from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies import get_mirth, get_redis
 from ukrdc_fastapi.dependencies.audit import (
     Auditer,
@@ -13,6 +14,7 @@ from ukrdc_fastapi.dependencies.audit import (
 from ukrdc_fastapi.dependencies.auth import Permissions, auth
 from ukrdc_fastapi.query.mirth.rda import update_patient_demographics
 from ukrdc_fastapi.schemas.requests import DemographicUpdateRequest
+from ukrdc_fastapi.utils.cache import invalidate_facility, invalidate_facility_later
 from ukrdc_fastapi.utils.mirth import MirthMessageResponseSchema
 
 from .dependencies import _get_patientrecord
@@ -55,4 +57,14 @@ async def patient_update_demographics(
         redis,
     )
     audit.add_event(Resource.PATIENT_RECORD, patient_record.pid, AuditOperation.UPDATE)
+    # Cached facility statistics may depend on the old demographics. Mirth only
+    # applies the update after we respond, and nothing tells us when, so the
+    # cache is invalidated again once it most likely has. A request in between
+    # may briefly re-cache the old values.
+    invalidate_facility(redis, patient_record.sendingfacility)
+    invalidate_facility_later(
+        redis,
+        patient_record.sendingfacility,
+        settings.cache_update_invalidate_delay_seconds,
+    )
     return response
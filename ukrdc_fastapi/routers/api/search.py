@@ -1,10 +1,11 @@
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, HTTPException, Security
 from fastapi import Query as QueryParam
-from sqlalchemy import select
+from sqlalchemy import false, select
 from sqlalchemy.orm import Session
 from ukrdc_sqla.empi import LinkRecord, MasterRecord
 from ukrdc_sqla.ukrdc import PatientRecord
 
+from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies import get_jtrace, get_ukrdc3
 from ukrdc_fastapi.dependencies.audit import (
     Auditer,
@@ -28,7 +29,11 @@ from ukrdc_fastapi.utils.records import (
     MEMBERSHIP_FACILITIES,
     MIGRATED_EXTRACTS,
 )
-from ukrdc_fastapi.utils.search import search_ukrdcids
+from ukrdc_fastapi.utils.search import (
+    phonetic_name_table_exists,
+    rank_ukrdcids,
+    search_ukrdcids,
+)
 
 router = APIRouter(tags=["Search"])
 
@@ -129,18 +134,23 @@ def search_records(
     include_survey: bool = QueryParam(
         False, description="Include survey-only records in search results"
     ),
+    fuzzy: bool = QueryParam(
+        False,
+        description="Match names by similarity, tolerating typos, and return the closest matches first",
+    ),
+    phonetic: bool = QueryParam(
+        False, description="Match names by how they sound, e.g. Smith and Smyth"
+    ),
     user: UKRDCUser = Security(get_current_user),
     ukrdc3: Session = Depends(get_ukrdc3),
     audit: Auditer = Depends(get_auditer),
 ):
-    """Search the UKRDC for a particular patient record"""
+    """Search the UKRDC for a particular patient record, most relevant patients first"""
 
-    # Get search matches
-    matched_ukrdc_ids = search_ukrdcids(
-        mrn_number, ukrdc_number, full_name, pid, dob, facility, search, ukrdc3
-    )
+    if phonetic and not phonetic_name_table_exists(ukrdc3):
+        raise HTTPException(503, detail="Phonetic name index has not been built yet")
 
-    stmt = select(PatientRecord).where(PatientRecord.ukrdcid.in_(matched_ukrdc_ids))
+    stmt = select(PatientRecord)
 
     # Filter down by record types
     if not include_migrated:
@@ -155,7 +165,7 @@ def search_records(
         stmt = stmt.where(PatientRecord.sendingextract != "SURVEY")
 
     # Strict filter by facility
-    # We also pass facility to search_ukrdcids to allow for searches for all records on a facility
+    # We also pass facility to rank_ukrdcids to allow for searches for all records on a facility
     if facility:
         stmt = stmt.where(PatientRecord.sendingfacility.in_(facility))
 
@@ -166,6 +176,30 @@ def search_records(
     # Apply permissions
     stmt = apply_patientrecord_list_permission(stmt, user)
 
+    # Rank only patients with records left to show, keeping the most relevant
+    ranked = rank_ukrdcids(
+        mrn_number,
+        ukrdc_number,
+        full_name,
+        pid,
+        dob,
+        facility,
+        search,
+        ukrdc3,
+        fuzzy=fuzzy,
+        phonetic=phonetic,
+        within=stmt.with_only_columns(PatientRecord.ukrdcid),
+        limit=settings.search_max_results,
+    )
+
+    if ranked is None:
+        stmt = stmt.where(false())
+    else:
+        matches = ranked.subquery("ranked")
+        stmt = stmt.join(matches, matches.c.ukrdcid == PatientRecord.ukrdcid).order_by(
+            matches.c.score.desc(), PatientRecord.ukrdcid, PatientRecord.pid
+        )
+
     # Paginate results
     page: Page[PatientRecord] = paginate(ukrdc3, stmt)  # type: ignore
 
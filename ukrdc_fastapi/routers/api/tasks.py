@@ -1,10 +1,12 @@
 import uuid
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
 from ukrdc_fastapi.dependencies import get_task_tracker
-from ukrdc_fastapi.exceptions import TaskNotFoundError
-from ukrdc_fastapi.utils.paginate import Page, paginate_sequence
+from ukrdc_fastapi.dependencies.auth import Permissions
+from ukrdc_fastapi.exceptions import PermissionsError, TaskNotFoundError
+from ukrdc_fastapi.utils.paginate import Page, Params, create_page, resolve_params
 from ukrdc_fastapi.utils.tasks import TaskTracker, TrackableTaskSchema
 
 router = APIRouter(tags=["Background Tasks"])
@@ -15,7 +17,12 @@ async def tasks(
     tracker: TaskTracker = Depends(get_task_tracker),
 ):
     """Return a list of all non-expired background tasks"""
-    return paginate_sequence(tracker.get_all())
+    params: Params = resolve_params()
+    raw_params = params.to_raw_params()
+    tasks, total = tracker.get_page(
+        offset=raw_params.offset or 0, limit=raw_params.limit
+    )
+    return create_page(tasks, total=total, params=params)
 
 
 @router.get("/{task_id}", response_model=TrackableTaskSchema)
@@ -28,3 +35,58 @@ async def task(
         return tracker.get(task_id.hex)
     except TaskNotFoundError as e:
         raise HTTPException(status_code=404, detail="fTask {task_id} not found") from e
+
+
+@router.get(
+    "/{task_id}/result",
+    response_class=StreamingResponse,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+def task_result(
+    task_id: uuid.UUID,
+    tracker: TaskTracker = Depends(get_task_tracker),
+):
+    """Download the result stored by a finished background task"""
+    try:
+        task = tracker.get(task_id.hex)
+    except TaskNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found") from e
+
+    # Private task results are only available to the task owner
+    if task.visibility == "private" and task.owner != tracker.user.email:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
+    if task.status != "finished":
+        raise HTTPException(status_code=409, detail=f"Task {task_id} has not finished")
+    if task.result is None:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} has no result")
+
+    headers = {"Content-Length": str(task.result.size)}
+    if task.result.filename:
+        headers["Content-Disposition"] = (
+            f'attachment; filename="{task.result.filename}"'
+        )
+    # Chunks are fetched from Redis as they are sent, never all at once
+    return StreamingResponse(
+        tracker.iter_result(task_id.hex),
+        media_type=task.result.media_type,
+        headers=headers,
+    )
+
+
+@router.post("/{task_id}/cancel", response_model=TrackableTaskSchema)
+async def task_cancel(
+    task_id: uuid.UUID,
+    tracker: TaskTracker = Depends(get_task_tracker),
+) -> TrackableTaskSchema:
+    """Request cancellation of a pending or running background task"""
+    try:
+        task = tracker.get(task_id.hex)
+    except TaskNotFoundError as e:
+        raise HTTPException(status_code=404, detail=f"Task {task_id} not found") from e
+
+    # Only the task owner, or users with access to all units, can cancel a task
+    units = Permissions.unit_codes(tracker.user.permissions)
+    if task.owner != tracker.user.email and Permissions.UNIT_WILDCARD not in units:
+        raise PermissionsError()
+
+    return tracker.cancel(task_id.hex)
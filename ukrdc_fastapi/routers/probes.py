@@ -0,0 +1,75 @@
+from fastapi import APIRouter, Depends, Response
+from pydantic import Field
+from redis import Redis
+from redis.exceptions import RedisError
+
+from ukrdc_fastapi.dependencies import get_redis
+from ukrdc_fastapi.schemas.base import JSONModel
+from ukrdc_fastapi.utils.cache import CacheKey
+from ukrdc_fastapi.utils.startup import startup_timer
+
+router = APIRouter(tags=["Probes"], include_in_schema=False)
+
+# Caches warmed by repeated tasks, which requests would otherwise build on demand
+WARM_CACHES = {
+    "facilities": CacheKey.FACILITIES_LIST,
+    "mirth_channels": CacheKey.MIRTH_CHANNEL_INFO,
+}
+
+# Warm caches this process has seen populated. Once warm, a process stays ready
+# while the caches expire and are rebuilt, as requests can rebuild them on demand.
+_warmed: set[str] = set()
+
+
+class LivenessSchema(JSONModel):
+    live: bool = Field(..., description="Is the process able to serve requests")
+
+
+class ReadinessSchema(JSONModel):
+    ready: bool = Field(..., description="Is the process ready for traffic")
+    redis: bool = Field(..., description="Is Redis reachable")
+    caches: dict[str, bool] = Field(
+        ...,
+        description="Has each warm cache been populated since the process started, by cache name",
+    )
+    startup_seconds: dict[str, float] = Field(
+        ..., description="Seconds taken to reach each startup stage, by stage name"
+    )
+
+
+@router.get("/live", response_model=LivenessSchema)
+async def live():
+    """Report that the process is alive. Never checks dependencies, so an outage
+    elsewhere doesn't get every worker restarted."""
+    return LivenessSchema(live=True)
+
+
+@router.get("/ready", response_model=ReadinessSchema)
+def ready(response: Response, redis: Redis = Depends(get_redis)):
+    """Report whether Redis is reachable and the warm caches have been populated.
+    Responds 503 until they have, so traffic is only routed to warm workers."""
+    cold = [name for name in WARM_CACHES if name not in _warmed]
+    try:
+        pipe = redis.pipeline(transaction=False)
+        pipe.ping()
+        for name in cold:
+            pipe.exists(WARM_CACHES[name].value)
+        _, *populated = pipe.execute()
+        _warmed.update(name for name, exists in zip(cold, populated) if exists)
+        redis_ok = True
+    except RedisError:
+        redis_ok = False
+    caches = {name: name in _warmed for name in WARM_CACHES}
+
+    is_ready = redis_ok and all(caches.values())
+    if is_ready:
+        startup_timer.mark("ready")
+    else:
+        response.status_code = 503
+
+    return ReadinessSchema(
+        ready=is_ready,
+        redis=redis_ok,
+        caches=caches,
+        startup_seconds=startup_timer.stages,
+    )
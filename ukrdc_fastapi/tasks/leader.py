@@ -0,0 +1,104 @@
+import asyncio
+import functools
+import logging
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.dependencies.redis_clients import RedisDatabase, get_redis_client
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock, renew_lock
+
+logger = logging.getLogger(__name__)
+
+# Lock key of the lease held by the worker running repeated tasks
+LEADER_LEASE_KEY = "leader:repeated-tasks"
+
+
+class LeaderElection:
+    """Elect one worker, across all processes and hosts, to run repeated tasks.
+
+    The leader holds a lease in Redis, renewed well before it expires. If the
+    leader stops renewing it, e.g. because the worker died, the lease expires
+    and the next worker to try takes over.
+    """
+
+    def __init__(self, redis: Redis, key: str, lease_seconds: int) -> None:
+        self.redis = redis
+        self.key = key
+        self.lease_seconds = lease_seconds
+        self._token: str | None = None
+        self._renewer: asyncio.Task | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Does this worker currently hold the lease"""
+        return self._token is not None
+
+    def campaign(self) -> bool:
+        """Renew the lease if we hold it, otherwise try to acquire it
+
+        Returns:
+            bool: Does this worker now hold the lease
+        """
+        was_leader = self.is_leader
+        try:
+            if not (
+                self._token
+                and renew_lock(self.redis, self.key, self._token, self.lease_seconds)
+            ):
+                self._token = acquire_lock(self.redis, self.key, self.lease_seconds)
+        except RedisError:
+            # We can't tell if we still hold the lease, so assume not
+            logger.warning("Unable to renew leader lease", exc_info=True)
+            self._token = None
+
+        if self.is_leader != was_leader:
+            logger.info(
+                "Became leader for repeated tasks"
+                if self.is_leader
+                else "No longer leader for repeated tasks"
+            )
+        return self.is_leader
+
+    async def _renew_forever(self) -> None:
+        while True:
+            # Renew a few times per lease, so one slow renewal doesn't lose it
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.campaign()
+
+    def start(self) -> None:
+        """Campaign for the lease now, and keep renewing or campaigning in the background"""
+        self.campaign()
+        if self._renewer is None:
+            self._renewer = asyncio.ensure_future(self._renew_forever())
+
+    def stop(self) -> None:
+        """Stop campaigning, and hand the lease over immediately if we hold it"""
+        if self._renewer is not None:
+            self._renewer.cancel()
+            self._renewer = None
+        if self._token:
+            try:
+                release_lock(self.redis, self.key, self._token)
+            except RedisError:
+                # The lease will expire by itself instead
+                logger.warning("Unable to release leader lease", exc_info=True)
+            self._token = None
+
+
+@functools.cache
+def get_leader() -> LeaderElection:
+    """Return this process's leader election, creating it on first use.
+
+    Created lazily, so importing this module doesn't create a Redis client
+    before settings, e.g. the Redis backend, have been overridden.
+
+    Returns:
+        LeaderElection: Leader election for repeated tasks
+    """
+    return LeaderElection(
+        get_redis_client(RedisDatabase.LOCKS),
+        LEADER_LEASE_KEY,
+        lease_seconds=settings.leader_lease_seconds,
+    )
@@ -1,26 +1,45 @@
 import asyncio
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import date, datetime, time, timedelta
+from functools import partial
+from time import perf_counter
 from typing import Any
 
-from sqlalchemy import select
+from mirth_client.models import ChannelModel
+from redis import Redis
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session
 from sqlalchemy.sql.functions import func
-from ukrdc_sqla.ukrdc import PatientRecord
+from ukrdc_sqla.ukrdc import Name, PatientRecord
+from ukrdc_stats.calculators.krt import UnitLevelKRTStats
 
 from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies import get_redis, get_root_task_tracker
 from ukrdc_fastapi.dependencies.database import errors_session, ukrdc3_session
 from ukrdc_fastapi.dependencies.mirth import mirth_session
-from ukrdc_fastapi.exceptions import MissingFacilityError
+from ukrdc_fastapi.dependencies.redis_clients import RedisDatabase, get_redis_client
+from ukrdc_fastapi.exceptions import MissingFacilityError, TaskLockError
+from ukrdc_fastapi.models.search import PhoneticName
 from ukrdc_fastapi.query.facilities import get_facilities
 from ukrdc_fastapi.query.facilities.stats import get_facility_dialysis_stats
 from ukrdc_fastapi.schemas.message import MessageSchema
-from ukrdc_fastapi.utils.cache import BasicCache, DynamicCacheKey, FacilityCachePrefix
-from ukrdc_fastapi.utils.mirth import get_channel_map
+from ukrdc_fastapi.utils.cache import (
+    BasicCache,
+    DynamicCacheKey,
+    FacilityCachePrefix,
+    ResponseBodyCodec,
+)
+from ukrdc_fastapi.utils.cache_stats import cache_stats
+from ukrdc_fastapi.utils.mirth import get_cached_channel_map, get_channel_map
+from ukrdc_fastapi.utils.phonetic import phonetic_keys
 from ukrdc_fastapi.utils.records import ABSTRACT_FACILITIES
+from ukrdc_fastapi.utils.search import phonetic_name_table_exists
+from ukrdc_fastapi.utils.tasks import TaskProgress, job
 
-from .utils import repeat_every
+from .leader import get_leader
+from .scheduler import Interval, Scheduler, schedule_from
 
 # Shared threadpool for CPU-intensive operations
 task_executor = ThreadPoolExecutor(
@@ -28,6 +47,23 @@ task_executor = ThreadPoolExecutor(
 )
 logger = logging.getLogger(__name__)
 
+# Scheduler running the repeated tasks below, started with the app
+scheduler = Scheduler(
+    partial(get_redis_client, RedisDatabase.TASKS),
+    partial(get_redis_client, RedisDatabase.LOCKS),
+    leader=get_leader,
+)
+
+# Process pool for dialysis stats pre-calculation, created on first use
+_stats_executor: ProcessPoolExecutor | None = None
+
+# Hash of facility codes to the latest record update their cached stats include
+DIALYSIS_STATS_UPDATED_KEY = "dialysis-stats-updated"
+# Hash of facility codes to the seconds their stats last took to calculate
+DIALYSIS_STATS_TIMINGS_KEY = "dialysis-stats-timings"
+# Latest record update included in the phonetic name index
+PHONETIC_INDEX_UPDATED_KEY = "phonetic-index-updated"
+
 
 async def _run_in_threadpool(sync_func, *args):
     """Helper to run sync code in threadpool"""
@@ -35,7 +71,19 @@ async def _run_in_threadpool(sync_func, *args):
     return await loop.run_in_executor(task_executor, lambda: sync_func(*args))
 
 
-@repeat_every(seconds=settings.cache_mirth_channel_seconds)
+def _set_channel_names(channel_map: dict[str, ChannelModel]) -> None:
+    MessageSchema.set_channel_id_name_map(
+        {channel_id: channel.name for channel_id, channel in channel_map.items()}
+    )
+
+
+@scheduler.job(
+    "update_channel_id_name_map",
+    Interval(settings.cache_mirth_channel_seconds),
+    # Every worker holds its own copy of the map, so loads it at startup
+    exclusive=False,
+    run_at_start=True,
+)
 async def update_channel_id_name_map() -> None:
     """
     Update the in-memory Mirth Channel ID-Name map used by MessageSchema
@@ -43,26 +91,39 @@ async def update_channel_id_name_map() -> None:
 
     Repeats every `cache_mirth_channel_seconds` seconds, to match the cache expiry time.
 
-    The function runs as a tracked background task.
+    The function runs as a tracked background task on the leader worker. Other
+    workers load the map cached by the leader, only contacting Mirth themselves
+    if nothing has been cached yet.
     """
+    if not get_leader().is_leader:
+        channel_map = get_cached_channel_map(get_redis())
+        if channel_map is None:
+            async with mirth_session() as mirth:
+                channel_map = await get_channel_map(mirth, get_redis())
+        _set_channel_names(channel_map)
+        return None
 
     async def innerfunc():
         async with mirth_session() as mirth:
-            channel_map = await _run_in_threadpool(get_channel_map, mirth, get_redis())
-            MessageSchema._channel_id_name_map = channel_map
+            # Always reload, rather than only once the cached map has expired
+            _set_channel_names(await get_channel_map(mirth, get_redis(), refresh=True))
 
     task = get_root_task_tracker().create(innerfunc, name="Update Mirth Channel Map")
     return await task.tracked()
 
 
-@repeat_every(seconds=settings.cache_facilities_list_seconds)
+@scheduler.job(
+    "update_facilities_cache",
+    Interval(settings.cache_facilities_list_seconds),
+    leader_only=True,
+)
 async def update_facilities_cache() -> None:
     """
     Update the cached info and basic counts for all facilities.
 
     Repeats every `cache_facilities_list_seconds` seconds, to match the cache expiry time.
 
-    The function runs as a tracked background task.
+    The function runs as a tracked background task, on the leader worker only.
     """
 
     async def innerfunc():
@@ -74,83 +135,382 @@ async def update_facilities_cache() -> None:
                 get_redis(),
                 True,  # include_inactive
                 True,  # include_empty
+                True,  # refresh, rather than only once the cached list has expired
             )
 
     task = get_root_task_tracker().create(innerfunc, name="Update Facilities Cache")
     return await task.tracked()
 
 
-@repeat_every(seconds=settings.cache_facilities_stats_dialysis_seconds)
+@job("precalculate_facility_stats_dialysis")
+async def _precalculate_facility_stats_dialysis(
+    progress: TaskProgress | None = None,
+) -> None:
+    redis = get_redis()
+    windows = _dialysis_stats_windows(datetime.now().date())
+    facilities = await _run_in_threadpool(_facilities_to_precalculate)
+    if progress:
+        progress.set_total(len(facilities))
+
+    # Skip facilities with no new data since their cached stats were calculated
+    last_updated = redis.hgetall(DIALYSIS_STATS_UPDATED_KEY)
+    changed: dict[str, datetime | None] = {}
+    for facility, updated in facilities.items():
+        caches = [_dialysis_stats_cache(redis, facility, *window) for window in windows]
+        # Facilities with no record update dates can't be compared, so always change
+        if (
+            updated is not None
+            and last_updated.get(facility) == updated.isoformat()
+            and all(cache.exists for cache in caches)
+        ):
+            for cache in caches:
+                cache.renew(
+                    expire=settings.cache_facilities_stats_dialysis_seconds,
+                    stale_for=settings.cache_facilities_stats_stale_seconds,
+                )
+        else:
+            changed[facility] = updated
+    if progress:
+        progress.advance(len(facilities) - len(changed))
+    logger.info(
+        f"Pre-calculating dialysis stats for {len(changed)} facilities, "
+        f"{len(facilities) - len(changed)} unchanged"
+    )
+
+    # Calculate each facility in parallel, in its own process and session
+    loop = asyncio.get_running_loop()
+
+    async def calculate(facility: str) -> tuple[str, Any]:
+        try:
+            return facility, await loop.run_in_executor(
+                _get_stats_executor(), _calculate_facility_stats, facility, windows
+            )
+        except Exception:
+            logger.exception(f"Dialysis stats failed for {facility}")
+            return facility, None
+
+    timings: dict[str, float] = {}
+    for next_result in asyncio.as_completed([calculate(f) for f in changed]):
+        facility, result = await next_result
+        if progress:
+            progress.advance()
+        if result is None:
+            continue
+        stats, timings[facility] = result
+
+        # Main process handles Redis
+        for (start, end), facility_stats in stats.items():
+            _dialysis_stats_cache(redis, facility, start, end).set(
+                facility_stats,
+                expire=settings.cache_facilities_stats_dialysis_seconds,
+                stale_for=settings.cache_facilities_stats_stale_seconds,
+            )
+        updated = changed[facility]
+        if updated is not None:
+            redis.hset(DIALYSIS_STATS_UPDATED_KEY, facility, updated.isoformat())
+
+    # Record how long each facility took, to find those dominating the run
+    if timings:
+        redis.hset(DIALYSIS_STATS_TIMINGS_KEY, mapping=timings)  # type: ignore[arg-type]
+        slowest = sorted(timings.items(), key=lambda item: item[1], reverse=True)
+        logger.info(
+            "Slowest dialysis stats: "
+            + ", ".join(
+                f"{facility} {seconds:.1f}s" for facility, seconds in slowest[:10]
+            )
+        )
+
+
+@scheduler.job(
+    "precalculate_facility_stats_dialysis",
+    schedule_from(
+        settings.cache_facilities_stats_dialysis_seconds,
+        settings.cache_facilities_stats_dialysis_cron,
+    ),
+    leader_only=True,
+)
 async def precalculate_facility_stats_dialysis() -> None:
     """
     Pre-calculate the dialysis stats for all facilities with more than
     `cache_facilities_stats_dialysis_min` records.
+
+    Repeats every `cache_facilities_stats_dialysis_seconds` seconds, or on the
+    `cache_facilities_stats_dialysis_cron` schedule if set.
+
+    Runs on the leader worker only. If `task_queue_enabled` is set, the
+    calculation is queued to run in a worker process instead.
     """
+    if settings.task_queue_enabled:
+        try:
+            get_root_task_tracker().enqueue(
+                "precalculate_facility_stats_dialysis",
+                name="Pre-calculate Dialysis Stats",
+                # Don't queue another run while the last one is still waiting
+                lock="precalculate_facility_stats_dialysis",
+            )
+        except TaskLockError:
+            logger.info("Dialysis stats pre-calculation is already queued")
+        return None
 
-    async def innerfunc():
-        stats = await _run_in_threadpool(_calculate_stats_sync)
+    task = get_root_task_tracker().create(
+        _precalculate_facility_stats_dialysis, name="Pre-calculate Dialysis Stats"
+    )
+    return await task.tracked()
 
-        # Main thread handles Redis
-        for facility, data in stats.items():
-            cache = BasicCache(
-                get_redis(),
-                DynamicCacheKey(
-                    FacilityCachePrefix.KRT, facility, data["start"], data["end"]
-                ),
+
+@job("build_phonetic_name_index")
+async def _build_phonetic_name_index(progress: TaskProgress | None = None) -> None:
+    redis = get_redis()
+    last_updated = redis.get(PHONETIC_INDEX_UPDATED_KEY)
+    since = datetime.fromisoformat(str(last_updated)) if last_updated else None
+
+    def build() -> tuple[int, datetime | None] | None:
+        with ukrdc3_session() as ukrdc3:
+            # The table is created by the setup script, never against a live
+            # database by this task
+            if not phonetic_name_table_exists(ukrdc3):
+                return None
+            # Records updated after this are picked up by the next run
+            latest = ukrdc3.scalar(select(func.max(PatientRecord.repositoryupdatedate)))
+            return _build_phonetic_index(ukrdc3, since, progress), latest
+
+    built = await _run_in_threadpool(build)
+    if built is None:
+        logger.warning(
+            "Skipping phonetic name index build, as its table doesn't exist. "
+            "Create it with scripts/search/create_name_index.py"
+        )
+        return
+    indexed, latest = built
+    if latest:
+        redis.set(PHONETIC_INDEX_UPDATED_KEY, latest.isoformat())
+    logger.info(f"Indexed phonetic names of {indexed} records")
+
+
+@scheduler.job(
+    "build_phonetic_name_index",
+    Interval(settings.search_phonetic_index_seconds),
+    leader_only=True,
+)
+async def build_phonetic_name_index() -> None:
+    """
+    Update the phonetic name index used by phonetic patient search, for
+    records updated since the last run. The first run indexes every record.
+
+    Repeats every `search_phonetic_index_seconds` seconds.
+
+    Runs on the leader worker only. If `task_queue_enabled` is set, the
+    update is queued to run in a worker process instead.
+    """
+    if settings.task_queue_enabled:
+        try:
+            get_root_task_tracker().enqueue(
+                "build_phonetic_name_index",
+                name="Build Phonetic Name Index",
+                lock="build_phonetic_name_index",
             )
-            if not cache.exists:
-                cache.set(
-                    data["stats"],
-                    expire=settings.cache_facilities_stats_dialysis_seconds,
-                )
+        except TaskLockError:
+            logger.info("Phonetic name index build is already queued")
+        return None
 
     task = get_root_task_tracker().create(
-        innerfunc, name="Pre-calculate Dialysis Stats"
+        _build_phonetic_name_index, name="Build Phonetic Name Index"
     )
     return await task.tracked()
 
 
-def _calculate_stats_sync() -> dict[str, dict[str, Any]]:
-    """Sync stats calculation (runs in threadpool)"""
-    results = {}
+@scheduler.job(
+    "sweep_orphaned_tasks",
+    Interval(settings.redis_tasks_heartbeat_timeout),
+    leader_only=True,
+)
+async def sweep_orphaned_tasks() -> None:
+    """
+    Fail tasks whose heartbeat has stopped, and release their locks. Jobs left
+    by worker processes which have stopped are queued again.
+
+    Repeats every `redis_tasks_heartbeat_timeout` seconds, on the leader worker only.
+    """
+    tracker = get_root_task_tracker()
+    swept = tracker.sweep()
+    if swept:
+        logger.warning(f"Swept {len(swept)} orphaned tasks")
+    requeued = tracker.requeue_orphaned_jobs()
+    if requeued:
+        logger.warning(f"Queued {requeued} orphaned jobs again")
+
+
+@scheduler.job(
+    "flush_cache_stats",
+    Interval(settings.cache_stats_flush_seconds),
+    jitter=0,
+    # Every worker records its own counters, so flushes them itself
+    exclusive=False,
+)
+async def flush_cache_stats() -> None:
+    """
+    Merge this worker's cache statistics into Redis, away from the request path.
+
+    Repeats every `cache_stats_flush_seconds` seconds, on every worker.
+    """
+    await _run_in_threadpool(cache_stats.flush, get_redis())
+
+
+def _get_stats_executor() -> ProcessPoolExecutor:
+    global _stats_executor  # pylint: disable=global-statement
+    if _stats_executor is None:
+        # Spawn fresh processes, as forking copies the API's threads and connections
+        _stats_executor = ProcessPoolExecutor(
+            max_workers=settings.cache_facilities_stats_dialysis_processes,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _stats_executor
+
+
+def shutdown_stats_executor() -> None:
+    """Stop the dialysis stats process pool, if started. Used on app shutdown."""
+    global _stats_executor  # pylint: disable=global-statement
+    if _stats_executor is not None:
+        _stats_executor.shutdown(wait=False, cancel_futures=True)
+        _stats_executor = None
+
+
+def _dialysis_stats_windows(today: date) -> list[tuple[date, date]]:
+    """Date windows to pre-calculate stats for: the last 90 days, and the
+    90 days up to the start of the current quarter"""
+    q_start = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
+    return [(end - timedelta(days=90), end) for end in [today, q_start]]
+
+
+def _dialysis_stats_cache(
+    redis: Redis, facility: str, start: date, end: date
+) -> BasicCache:
+    return BasicCache(
+        redis,
+        DynamicCacheKey(
+            FacilityCachePrefix.KRT,
+            facility,
+            start.strftime("%Y-%m-%d"),
+            end.strftime("%Y-%m-%d"),
+        ),
+        # Store the response body served by the `facility_stats_krt` route
+        codec=ResponseBodyCodec(UnitLevelKRTStats),
+    )
+
+
+def _facilities_to_precalculate() -> dict[str, datetime | None]:
+    """Facilities with enough UKRDC records to pre-calculate dialysis stats for,
+    mapped to the last time any of their records were updated, or None if none
+    of their records have an update date"""
     with ukrdc3_session() as ukrdc3:
         stmt = (
             select(
                 PatientRecord.sendingfacility,
-                PatientRecord.sendingextract,
-                func.count(PatientRecord.sendingfacility),
+                func.max(PatientRecord.repositoryupdatedate),
             )
             .where(PatientRecord.sendingfacility.notin_(ABSTRACT_FACILITIES))
             .where(PatientRecord.sendingextract == "UKRDC")
-            .group_by(PatientRecord.sendingfacility, PatientRecord.sendingextract)
+            .group_by(PatientRecord.sendingfacility)
+            .having(
+                func.count(PatientRecord.sendingfacility)
+                > settings.cache_facilities_stats_dialysis_min
+            )
             .order_by(func.count(PatientRecord.sendingfacility).desc())
         )
+        return {facility: updated for facility, updated in ukrdc3.execute(stmt).all()}
+
+
+def _calculate_facility_stats(
+    facility: str, windows: list[tuple[date, date]]
+) -> tuple[dict[tuple[date, date], UnitLevelKRTStats], float]:
+    """Calculate a facility's dialysis stats for each window (runs in a worker process)
+
+    Returns:
+        tuple[dict[tuple[date, date], UnitLevelKRTStats], float]: Stats for each
+            window, and the time taken in seconds
+    """
+    started_at = perf_counter()
+    results: dict[tuple[date, date], UnitLevelKRTStats] = {}
+    with ukrdc3_session() as ukrdc3:
+        for start_date, end_date in windows:
+            try:
+                results[(start_date, end_date)] = get_facility_dialysis_stats(
+                    ukrdc3,
+                    facility,
+                    since=datetime.combine(start_date, time.min),
+                    until=datetime.combine(end_date, time.max),
+                )
+            except MissingFacilityError as e:
+                logger.error(f"Stats failed for {facility}: {e}")
+    return results, perf_counter() - started_at
+
+
+def _build_phonetic_index(
+    ukrdc3: Session,
+    since: datetime | None = None,
+    progress: TaskProgress | None = None,
+) -> int:
+    """(Re)build the phonetic name index, a batch of patient records at a time.
+
+    Each batch is committed separately, so the index stays usable while it is
+    built. Entries for records which no longer exist are removed on every build.
+
+    Args:
+        ukrdc3 (Session): SQLAlchemy session
+        since (Optional[datetime]): Only index records updated since
+            this time. Defaults to None, indexing every record.
+        progress (Optional[TaskProgress]): Progress handle of a tracked task
+
+    Returns:
+        int: Number of records indexed
+    """
+    stmt = select(PatientRecord.pid).order_by(PatientRecord.pid)
+    if since:
+        stmt = stmt.where(PatientRecord.repositoryupdatedate >= since)
+
+    if progress:
+        progress.set_total(
+            ukrdc3.scalar(select(func.count()).select_from(stmt.subquery())) or 0
+        )
+
+    indexed = 0
+    last_pid: str | None = None
+    while True:
+        # Page through records by PID, as offsets get slower the further they go
+        batch_stmt = stmt.limit(settings.search_phonetic_index_batch_size)
+        if last_pid is not None:
+            batch_stmt = batch_stmt.where(PatientRecord.pid > last_pid)
+        pids = ukrdc3.scalars(batch_stmt).all()
+        if not pids:
+            break
+
+        keys: dict[str, set[str]] = {}
+        for pid, given, family in ukrdc3.execute(
+            select(Name.pid, Name.given, Name.family).where(Name.pid.in_(pids))
+        ):
+            keys.setdefault(pid, set()).update(phonetic_keys([given, family]))
+
+        ukrdc3.execute(delete(PhoneticName).where(PhoneticName.pid.in_(pids)))
+        rows = [
+            {"pid": pid, "key": key}
+            for pid, pid_keys in keys.items()
+            for key in pid_keys
+        ]
+        if rows:
+            ukrdc3.execute(insert(PhoneticName), rows)
+        ukrdc3.commit()
+
+        indexed += len(pids)
+        last_pid = pids[-1]
+        if progress:
+            progress.advance(len(pids))
+
+    # Deleted records have no update date to pick them up by, so always prune
+    ukrdc3.execute(
+        delete(PhoneticName).where(
+            ~exists().where(PatientRecord.pid == PhoneticName.pid)
+        )
+    )
+    ukrdc3.commit()
 
-        facilities = ukrdc3.execute(stmt).all()
-
-        today = datetime.now().date()
-        q_start = date(today.year, ((today.month - 1) // 3) * 3 + 1, 1)
-
-        for row in facilities:
-            if row[2] <= settings.cache_facilities_stats_dialysis_min:
-                continue
-
-            facility = row[0]
-            for end_date in [today, q_start]:
-                start_date = end_date - timedelta(days=90)
-                try:
-                    stats = get_facility_dialysis_stats(
-                        ukrdc3,
-                        facility,
-                        since=datetime.combine(start_date, time.min),
-                        until=datetime.combine(end_date, time.max),
-                    )
-                    results[f"{facility}_{end_date}"] = {
-                        "stats": stats,
-                        "start": start_date.strftime("%Y-%m-%d"),
-                        "end": end_date.strftime("%Y-%m-%d"),
-                    }
-                except MissingFacilityError as e:
-                    logger.error(f"Stats failed for {facility}: {e}")
-
-    return results
+    return indexed
@@ -0,0 +1,455 @@
+"""
+Scheduler for repeated jobs, run at aligned intervals or on cron schedules.
+
+Unlike a plain sleep loop, run times are calculated from the schedule rather
+than from when the last run finished, so they don't drift. Each run is
+delayed by a random jitter, so workers started together don't all run a job
+at once. Jobs can be limited to the elected leader, and exclusive jobs hold a
+lock while running, so runs never overlap, even across a change of leader.
+
+Every run is recorded in Redis, along with per-job duration statistics. A job
+whose last scheduled run was missed, e.g. because no worker was running at
+the time, runs as soon as the scheduler starts, or for leader-only jobs, as
+soon as this worker becomes leader.
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import random
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.tasks.leader import LeaderElection
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock, renew_lock
+
+logger = logging.getLogger(__name__)
+
+# List of recent runs of each job, newest first
+HISTORY_KEY_PREFIX = "_SCHEDULE_HISTORY_:"
+# Hash of run statistics for each job
+STATS_KEY_PREFIX = "_SCHEDULE_STATS_:"
+# Lock held by a running exclusive job
+LOCK_KEY_PREFIX = "scheduler:"
+
+
+class Interval:
+    """Run every `seconds`, aligned to the Unix epoch plus `offset` seconds.
+
+    Aligned runs happen at the same times on every worker, however long each
+    run takes, e.g. an hourly interval always runs on the hour.
+    """
+
+    def __init__(self, seconds: float, offset: float = 0) -> None:
+        if seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.seconds = seconds
+        self.offset = offset
+
+    def next_after(self, after: datetime.datetime) -> datetime.datetime:
+        """Next scheduled run time, strictly after a given time
+
+        Args:
+            after (datetime.datetime): Time to search from
+
+        Returns:
+            datetime.datetime: Next run time
+        """
+        periods = (after.timestamp() - self.offset) // self.seconds + 1
+        return datetime.datetime.fromtimestamp(periods * self.seconds + self.offset)
+
+    def __repr__(self) -> str:
+        return f"Interval({self.seconds}, offset={self.offset})"
+
+
+class Cron:
+    """Run on a standard 5-field cron schedule, in local time.
+
+    Fields are minute, hour, day of month, month, and day of week (0-6 from
+    Sunday, or 7 for Sunday). Each field can be `*`, a value, a range `a-b`,
+    a step `*/n` or `a-b/n`, or a comma-separated list of these. As in cron,
+    if both day fields are restricted, a day matching either one runs.
+    """
+
+    _BOUNDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression must have 5 fields: {expression!r}")
+        self.expression = expression
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            self.weekdays,
+        ) = (
+            self._parse(field, low, high)
+            for field, (low, high) in zip(fields, self._BOUNDS, strict=True)
+        )
+        # Sunday can be written as 0 or 7
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> frozenset[int]:
+        values: set[int] = set()
+        for part in field.split(","):
+            span, _, step = part.partition("/")
+            if span == "*":
+                start, stop = low, high
+            elif "-" in span:
+                start, stop = (int(value) for value in span.split("-", 1))
+            else:
+                start = int(span)
+                stop = high if step else start
+            if not low <= start <= stop <= high:
+                raise ValueError(f"Cron field out of range: {field!r}")
+            values.update(range(start, stop + 1, int(step) if step else 1))
+        return frozenset(values)
+
+    def _day_matches(self, day: datetime.date) -> bool:
+        day_match = day.day in self.days
+        # Python weekdays run from Monday (0), cron weekdays from Sunday (0)
+        weekday_match = (day.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_after(self, after: datetime.datetime) -> datetime.datetime:
+        """Next scheduled run time, strictly after a given time
+
+        Args:
+            after (datetime.datetime): Time to search from
+
+        Raises:
+            ValueError: If the schedule never runs, e.g. on 31st February
+
+        Returns:
+            datetime.datetime: Next run time
+        """
+        candidate = after.replace(second=0, microsecond=0) + datetime.timedelta(
+            minutes=1
+        )
+        # Skip whole months, days, and hours at a time until every field matches
+        limit = candidate + datetime.timedelta(days=366 * 5)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                year, month = divmod(candidate.month, 12)
+                candidate = candidate.replace(
+                    year=candidate.year + year, month=month + 1, day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(candidate.date()):
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(
+                    days=1
+                )
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never runs: {self.expression!r}")
+
+    def __repr__(self) -> str:
+        return f"Cron({self.expression!r})"
+
+
+Schedule = Interval | Cron
+
+
+def schedule_from(seconds: float, cron: str | None = None) -> Schedule:
+    """Schedule from a cron expression if one is configured, otherwise an interval
+
+    Args:
+        seconds (float): Interval in seconds
+        cron (Optional[str], optional): Cron expression. Defaults to None.
+
+    Returns:
+        Schedule: Job schedule
+    """
+    return Cron(cron) if cron else Interval(seconds)
+
+
+class ScheduledJob:
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        schedule: Schedule,
+        jitter: float,
+        leader_only: bool,
+        exclusive: bool,
+        run_at_start: bool,
+    ) -> None:
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.jitter = jitter
+        self.leader_only = leader_only
+        self.exclusive = exclusive
+        self.run_at_start = run_at_start
+
+
+class Scheduler:
+    """Run registered jobs on their schedules, in the background of this process"""
+
+    def __init__(
+        self,
+        redis: Callable[[], Redis],
+        lock_redis: Callable[[], Redis],
+        leader: Callable[[], LeaderElection] | None = None,
+    ) -> None:
+        # Clients are only created on first use, so jobs can be registered at
+        # import time, before settings such as the Redis backend are overridden
+        self._get_redis = redis
+        self._get_lock_redis = lock_redis
+        self._get_leader = leader
+        self.jobs: dict[str, ScheduledJob] = {}
+        self._loops: list[asyncio.Task] = []
+
+    @property
+    def redis(self) -> Redis:
+        """Redis client holding job history and statistics"""
+        return self._get_redis()
+
+    @property
+    def lock_redis(self) -> Redis:
+        """Redis client holding job locks"""
+        return self._get_lock_redis()
+
+    @property
+    def leader(self) -> LeaderElection | None:
+        """Leader election limiting `leader_only` jobs, if any"""
+        return self._get_leader() if self._get_leader else None
+
+    def job(
+        self,
+        name: str,
+        schedule: Schedule,
+        jitter: float | None = None,
+        leader_only: bool = False,
+        exclusive: bool = True,
+        run_at_start: bool = False,
+    ) -> Callable[[Callable], Callable]:
+        """Register an async function to run on a schedule
+
+        Args:
+            name (str): Unique job name, used for its history, stats, and lock
+            schedule (Schedule): When to run the job
+            jitter (Optional[float], optional): Maximum random delay added to each
+                run, in seconds. Defaults to `scheduler_jitter_seconds`.
+            leader_only (bool, optional): Only run on the elected leader. Defaults to False.
+            exclusive (bool, optional): Hold a lock while running, so runs on
+                different processes never overlap. Defaults to True.
+            run_at_start (bool, optional): Always run when the scheduler starts,
+                e.g. to populate in-process state. Otherwise, the job only runs at
+                start if its last scheduled run was missed. Defaults to False.
+
+        Returns:
+            Callable[[Callable], Callable]: Decorator, returning the function unchanged
+        """
+
+        def decorator(func: Callable) -> Callable:
+            if name in self.jobs:
+                raise ValueError(f"Scheduled job {name} is already registered")
+            self.jobs[name] = ScheduledJob(
+                name=name,
+                func=func,
+                schedule=schedule,
+                jitter=settings.scheduler_jitter_seconds if jitter is None else jitter,
+                leader_only=leader_only,
+                exclusive=exclusive,
+                run_at_start=run_at_start,
+            )
+            return func
+
+        return decorator
+
+    def history(self, name: str) -> list[dict[str, Any]]:
+        """Recent runs of a job, newest first
+
+        Args:
+            name (str): Job name
+
+        Returns:
+            list[dict[str, Any]]: Run records
+        """
+        return [
+            json.loads(run)
+            for run in self.redis.lrange(f"{HISTORY_KEY_PREFIX}{name}", 0, -1)
+        ]
+
+    def stats(self, name: str) -> dict[str, float]:
+        """Run count, failure count, and duration statistics of a job
+
+        Args:
+            name (str): Job name
+
+        Returns:
+            dict[str, float]: Job statistics
+        """
+        raw: dict = self.redis.hgetall(f"{STATS_KEY_PREFIX}{name}")  # type: ignore[assignment]
+        return {
+            (key.decode() if isinstance(key, bytes) else key): float(value)
+            for key, value in raw.items()
+        }
+
+    def _missed(self, job: ScheduledJob, now: datetime.datetime) -> bool:
+        """Has a scheduled run been missed since the job last ran on any worker"""
+        last_run = self.redis.hget(f"{STATS_KEY_PREFIX}{job.name}", "last_run")
+        if last_run is None:
+            return True
+        last = datetime.datetime.fromtimestamp(float(last_run))
+        return job.schedule.next_after(last) <= now
+
+    async def _hold_lock(self, key: str, token: str) -> None:
+        while True:
+            # Renew a few times per timeout, so one slow renewal doesn't lose it
+            await asyncio.sleep(settings.scheduler_lock_seconds / 3)
+            renew_lock(self.lock_redis, key, token, settings.scheduler_lock_seconds)
+
+    async def run(self, job: ScheduledJob) -> bool:
+        """Run a job once now, unless it shouldn't run on this worker, recording
+        the run in its history and statistics
+
+        Args:
+            job (ScheduledJob): Job to run
+
+        Returns:
+            bool: Did the job run
+        """
+        if job.leader_only and self.leader and not self.leader.is_leader:
+            return False
+
+        lock_key = f"{LOCK_KEY_PREFIX}{job.name}"
+        token: str | None = None
+        if job.exclusive:
+            token = acquire_lock(
+                self.lock_redis, lock_key, settings.scheduler_lock_seconds
+            )
+            if not token:
+                logger.info(f"Skipping {job.name}, as it is already running")
+                return False
+        renewer = (
+            asyncio.ensure_future(self._hold_lock(lock_key, token)) if token else None
+        )
+
+        started = time.time()
+        started_at = time.perf_counter()
+        error: str | None = None
+        try:
+            await job.func()
+        except Exception as e:
+            logger.exception(f"Scheduled job {job.name} failed")
+            error = str(e)
+        finally:
+            if renewer:
+                renewer.cancel()
+            if token:
+                release_lock(self.lock_redis, lock_key, token)
+        duration = time.perf_counter() - started_at
+
+        self._record(job, started, duration, error)
+        return True
+
+    def _record(
+        self, job: ScheduledJob, started: float, duration: float, error: str | None
+    ) -> None:
+        history_key = f"{HISTORY_KEY_PREFIX}{job.name}"
+        stats_key = f"{STATS_KEY_PREFIX}{job.name}"
+        run = {
+            "started": datetime.datetime.fromtimestamp(started).isoformat(),
+            "seconds": round(duration, 3),
+            "status": "failed" if error else "finished",
+            "error": error,
+        }
+        try:
+            max_seconds = float(self.redis.hget(stats_key, "max_seconds") or 0)  # type: ignore[arg-type]
+            pipe = self.redis.pipeline()
+            pipe.lpush(history_key, json.dumps(run))
+            pipe.ltrim(history_key, 0, settings.scheduler_history_length - 1)
+            pipe.hincrby(stats_key, "runs", 1)
+            pipe.hincrby(stats_key, "failures", int(error is not None))
+            pipe.hincrbyfloat(stats_key, "total_seconds", duration)
+            pipe.hset(
+                stats_key,
+                mapping={
+                    "last_run": started,
+                    "last_seconds": duration,
+                    "max_seconds": max(max_seconds, duration),
+                },
+            )
+            pipe.execute()
+        except RedisError:
+            # Losing a record is better than stopping the job's schedule
+            logger.warning(f"Unable to record run of {job.name}", exc_info=True)
+
+    async def _wait(self, job: ScheduledJob, next_run: datetime.datetime) -> None:
+        """Sleep until a job's next run.
+
+        Leader-only jobs wake early if this worker becomes leader and a run was
+        missed, e.g. because the previous leader died, or because this worker
+        wasn't yet leader when it started.
+        """
+        delay = (next_run - datetime.datetime.now()).total_seconds()
+        # Jitter only spreads load across workers, so needn't be secure
+        jitter = random.uniform(0, job.jitter)  # nosec B311
+        wake_at = time.monotonic() + max(delay, 0) + jitter
+
+        leader = self.leader if job.leader_only else None
+        if leader is None:
+            await asyncio.sleep(wake_at - time.monotonic())
+            return
+
+        was_leader = leader.is_leader
+        while (remaining := wake_at - time.monotonic()) > 0:
+            # Check as often as the leader renews its lease
+            await asyncio.sleep(min(remaining, leader.lease_seconds / 3))
+            if leader.is_leader and not was_leader:
+                try:
+                    if self._missed(job, datetime.datetime.now()):
+                        return
+                except RedisError:
+                    logger.warning(f"Unable to check {job.name}", exc_info=True)
+            was_leader = leader.is_leader
+
+    async def _run_forever(self, job: ScheduledJob) -> None:
+        now = datetime.datetime.now()
+        try:
+            run_now = job.run_at_start or self._missed(job, now)
+        except RedisError:
+            run_now = True
+        next_run = now if run_now else job.schedule.next_after(now)
+
+        while True:
+            await self._wait(job, next_run)
+            try:
+                await self.run(job)
+            except RedisError:
+                logger.warning(f"Unable to run {job.name}", exc_info=True)
+            # Schedule from now, skipping any runs missed while this one ran
+            next_run = job.schedule.next_after(datetime.datetime.now())
+
+    def start(self) -> None:
+        """Start running every registered job on its schedule, in the background"""
+        if self._loops:
+            return
+        for job in self.jobs.values():
+            logger.info(f"Scheduling {job.name} on {job.schedule!r}")
+            self._loops.append(asyncio.ensure_future(self._run_forever(job)))
+
+    def stop(self) -> None:
+        """Stop scheduling jobs. Runs in progress are cancelled."""
+        for loop in self._loops:
+            loop.cancel()
+        self._loops = []
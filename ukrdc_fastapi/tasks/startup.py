@@ -1,14 +1,23 @@
 import logging
 
 from ukrdc_fastapi.dependencies import get_root_task_tracker
+from ukrdc_fastapi.utils.tasks import _LOCK_PREFIX
 
 logger = logging.getLogger(__name__)
 
 
-def clear_task_tracker() -> None:
-    """Clear the task tracker"""
+def recover_task_tracker() -> None:
+    """
+    Fail tasks orphaned by processes which died running them, and release their
+    locks. Tasks run by other live processes are left alone.
+    """
     tracker = get_root_task_tracker()
-    logger.info("Flushing tasks from task tracker")
-    tracker.task_redis.flushdb()
-    logger.info("Flushing locks from task tracker")
-    tracker.lock_redis.flushdb()
+    swept = tracker.sweep()
+    logger.info(f"Swept {len(swept)} orphaned tasks from task tracker")
+
+    # Task locks always expire unless renewed by a heartbeat, so a lock without
+    # an expiry was left by an older version, and would otherwise never be freed
+    for key in tracker.lock_redis.scan_iter(match=f"{_LOCK_PREFIX}*"):
+        if tracker.lock_redis.ttl(key) == -1:
+            logger.info(f"Releasing task lock {key!r} with no expiry")
+            tracker.lock_redis.delete(key)
@@ -1,18 +1,291 @@
+import asyncio
+import datetime
+import functools
+import hashlib
 import json
+import logging
+import marshal
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+from decimal import Decimal
 from enum import Enum
-from typing import Any
+from typing import Any, NamedTuple
+from uuid import uuid4
 
-from redis import Redis
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field, TypeAdapter
+from redis import Redis, RedisError
+from redis.client import NEVER_DECODE, PubSubWorkerThread
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 from starlette.responses import Response
 
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.schemas.base import JSONModel
+from ukrdc_fastapi.utils.cache_stats import cache_stats
 from ukrdc_fastapi.utils.encoder import JsonEncoder
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock
+
+logger = logging.getLogger(__name__)
 
 
 class CacheNotSetException(Exception):
     pass
 
 
+# Prefix for the hashes holding metadata (digest, freshness) alongside each cached value
+META_KEY_PREFIX = "meta:"
+# Prefix for the locks ensuring only one request recomputes a cached value at a time
+LOCK_KEY_PREFIX = "lock:"
+# Prefix for the sets of cache keys sharing a tag, used for bulk invalidation
+TAG_KEY_PREFIX = "tag:"
+
+
+def content_digest(data: bytes) -> str:
+    """Compute a stable digest of a serialised cached value.
+
+    Unlike `hash()`, this is identical across processes, so can be used
+    as an ETag shared by every worker.
+
+    Args:
+        data (bytes): Serialised value
+
+    Returns:
+        str: Hex digest
+    """
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+# Codecs
+
+# Encoded values are framed as [codec tag][compression flag][payload]
+_COMPRESSED = b"z"
+_UNCOMPRESSED = b"-"
+# zlib level 1 gives most of the size reduction for a fraction of the CPU time
+_COMPRESSION_LEVEL = 1
+
+# All available codecs, by tag, so any worker can decode any stored value
+_CODECS: dict[bytes, type["CacheCodec"]] = {}
+
+
+class CacheCodec:
+    """Base class for converting cached values to and from bytes.
+
+    Encoded values start with a short header identifying the codec and
+    compression used, so a value can be decoded regardless of which codec
+    wrote it. Subclasses are registered automatically by their `tag`.
+    """
+
+    # Single byte identifying values written by this codec
+    tag: bytes = b""
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        _CODECS[cls.tag] = cls
+
+    def __init__(self, compress_min_bytes: int | None = None) -> None:
+        """Create a codec
+
+        Args:
+            compress_min_bytes (Optional[int]): Compress payloads at least this many
+                bytes long, or never if 0. Defaults to `settings.cache_compress_min_bytes`.
+        """
+        self.compress_min_bytes: int = (
+            settings.cache_compress_min_bytes
+            if compress_min_bytes is None
+            else compress_min_bytes
+        )
+
+    def dumps(self, obj: Any) -> bytes:
+        """Serialise a value to an uncompressed payload"""
+        raise NotImplementedError
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        """Deserialise an uncompressed payload"""
+        raise NotImplementedError
+
+    def encode(self, obj: Any) -> bytes:
+        """Serialise a value, compressing it if large, and add the codec header
+
+        Args:
+            obj (Any): Value to encode
+
+        Returns:
+            bytes: Encoded value
+        """
+        payload = self.dumps(obj)
+        if self.compress_min_bytes and len(payload) >= self.compress_min_bytes:
+            return self.tag + _COMPRESSED + zlib.compress(payload, _COMPRESSION_LEVEL)
+        return self.tag + _UNCOMPRESSED + payload
+
+
+def decode_value(data: bytes) -> Any:
+    """Decode a value written by any codec
+
+    Args:
+        data (bytes): Encoded value
+
+    Returns:
+        Any: Decoded value
+    """
+    codec, payload = _unframe(data)
+    # Values cached before codecs were introduced are bare JSON
+    if codec is None:
+        return json.loads(payload)
+    return codec.loads(payload)
+
+
+def _unframe(data: bytes) -> tuple[type[CacheCodec] | None, bytes]:
+    # Split an encoded value into the codec that wrote it, and its uncompressed payload
+    codec = _CODECS.get(data[:1])
+    if codec is None:
+        return None, data
+    payload = data[2:]
+    if data[1:2] == _COMPRESSED:
+        payload = zlib.decompress(payload)
+    return codec, payload
+
+
+class JsonCodec(CacheCodec):
+    """Plain JSON codec, with non-JSON types converted by a JSON encoder"""
+
+    tag = b"j"
+
+    def __init__(
+        self,
+        encoder: type[json.JSONEncoder] = JsonEncoder,
+        compress_min_bytes: int | None = None,
+    ) -> None:
+        """Create a JSON codec
+
+        Args:
+            encoder (type[json.JSONEncoder], optional): JSON encoder. Defaults to JsonEncoder.
+            compress_min_bytes (Optional[int]): Compress payloads at least this many
+                bytes long, or never if 0. Defaults to `settings.cache_compress_min_bytes`.
+        """
+        super().__init__(compress_min_bytes)
+        self.encoder = encoder
+
+    def dumps(self, obj: Any) -> bytes:
+        return json.dumps(obj, cls=self.encoder).encode()
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        return json.loads(payload)
+
+
+# Pin the marshal format, so values stay readable by later Python versions
+_MARSHAL_VERSION = 4
+
+# Native types stored as (type name, string) tuples. Tuples never appear in
+# encoded data otherwise, since they are converted to lists.
+_EXTENSION_DECODERS: dict[str, Callable[[str], Any]] = {
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "decimal": Decimal,
+}
+
+# Types marshal can store directly, without conversion
+_MARSHAL_SCALARS = frozenset({str, int, float, bool, type(None), bytes})
+
+
+def _to_marshallable(obj: Any) -> Any:
+    obj_type = type(obj)
+    if obj_type in _MARSHAL_SCALARS:
+        return obj
+    if obj_type is dict:
+        return {key: _to_marshallable(value) for key, value in obj.items()}
+    if obj_type is list or obj_type is tuple:
+        return [_to_marshallable(item) for item in obj]
+    if isinstance(obj, BaseModel):
+        return _to_marshallable(obj.model_dump(by_alias=True))
+    if isinstance(obj, datetime.datetime):
+        return ("datetime", obj.isoformat())
+    if isinstance(obj, datetime.date):
+        return ("date", obj.isoformat())
+    if isinstance(obj, Decimal):
+        return ("decimal", str(obj))
+    # Fall back to FastAPI's conversion for anything else, e.g. enums and sets
+    return _to_marshallable(jsonable_encoder(obj))
+
+
+def _restore_extensions(obj: dict | list) -> None:
+    # Freshly unmarshalled containers are ours alone, so restore in place
+    # rather than copying every container
+    items = obj.items() if type(obj) is dict else enumerate(obj)
+    for key, value in items:
+        value_type = type(value)
+        if value_type is tuple:
+            obj[key] = _EXTENSION_DECODERS[value[0]](value[1])
+        elif value_type is dict or value_type is list:
+            _restore_extensions(value)
+
+
+class BinaryCodec(CacheCodec):
+    """Compact binary codec, built on the standard library `marshal` format.
+
+    Datetimes, dates, and decimals are restored as native objects rather than
+    strings, so Pydantic models built from cached values skip re-parsing them.
+    Unlike pickle, loading a value can never construct arbitrary objects.
+    """
+
+    tag = b"m"
+
+    def dumps(self, obj: Any) -> bytes:
+        return marshal.dumps(_to_marshallable(obj), _MARSHAL_VERSION)
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        # Payloads are only ever written by our own encoder, to our own Redis
+        obj = marshal.loads(payload)  # nosec B302
+        if type(obj) is tuple:
+            return _EXTENSION_DECODERS[obj[0]](obj[1])
+        if type(obj) is dict or type(obj) is list:
+            _restore_extensions(obj)
+        return obj
+
+
+@functools.cache
+def _type_adapter(response_model: Any) -> TypeAdapter:
+    # Building a TypeAdapter is expensive, so share one per response model
+    return TypeAdapter(response_model)
+
+
+class ResponseBodyCodec(CacheCodec):
+    """Codec storing the final JSON response body for a route's response model.
+
+    Values are validated and serialised exactly as FastAPI does for a
+    `response_model`, so a cached body can be returned as-is, skipping
+    model construction and serialisation on every cache hit.
+    """
+
+    tag = b"r"
+
+    def __init__(self, response_model: Any, compress_min_bytes: int | None = None):
+        """Create a response body codec
+
+        Args:
+            response_model (Any): Response model of the route, e.g. a Pydantic model class
+            compress_min_bytes (Optional[int]): Compress payloads at least this many
+                bytes long, or never if 0. Defaults to `settings.cache_compress_min_bytes`.
+        """
+        super().__init__(compress_min_bytes)
+        self.response_model = response_model
+
+    def dumps(self, obj: Any) -> bytes:
+        adapter = _type_adapter(self.response_model)
+        return adapter.dump_json(adapter.validate_python(obj), by_alias=True)
+
+    @staticmethod
+    def loads(payload: bytes) -> Any:
+        return json.loads(payload)
+
+
 # Fixed, immutable cache keys
 
 
@@ -34,6 +307,30 @@ class CacheKey(Enum):
 # Dynamic cache keys
 
 
+def prefix_tag(prefix: "CachePrefix") -> str:
+    """Tag shared by every dynamic cache key with a given prefix
+
+    Args:
+        prefix (CachePrefix): Key prefix
+
+    Returns:
+        str: Cache tag
+    """
+    return f"prefix:{prefix.value}"
+
+
+def facility_tag(facility_code: str) -> str:
+    """Tag shared by every facility-specific cache key for a given facility
+
+    Args:
+        facility_code (str): Facility code
+
+    Returns:
+        str: Cache tag
+    """
+    return f"facility:{facility_code.upper()}"
+
+
 class CachePrefix(Enum):
     """
     Base class for prefixes used in dynamic cache keys.
@@ -43,10 +340,25 @@ class CachePrefix(Enum):
     fail since Enums with values are final and cannot be subclassed.
     """
 
+    def tags(self, *args: str) -> list[str]:
+        """Tags for a dynamic cache key with this prefix, used for bulk invalidation
+
+        Args:
+            *args (str): Arguments appended to the prefix
+
+        Returns:
+            list[str]: Cache tags
+        """
+        return [prefix_tag(self)]
+
 
 class FacilityCachePrefix(CachePrefix):
     """Key prefixes for facility-specific cache keys"""
 
+    def tags(self, *args: str) -> list[str]:
+        # Facility-specific keys always start with the facility code
+        return [*super().tags(*args), facility_tag(args[0])]
+
     ROOT = "facilities:root"
     EXTRACTS = "facilities:extracts"
     FEEDSHARE = "facilities:feedshare"
@@ -78,6 +390,7 @@ class DynamicCacheKey:
         """
         self.prefix = prefix.value
         self.args = args
+        self.tags: list[str] = prefix.tags(*args)
 
     @property
     def value(self) -> str:
@@ -93,6 +406,279 @@ class DynamicCacheKey:
         return self.value
 
 
+# In-process cache tier
+
+
+# Pub/sub channel used to tell other workers to drop their local copy of a key
+LOCAL_CACHE_INVALIDATION_CHANNEL = "cache:invalidate"
+
+# Unique ID for this process, so we can ignore our own invalidation messages
+_PROCESS_ID = uuid4().hex
+
+
+class LocalCacheEntry(NamedTuple):
+    data: bytes
+    value: Any
+    digest: str
+    # Monotonic time after which this local copy must be re-fetched from Redis
+    local_expires_at: float
+    # Monotonic time at which the Redis key itself expires, if it does
+    redis_expires_at: float | None
+
+
+class LocalCache:
+    """Bounded, TTL-aware LRU store of decoded cache values, held in process memory.
+
+    Entries never outlive their Redis key, nor `cache_local_max_seconds`, so if
+    an invalidation message is ever missed a stale value is only served briefly.
+    """
+
+    def __init__(self, max_items: int, max_seconds: int) -> None:
+        self.max_items = max_items
+        self.max_seconds = max_seconds
+        self._entries: OrderedDict[str, LocalCacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> LocalCacheEntry | None:
+        """Get a non-expired local entry, marking it as recently used
+
+        Args:
+            key (str): Cache key
+
+        Returns:
+            Optional[LocalCacheEntry]: Local entry, if present and fresh
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.local_expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(
+        self, key: str, data: bytes, value: Any, digest: str, ttl: int | None
+    ) -> None:
+        """Store a decoded value locally, evicting the least recently used entries
+
+        Args:
+            key (str): Cache key
+            data (bytes): Encoded value, as stored in Redis
+            value (Any): Decoded value
+            digest (str): Content digest of the serialised value
+            ttl (Optional[int]): Remaining lifetime of the Redis key in seconds
+        """
+        now = time.monotonic()
+        lifetime = self.max_seconds if ttl is None else min(ttl, self.max_seconds)
+        entry = LocalCacheEntry(
+            data=data,
+            value=value,
+            digest=digest,
+            local_expires_at=now + lifetime,
+            redis_expires_at=now + ttl if ttl is not None else None,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+
+    def evict(self, key: str) -> None:
+        """Drop a key from the local cache, if present
+
+        Args:
+            key (str): Cache key
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all locally cached values"""
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache(
+    max_items=settings.cache_local_max_items,
+    max_seconds=settings.cache_local_max_seconds,
+)
+
+
+# Callbacks to run when a cache key is rewritten or invalidated, by any worker
+_key_watchers: dict[str, list[Callable[[], None]]] = {}
+
+
+def watch_key(key: "CacheKey | DynamicCacheKey", callback: Callable[[], None]) -> None:
+    """Run a callback whenever a cached value is rewritten or invalidated.
+
+    Used to drop in-process values derived from a cached value. Writes by other
+    workers are only seen while `cache_local_enabled` is set, as they are sent
+    over the local cache invalidation channel.
+
+    Args:
+        key (Union[CacheKey, DynamicCacheKey]): Cache key to watch
+        callback (Callable[[], None]): Function to call when the key changes
+    """
+    _key_watchers.setdefault(key.value, []).append(callback)
+
+
+def _notify_watchers(key: str) -> None:
+    for callback in _key_watchers.get(key, []):
+        try:
+            callback()
+        except Exception:
+            logger.exception(f"Cache key watcher failed for {key}")
+
+
+def _handle_invalidation(message: dict[str, Any]) -> None:
+    data = message.get("data")
+    if isinstance(data, bytes):
+        data = data.decode()
+    sender, _, key = str(data).partition(":")
+    # Our own writes have already updated our local cache
+    if sender != _PROCESS_ID:
+        local_cache.evict(key)
+        _notify_watchers(key)
+
+
+def listen_for_invalidations(redis: Redis) -> PubSubWorkerThread:
+    """Start a background thread evicting local cache entries written by other workers
+
+    Args:
+        redis (Redis): Redis cache session
+
+    Returns:
+        PubSubWorkerThread: Listener thread. Call `.stop()` on shutdown.
+    """
+    pubsub = redis.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(**{LOCAL_CACHE_INVALIDATION_CHANNEL: _handle_invalidation})
+    logger.info("Listening for local cache invalidations")
+    return pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+
+# Tag-based invalidation
+
+
+class CacheInvalidationSchema(JSONModel):
+    """Result of invalidating cached values by tag"""
+
+    tags: list[str] = Field(..., description="Invalidated cache tags")
+    invalidated: int = Field(..., description="Number of cached values removed")
+
+
+def invalidate_tags(redis: Redis, tags: list[str]) -> CacheInvalidationSchema:
+    """Remove every cached value written with any of the given tags.
+
+    Only the keys recorded against each tag are touched, so this never needs
+    to scan Redis.
+
+    Args:
+        redis (Redis): Redis cache session
+        tags (list[str]): Cache tags to invalidate
+
+    Returns:
+        CacheInvalidationSchema: Number of cached values removed
+    """
+    # Read and clear each tag set atomically, so keys tagged meanwhile aren't lost
+    pipe = redis.pipeline()
+    for tag in tags:
+        pipe.smembers(f"{TAG_KEY_PREFIX}{tag}")
+        pipe.delete(f"{TAG_KEY_PREFIX}{tag}")
+    keys: set[str] = set().union(*pipe.execute()[::2])
+
+    invalidated = 0
+    if keys:
+        pipe = redis.pipeline()
+        pipe.delete(*keys)
+        pipe.delete(*(f"{META_KEY_PREFIX}{key}" for key in keys))
+        if settings.cache_local_enabled:
+            for key in keys:
+                pipe.publish(LOCAL_CACHE_INVALIDATION_CHANNEL, f"{_PROCESS_ID}:{key}")
+        invalidated = pipe.execute()[0]
+
+        # Our own invalidation messages are ignored, so evict locally too
+        for key in keys:
+            local_cache.evict(key)
+            _notify_watchers(key)
+
+    logger.info(f"Invalidated {invalidated} cached values for tags {tags}")
+    return CacheInvalidationSchema(tags=tags, invalidated=invalidated)
+
+
+def invalidate_facility(redis: Redis, facility_code: str) -> CacheInvalidationSchema:
+    """Remove every facility-specific cached value for a given facility
+
+    Args:
+        redis (Redis): Redis cache session
+        facility_code (str): Facility code
+
+    Returns:
+        CacheInvalidationSchema: Number of cached values removed
+    """
+    return invalidate_tags(redis, [facility_tag(facility_code)])
+
+
+# Delayed facility invalidations still to run, by facility code. Referenced here so
+# they aren't garbage collected, and so those pending at shutdown aren't lost.
+_delayed_invalidations: dict[asyncio.Task, str] = {}
+
+
+async def _invalidate_facility_after(
+    redis: Redis, facility_code: str, delay: float
+) -> None:
+    await asyncio.sleep(delay)
+    await run_in_threadpool(invalidate_facility, redis, facility_code)
+
+
+def _delayed_invalidation_done(task: asyncio.Task) -> None:
+    facility_code = _delayed_invalidations.pop(task, None)
+    if not task.cancelled() and task.exception():
+        logger.error(
+            f"Delayed cache invalidation failed for facility {facility_code}",
+            exc_info=task.exception(),
+        )
+
+
+def invalidate_facility_later(
+    redis: Redis, facility_code: str, delay: float
+) -> asyncio.Task:
+    """Invalidate a facility's cached values after a delay, without blocking
+    the event loop or the current request
+
+    Args:
+        redis (Redis): Redis cache session
+        facility_code (str): Facility code
+        delay (float): Delay in seconds
+
+    Returns:
+        asyncio.Task: Task running the delayed invalidation
+    """
+    task = asyncio.create_task(_invalidate_facility_after(redis, facility_code, delay))
+    _delayed_invalidations[task] = facility_code
+    task.add_done_callback(_delayed_invalidation_done)
+    return task
+
+
+def flush_delayed_invalidations(redis: Redis) -> None:
+    """Run any delayed facility invalidations now, rather than losing them.
+    Used on app shutdown.
+
+    Args:
+        redis (Redis): Redis cache session
+    """
+    for task, facility_code in list(_delayed_invalidations.items()):
+        task.cancel()
+        try:
+            invalidate_facility(redis, facility_code)
+        except RedisError:
+            logger.warning(
+                f"Unable to invalidate cache for facility {facility_code}",
+                exc_info=True,
+            )
+
+
 # Cache logic
 
 
@@ -107,26 +693,124 @@ class BasicCache:
         key: CacheKey | DynamicCacheKey,
         encoder: type[json.JSONEncoder] = JsonEncoder,
         prefix: str = "response-cache:",
+        local: bool = False,
+        codec: CacheCodec | None = None,
     ) -> None:
+        """Create a cache object, pre-fetching any existing cached value
+
+        Args:
+            redis (Redis): Redis cache session
+            key (Union[CacheKey, DynamicCacheKey]): Key describing the cached data
+            encoder (type[json.JSONEncoder], optional): JSON encoder, used if no
+                codec is given. Defaults to JsonEncoder.
+            prefix (str, optional): Key prefix. Defaults to "response-cache:".
+            local (bool, optional): Also hold the decoded value in process memory.
+                Values served from memory are shared between requests, so must
+                not be mutated by the caller. Defaults to False.
+            codec (Optional[CacheCodec]): Codec used to write new values. Existing
+                values are always decoded with the codec that wrote them.
+                Defaults to a JsonCodec using `encoder`.
+        """
         self.redis = redis
         self.encoder: type[json.JSONEncoder] = encoder
+        self.codec: CacheCodec = codec or JsonCodec(encoder)
         self.prefix = prefix
+        self.local: bool = local and settings.cache_local_enabled
 
         self.key: str = key.value
+        self.tags: list[str] = key.tags if isinstance(key, DynamicCacheKey) else []
+        self._meta_key: str = f"{META_KEY_PREFIX}{self.key}"
+        self._lock_key: str = f"{LOCK_KEY_PREFIX}{self.key}"
 
         # Enable pre-retreiving cached value on init
-        self._cached_value_str: str | None = None
+        self._cached_data: bytes | None = None
         self._cached_value: Any | None = BasicCache._sentinel
+        # Stable content digest of the encoded cached value
+        self.digest: str | None = None
+        # Remaining fresh lifetime of the cached value in seconds, if it expires
+        self._ttl: int | None = None
+        # Has the cached value passed its soft expiry, and is being served stale
+        self.stale: bool = False
+
+        # Statistics are recorded per key prefix, rather than for every dynamic key
+        self._stats_prefix: str = (
+            key.prefix if isinstance(key, DynamicCacheKey) else key.value
+        )
+        # When this lookup missed, to measure how long the value took to recompute
+        self._missed_at: float | None = None
+
+        # Serve from process memory if we can, skipping Redis and decoding entirely
+        entry = local_cache.get(self.key) if self.local else None
+        if entry is not None:
+            self._cached_data = entry.data
+            self._cached_value = entry.value
+            self.digest = entry.digest
+            if entry.redis_expires_at is not None:
+                self._ttl = max(int(entry.redis_expires_at - time.monotonic()), 0)
+        else:
+            self._fetch()
+
+        self._record_lookup(local=entry is not None)
+
+    def _record_lookup(self, local: bool) -> None:
+        if not self.exists:
+            cache_stats.record(self._stats_prefix, misses=1)
+        elif self.stale:
+            cache_stats.record(self._stats_prefix, stale_hits=1)
+        else:
+            cache_stats.record(self._stats_prefix, hits=1, local_hits=int(local))
+        if not self.exists or self.stale:
+            self._missed_at = time.perf_counter()
+
+    def _fetch(self) -> None:
+        """Load the cached value, its metadata, and its TTL from Redis, in a single round trip"""
+        pipe = self.redis.pipeline(transaction=False)
+        # Encoded values are binary, so must skip the client's response decoding
+        pipe.execute_command("GET", self.key, **{NEVER_DECODE: []})
+        pipe.hgetall(self._meta_key)
+        pipe.ttl(self.key)
+        started_at = time.perf_counter()
+        data, meta, ttl = pipe.execute()
+        cache_stats.record(
+            self._stats_prefix,
+            redis_calls=1,
+            redis_seconds=time.perf_counter() - started_at,
+        )
 
-        # Pre-fetch the cached value
-        if self.redis.exists(self.key):
-            # Get the value string from Redis
-            value_str = str(self.redis.get(self.key))
-            # Store the cached value string
-            self._cached_value_str = value_str
-            # Convert to JSON if the value is not None, then store the value in self._cached_value
-            self._cached_value = (
-                json.loads(value_str) if value_str is not None else None
+        if data is None:
+            return
+
+        # Decode the value, treating anything unreadable as a cache miss
+        try:
+            value = decode_value(data)
+        except (ValueError, TypeError, KeyError, EOFError, zlib.error):
+            logger.warning(f"Unable to decode cached value for {self.key}, ignoring")
+            return
+
+        # Store the encoded and decoded cached value
+        self._cached_data = data
+        self._cached_value = value
+        # Values cached before metadata was stored need their digest computing
+        self.digest = meta.get("digest") or content_digest(data)
+        # Redis returns -1 for keys without an expiry
+        self._ttl = ttl if ttl >= 0 else None
+
+        # Values with a soft expiry outlive their freshness in Redis, so they
+        # can be served stale while a single request recomputes them
+        fresh_until = meta.get("fresh_until")
+        if fresh_until:
+            fresh_for = int(float(fresh_until) - time.time())
+            self.stale = fresh_for <= 0
+            self._ttl = max(fresh_for, 0)
+
+        # Never hold stale values locally
+        if self.local and not self.stale:
+            local_cache.put(
+                self.key,
+                self._cached_data,
+                self._cached_value,
+                self.digest,
+                self._ttl,
             )
 
     @property
@@ -155,26 +839,184 @@ class BasicCache:
         return self._cached_value
 
     def _dump_to_memory(self, obj: Any) -> None:
-        # Create a string representation of the object
-        value_str = json.dumps(obj, cls=self.encoder)
-        # Hold the cached value string in memory for the duration of this request
-        self._cached_value_str = value_str
+        # Encode the object with this cache's codec
+        data = self.codec.encode(obj)
+        # Hold the encoded value in memory for the duration of this request
+        self._cached_data = data
         # Hold the cached value in memory for the duration of this request
-        self._cached_value = json.loads(value_str)
+        self._cached_value = decode_value(data)
+        # Compute the content digest once, at write time
+        self.digest = content_digest(data)
+        self.stale = False
+
+        # Record how long it took to recompute the value after a miss
+        if self._missed_at is not None:
+            cache_stats.record(
+                self._stats_prefix,
+                recomputes=1,
+                recompute_seconds=time.perf_counter() - self._missed_at,
+            )
+            self._missed_at = None
+
+    def _store(
+        self,
+        data: bytes,
+        digest: str,
+        expire: int | None = None,
+        stale_for: int = 0,
+    ) -> None:
+        """Write an encoded cached value, its metadata, and its expiry, to Redis.
+
+        All writes are queued in a single MULTI/EXEC pipeline so the value, its
+        metadata, and its tags are written atomically, in one round trip. If in-process
+        caching is enabled, other workers are told to drop their local copies.
+
+        Args:
+            data (bytes): Encoded value to cache
+            digest (str): Content digest of the encoded value
+            expire (Optional[int]): Time in seconds the value is fresh for. Defaults to None.
+            stale_for (int): Time in seconds after `expire` that the value may
+                still be served stale while it is recomputed. Defaults to 0.
+        """
+        meta: dict[str, str] = {"digest": digest}
+        hard_expire = expire
+        if expire is not None and stale_for > 0:
+            meta["fresh_until"] = str(time.time() + expire)
+            hard_expire = expire + stale_for
+
+        pipe = self.redis.pipeline()
+        pipe.set(self.key, data, ex=hard_expire)
+        pipe.delete(self._meta_key)
+        pipe.hset(self._meta_key, mapping=meta)  # type: ignore[arg-type]
+        if hard_expire is not None:
+            pipe.expire(self._meta_key, hard_expire)
+        for tag in self.tags:
+            tag_key = f"{TAG_KEY_PREFIX}{tag}"
+            pipe.sadd(tag_key, self.key)
+            # Keep each tag set only as long as its longest-lived key
+            if hard_expire is not None:
+                pipe.expire(tag_key, hard_expire, nx=True)
+                pipe.expire(tag_key, hard_expire, gt=True)
+            else:
+                # A key that never expires must never outlive its tag set
+                pipe.persist(tag_key)
+        if settings.cache_local_enabled:
+            pipe.publish(LOCAL_CACHE_INVALIDATION_CHANNEL, f"{_PROCESS_ID}:{self.key}")
+        started_at = time.perf_counter()
+        pipe.execute()
+        cache_stats.record(
+            self._stats_prefix,
+            writes=1,
+            bytes_written=len(data),
+            redis_calls=1,
+            redis_seconds=time.perf_counter() - started_at,
+        )
+        self._ttl = expire
 
-    def set(self, obj: Any, expire: int | None = None) -> None:
+        if self.local:
+            local_cache.put(self.key, data, self._cached_value, digest, expire)
+        else:
+            local_cache.evict(self.key)
+        _notify_watchers(self.key)
+
+    def set(self, obj: Any, expire: int | None = None, stale_for: int = 0) -> None:
         """Set a new cached value for this key
 
         Args:
             obj (Any): New value to cache
             expire (Optional[int]): Expiry time in seconds. Defaults to None.
+            stale_for (int): Time in seconds after expiry that the value may be
+                served stale while it is recomputed. Defaults to 0.
         """
         # Dump the object to a string, and store in the cache class instance
         self._dump_to_memory(obj)
 
         # Set the value in Redis
-        if self._cached_value_str:
-            self.redis.set(self.key, self._cached_value_str, ex=expire)
+        if self._cached_data and self.digest:
+            self._store(self._cached_data, self.digest, expire, stale_for)
+
+    def renew(self, expire: int | None = None, stale_for: int = 0) -> None:
+        """Store the current cached value again with a new expiry, without recomputing
+        or re-encoding it. Used when the cached value is known to still be correct.
+
+        Args:
+            expire (Optional[int]): Expiry time in seconds. Defaults to None.
+            stale_for (int): Time in seconds after expiry that the value may be
+                served stale while it is recomputed. Defaults to 0.
+
+        Raises:
+            CacheNotSetException: There is no cached value to renew
+        """
+        if self._cached_data is None or self.digest is None:
+            raise CacheNotSetException(f"No value for key {self.key} to renew")
+
+        self.stale = False
+        self._store(self._cached_data, self.digest, expire, stale_for)
+
+    def _wait_for_value(self, timeout: int) -> bool:
+        """Wait for another request to finish computing this value
+
+        Args:
+            timeout (int): Maximum time to wait, in seconds
+
+        Returns:
+            bool: Did a value appear in the cache
+        """
+        deadline = time.monotonic() + timeout
+        # Poll quickly at first, as most values are computed in well under a second
+        delay = 0.05
+        while time.monotonic() < deadline:
+            time.sleep(min(delay, max(deadline - time.monotonic(), 0)))
+            delay = min(delay * 2, 0.5)
+            self._fetch()
+            if self.exists:
+                return True
+            # The computing request has finished or died without setting a value
+            if not self.redis.exists(self._lock_key):
+                return False
+        return False
+
+    def populate(
+        self,
+        compute: Callable[[], Any],
+        expire: int | None = None,
+        stale_for: int = 0,
+    ) -> None:
+        """Ensure a value is cached, computing it at most once across all workers.
+
+        If a fresh value is cached, nothing is computed. Otherwise, only the
+        request holding this key's lock computes a new value. Meanwhile, other
+        requests are served the stale value if there is one, or wait for the
+        new value to be cached if not.
+
+        Args:
+            compute (Callable[[], Any]): Function returning the value to cache
+            expire (Optional[int]): Time in seconds the value is fresh for. Defaults to None.
+            stale_for (int): Time in seconds after expiry that the value may be
+                served stale while it is recomputed. Defaults to 0.
+        """
+        if self.exists and not self.stale:
+            return
+
+        lock_timeout = settings.cache_lock_timeout_seconds
+        token = acquire_lock(self.redis, self._lock_key, lock_timeout)
+
+        if token is None:
+            # Another request is already recomputing this value
+            if self.exists:
+                logger.debug(f"Serving stale value for {self.key} during recompute")
+                return
+            if self._wait_for_value(settings.cache_lock_wait_seconds):
+                return
+            # If the other request failed or is slow, compute it ourselves
+            # rather than holding this worker thread any longer
+            logger.warning(f"Timed out waiting for {self.key}, computing it anyway")
+
+        try:
+            self.set(compute(), expire=expire, stale_for=stale_for)
+        finally:
+            if token:
+                release_lock(self.redis, self._lock_key, token)
 
 
 class ResponseCache(BasicCache):
@@ -186,12 +1028,36 @@ class ResponseCache(BasicCache):
         response: Response,
         encoder: type[json.JSONEncoder] = JsonEncoder,
         prefix: str = "response-cache:",
+        codec: CacheCodec | None = None,
+        response_model: Any = None,
     ) -> None:
-        super().__init__(redis, key, encoder, prefix)
+        """Create a response cache object, pre-fetching any existing cached value
 
-        # If we have a cached value string already set, set the etag header
-        if self._cached_value_str is not None:
-            self._set_etag(self._cached_value_str)
+        Args:
+            redis (Redis): Redis cache session
+            key (Union[CacheKey, DynamicCacheKey]): Key describing the cached data
+            request (Request): Incoming request
+            response (Response): Outgoing response, to add cache headers to
+            encoder (type[json.JSONEncoder], optional): JSON encoder, used if no
+                codec is given. Defaults to JsonEncoder.
+            prefix (str, optional): Key prefix. Defaults to "response-cache:".
+            codec (Optional[CacheCodec]): Codec used to write new values. Defaults
+                to a JsonCodec using `encoder`.
+            response_model (Any, optional): Opt in to caching the final JSON response
+                body, serialised as this model, so it can be returned with
+                `json_response()`. Overrides `codec`. Defaults to None.
+        """
+        if response_model is not None:
+            codec = ResponseBodyCodec(response_model)
+
+        super().__init__(redis, key, encoder, prefix, codec=codec)
+
+        self.response_model: Any = response_model
+        self.etag: str | None = None
+
+        # If we have a cached value already set, set the etag header
+        if self.digest is not None:
+            self._set_etag(self.digest)
 
         self.request: Request = request
         self.response: Response = response
@@ -205,38 +1071,95 @@ class ResponseCache(BasicCache):
         """
         return self.request.headers.get("Cache-Control") == "no-store"
 
-    def _set_etag(self, value_str: str | None):
-        """Set the etag header for a given resource string
+    @property
+    def not_modified(self) -> bool:
+        """Check if the incoming request's 'If-None-Match' header matches our etag
+
+        Returns:
+            bool: Does the client already hold the current version of this resource
+        """
+        if not self.etag:
+            return False
+        if_none_match = self.request.headers.get("If-None-Match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Use weak comparison, since our etags are weak
+        client_etags = {
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        }
+        return self.etag.removeprefix("W/") in client_etags
+
+    def _set_etag(self, digest: str):
+        """Set the etag header for a given resource digest
 
         Args:
-            value_str (Optional[str]): Value to hash for the etag header
+            digest (str): Content digest of the cached value
         """
-        self.etag = f"W/{hash(value_str)}"
+        self.etag = f'W/"{digest}"'
 
-    def set(self, obj: Any, expire: int | None = None) -> None:
+    def set(self, obj: Any, expire: int | None = None, stale_for: int = 0) -> None:
         """Set a new cached value for this key
 
         Args:
             obj (Any): New value to cache
             expire (Optional[int]): Expiry time in seconds. Defaults to None.
+            stale_for (int): Time in seconds after expiry that the value may be
+                served stale while it is recomputed. Defaults to 0.
         """
         # Dump the object to a string, and store in the cache class instance
         self._dump_to_memory(obj)
 
         # Set the value in Redis
-        if self._cached_value_str:
+        if self._cached_data and self.digest:
             # Set the etag
-            self._set_etag(self._cached_value_str)
+            self._set_etag(self.digest)
 
             # If the client hasn't forbidden caching for this request
             if not self.no_store:
                 # Set the value in Redis
-                self.redis.set(self.key, self._cached_value_str, ex=expire)
+                self._store(self._cached_data, self.digest, expire, stale_for)
 
     def prepare_response(self):
-        """Add cache related headers to the response object"""
-        ttl = self.redis.ttl(self.key)
-        if ttl:
-            self.response.headers["Cache-Control"] = f"max-age={ttl}"
+        """Add cache related headers to the response object.
+
+        Raises:
+            HTTPException: 304 Not Modified, if the client already holds this version
+        """
+        headers: dict[str, str] = {}
+        # TTL was fetched alongside the value, or set locally, so no extra round trip
+        if self._ttl is not None:
+            headers["Cache-Control"] = f"max-age={self._ttl}"
         if self.etag:
-            self.response.headers["ETag"] = self.etag
+            headers["ETag"] = self.etag
+        self.response.headers.update(headers)
+
+        # Short-circuit with an empty body if the client's copy is current
+        if self.not_modified:
+            raise HTTPException(status_code=304, headers=headers)
+
+    def json_response(self) -> Response:
+        """Build a JSON response directly from the cached response body.
+
+        This skips re-validating and re-serialising the cached value through the
+        route's response model, so requires a `response_model` to have been given.
+
+        Returns:
+            Response: JSON response, including any cache headers
+        """
+        if self.response_model is None:
+            raise ValueError("A response_model is required to build a JSON response")
+
+        # Raises if no value has been cached or set
+        value = self.get()
+
+        codec, body = _unframe(self._cached_data or b"")
+        # Values cached in another format, e.g. before a route opted in, need serialising
+        if codec is not ResponseBodyCodec:
+            body = self.codec.dumps(value)
+
+        response = Response(content=body, media_type="application/json")
+        # Include any headers added to the route's response, as FastAPI would
+        response.headers.raw.extend(self.response.headers.raw)
+        return response
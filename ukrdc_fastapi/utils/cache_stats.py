@@ -0,0 +1,158 @@
+import logging
+import threading
+from collections import Counter, defaultdict
+
+from pydantic import Field
+from redis import Redis
+from redis.exceptions import RedisError
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.schemas.base import JSONModel
+
+logger = logging.getLogger(__name__)
+
+# Prefix for the hashes holding each cache prefix's counters, merged across workers
+STATS_KEY_PREFIX = "cache-stats:"
+# Set of every cache prefix with recorded counters
+STATS_PREFIXES_KEY = "cache-stats-prefixes"
+
+
+class CachePrefixStatsSchema(JSONModel):
+    """Cache usage statistics for a single cache key prefix, across all workers"""
+
+    prefix: str = Field(..., description="Cache key, or dynamic cache key prefix")
+    hits: int = Field(..., description="Number of fresh cached values served")
+    local_hits: int = Field(
+        ..., description="Number of fresh cached values served from process memory"
+    )
+    stale_hits: int = Field(..., description="Number of stale cached values found")
+    misses: int = Field(..., description="Number of lookups with no cached value")
+    hit_ratio: float | None = Field(
+        None, description="Fraction of lookups finding a cached value, fresh or stale"
+    )
+    recomputes: int = Field(..., description="Number of values recomputed after a miss")
+    mean_recompute_seconds: float | None = Field(
+        None, description="Mean time from a miss to the new value being set"
+    )
+    writes: int = Field(..., description="Number of values written to Redis")
+    mean_payload_bytes: float | None = Field(
+        None, description="Mean size of values written to Redis"
+    )
+    redis_calls: int = Field(..., description="Number of Redis round trips")
+    mean_redis_seconds: float | None = Field(
+        None, description="Mean Redis round trip time"
+    )
+
+
+def _mean(total: float, count: float) -> float | None:
+    return total / count if count else None
+
+
+class CacheStats:
+    """Cache counters aggregated in process memory, by cache key prefix.
+
+    Counters are merged into Redis periodically by the `flush_cache_stats`
+    repeated task, so cheap to record on every request, and combined across all
+    workers when read back.
+    """
+
+    def __init__(self) -> None:
+        self._counters: defaultdict[str, Counter[str]] = defaultdict(Counter)
+        self._lock = threading.Lock()
+
+    def record(self, prefix: str, **values: float) -> None:
+        """Add to the counters for a cache key prefix
+
+        Args:
+            prefix (str): Cache key, or dynamic cache key prefix
+            **values (float): Amount to add to each named counter
+        """
+        if not settings.cache_stats_enabled:
+            return
+        with self._lock:
+            self._counters[prefix].update(values)
+
+    def flush(self, redis: Redis) -> None:
+        """Merge this process's counters into the shared counters in Redis
+
+        Args:
+            redis (Redis): Redis cache session
+        """
+        with self._lock:
+            counters, self._counters = self._counters, defaultdict(Counter)
+        if not counters:
+            return
+
+        pipe = redis.pipeline(transaction=False)
+        for prefix, values in counters.items():
+            pipe.sadd(STATS_PREFIXES_KEY, prefix)
+            for field, value in values.items():
+                if isinstance(value, float):
+                    pipe.hincrbyfloat(f"{STATS_KEY_PREFIX}{prefix}", field, value)
+                else:
+                    pipe.hincrby(f"{STATS_KEY_PREFIX}{prefix}", field, value)
+        try:
+            pipe.execute()
+        except RedisError:
+            # Keep the counters, and try again on the next flush
+            logger.warning("Unable to flush cache statistics to Redis", exc_info=True)
+            with self._lock:
+                for prefix, values in counters.items():
+                    self._counters[prefix].update(values)
+
+    def clear(self) -> None:
+        """Drop all counters not yet flushed to Redis"""
+        with self._lock:
+            self._counters.clear()
+
+
+cache_stats = CacheStats()
+
+
+def get_cache_stats(redis: Redis) -> list[CachePrefixStatsSchema]:
+    """Get cache usage statistics for each cache key prefix, merged across all workers.
+
+    Counters from other workers are included up to their last flush.
+
+    Args:
+        redis (Redis): Redis cache session
+
+    Returns:
+        list[CachePrefixStatsSchema]: Cache statistics, one item per prefix
+    """
+    # Include everything recorded by this worker so far
+    cache_stats.flush(redis)
+
+    prefixes = sorted(str(prefix) for prefix in redis.smembers(STATS_PREFIXES_KEY))
+    pipe = redis.pipeline(transaction=False)
+    for prefix in prefixes:
+        pipe.hgetall(f"{STATS_KEY_PREFIX}{prefix}")
+
+    stats: list[CachePrefixStatsSchema] = []
+    for prefix, values in zip(prefixes, pipe.execute()):
+        counters = {field: float(value) for field, value in values.items()}
+        hits = int(counters.get("hits", 0))
+        stale_hits = int(counters.get("stale_hits", 0))
+        misses = int(counters.get("misses", 0))
+        recomputes = int(counters.get("recomputes", 0))
+        writes = int(counters.get("writes", 0))
+        redis_calls = int(counters.get("redis_calls", 0))
+        stats.append(
+            CachePrefixStatsSchema(
+                prefix=prefix,
+                hits=hits,
+                local_hits=int(counters.get("local_hits", 0)),
+                stale_hits=stale_hits,
+                misses=misses,
+                hit_ratio=_mean(hits + stale_hits, hits + stale_hits + misses),
+                recomputes=recomputes,
+                mean_recompute_seconds=_mean(
+                    counters.get("recompute_seconds", 0), recomputes
+                ),
+                writes=writes,
+                mean_payload_bytes=_mean(counters.get("bytes_written", 0), writes),
+                redis_calls=redis_calls,
+                mean_redis_seconds=_mean(counters.get("redis_seconds", 0), redis_calls),
+            )
+        )
+    return stats
@@ -0,0 +1,109 @@
+import threading
+import time
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from ukrdc_sqla.ukrdc import Facility
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.utils.cache import CacheKey, watch_key
+
+
+class FacilityCodeIndex:
+    """In-process set of every known facility code, so checking whether a
+    string is a facility code needs no query.
+
+    The set is loaded on first use, and reloaded once it is older than
+    `max_seconds`, or after the cached facilities list is rewritten or
+    invalidated by any worker.
+    """
+
+    def __init__(self, max_seconds: int) -> None:
+        self.max_seconds = max_seconds
+        self._codes: frozenset[str] | None = None
+        self._loaded_at: float = 0.0
+        # Bumped on every invalidation, so a reload racing one isn't kept
+        self._generation: int = 0
+        self._lock = threading.Lock()
+
+    def get(self, ukrdc3: Session) -> frozenset[str]:
+        """Get every known facility code, reloading them if stale
+
+        Args:
+            ukrdc3 (Session): SQLAlchemy session, used only to reload the codes
+
+        Returns:
+            frozenset[str]: Facility codes
+        """
+        with self._lock:
+            codes = self._codes
+            fresh = time.monotonic() - self._loaded_at < self.max_seconds
+        if codes is not None and fresh:
+            return codes
+        return self.refresh(ukrdc3)
+
+    def refresh(self, ukrdc3: Session) -> frozenset[str]:
+        """Reload every known facility code from the database
+
+        Args:
+            ukrdc3 (Session): SQLAlchemy session
+
+        Returns:
+            frozenset[str]: Facility codes
+        """
+        with self._lock:
+            generation = self._generation
+
+        codes = frozenset(ukrdc3.scalars(select(Facility.facilitycode)).all())
+
+        with self._lock:
+            if generation == self._generation:
+                self._codes = codes
+                self._loaded_at = time.monotonic()
+        return codes
+
+    def invalidate(self) -> None:
+        """Drop the loaded facility codes, so they are reloaded on next use"""
+        with self._lock:
+            self._codes = None
+            self._generation += 1
+
+    def contains(self, facility_code: str, ukrdc3: Session) -> bool:
+        """Check whether a facility code exists
+
+        Args:
+            facility_code (str): Facility code
+            ukrdc3 (Session): SQLAlchemy session, used only to reload the codes
+
+        Returns:
+            bool: Facility code exists
+        """
+        return facility_code in self.get(ukrdc3)
+
+    def exists(self, facility_code: str, ukrdc3: Session) -> bool:
+        """Check whether a facility code exists, falling back to the database for
+        codes not loaded, e.g. facilities added since the codes were last loaded
+
+        Args:
+            facility_code (str): Facility code
+            ukrdc3 (Session): SQLAlchemy session
+
+        Returns:
+            bool: Facility code exists
+        """
+        if self.contains(facility_code, ukrdc3):
+            return True
+        found = ukrdc3.scalar(
+            select(Facility.facilitycode).where(Facility.facilitycode == facility_code)
+        )
+        if found is None:
+            return False
+        # Pick up the new facility, and any others added alongside it
+        self.invalidate()
+        return True
+
+
+facility_codes = FacilityCodeIndex(max_seconds=settings.cache_facilities_list_seconds)
+
+# Facilities are added or removed when the facilities list is rebuilt
+watch_key(CacheKey.FACILITIES_LIST, facility_codes.invalidate)
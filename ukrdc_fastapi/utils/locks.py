@@ -0,0 +1,85 @@
+from uuid import uuid4
+
+from redis import Redis, WatchError
+
+
+def acquire_lock(
+    redis: Redis, key: str, timeout: int, token: str | None = None
+) -> str | None:
+    """Atomically acquire a Redis lock, if it is not already held
+
+    Args:
+        redis (Redis): Redis session
+        key (str): Lock key
+        timeout (int): Seconds after which the lock is released automatically
+        token (Optional[str], optional): Unique token identifying the holder.
+            Defaults to a random token.
+
+    Returns:
+        Optional[str]: Unique lock token, needed to release the lock, or None
+            if the lock is held by someone else
+    """
+    token = token or uuid4().hex
+    if redis.set(key, token, nx=True, ex=timeout):
+        return token
+    return None
+
+
+def release_lock(redis: Redis, key: str, token: str) -> bool:
+    """Release a Redis lock, only if it is still held with the given token.
+
+    This stops us releasing a lock that expired and was since acquired by
+    someone else.
+
+    Args:
+        redis (Redis): Redis session
+        key (str): Lock key
+        token (str): Token returned when the lock was acquired
+
+    Returns:
+        bool: Was the lock released
+    """
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            current = pipe.get(key)
+            if isinstance(current, bytes):
+                current = current.decode()
+            if current != token:
+                return False
+            pipe.multi()
+            pipe.delete(key)
+            pipe.execute()
+        except WatchError:
+            # The lock changed hands while we were releasing it
+            return False
+    return True
+
+
+def renew_lock(redis: Redis, key: str, token: str, timeout: int) -> bool:
+    """Reset a Redis lock's timeout, only if it is still held with the given token
+
+    Args:
+        redis (Redis): Redis session
+        key (str): Lock key
+        token (str): Token returned when the lock was acquired
+        timeout (int): Seconds from now after which the lock is released automatically
+
+    Returns:
+        bool: Was the lock renewed
+    """
+    with redis.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            current = pipe.get(key)
+            if isinstance(current, bytes):
+                current = current.decode()
+            if current != token:
+                return False
+            pipe.multi()
+            pipe.expire(key, timeout)
+            pipe.execute()
+        except WatchError:
+            # The lock changed hands while we were renewing it
+            return False
+    return True
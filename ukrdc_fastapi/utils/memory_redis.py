@@ -0,0 +1,665 @@
+"""
+In-process stand-in for a Redis client, used when `redis_backend` is "memory".
+
+Implements the subset of the redis-py client API used by this app, so cache,
+lock, and task tracking code runs unchanged against process memory. Suitable
+for single-node deployments, local development, and benchmarking without Redis
+in the loop. Data is not shared between processes, so must not be used with
+more than one worker.
+"""
+
+import builtins
+import datetime
+import fnmatch
+import threading
+import time
+from collections.abc import Callable, Iterator
+from typing import Any, Self
+
+from redis.client import NEVER_DECODE
+from redis.exceptions import DataError, ResponseError, WatchError
+
+# Redis string values are stored as bytes, so we mirror redis-py's encoding of
+# arguments, and optionally decode responses, in the same way
+_WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+def _encode(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    if isinstance(value, bool):
+        raise DataError("Invalid input of type: 'bool'. Convert to bytes or string.")
+    if isinstance(value, (int, float)):
+        return repr(value).encode()
+    if isinstance(value, str):
+        return value.encode()
+    raise DataError(f"Invalid input of type: '{type(value).__name__}'")
+
+
+def _key(name: Any) -> str:
+    return name.decode() if isinstance(name, bytes) else str(name)
+
+
+def _score(value: Any) -> float:
+    # Accept score bounds the way Redis does, e.g. "-inf" and "+inf"
+    return float(value.decode() if isinstance(value, bytes) else value)
+
+
+class _SortedSet(dict):
+    """Sorted set members, mapped to their scores"""
+
+    def ordered(self) -> list[tuple[bytes, float]]:
+        return sorted(self.items(), key=lambda item: (item[1], item[0]))
+
+
+def _now() -> float:
+    return time.monotonic()
+
+
+def _seconds(value: int | datetime.timedelta) -> float:
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return value
+
+
+class _MemoryStore:
+    """Keyspace for one logical database, shared by every client using it"""
+
+    def __init__(self) -> None:
+        # Re-entrant, so pipelines can run commands while holding the lock
+        self.lock = threading.RLock()
+        self.data: dict[str, Any] = {}
+        # Monotonic time each expiring key expires at
+        self.expires: dict[str, float] = {}
+        # Incremented whenever a key changes, so WATCH can detect changes
+        self.versions: dict[str, int] = {}
+        self.subscribers: dict[str, list[Callable[[dict[str, Any]], None]]] = {}
+
+    def touch(self, key: str) -> None:
+        self.versions[key] = self.versions.get(key, 0) + 1
+
+    def purge(self, key: str) -> None:
+        # Drop a key if it has expired
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= _now():
+            self.remove(key)
+
+    def remove(self, key: str) -> bool:
+        self.expires.pop(key, None)
+        if self.data.pop(key, None) is None:
+            return False
+        self.touch(key)
+        return True
+
+
+class MemoryRedis:
+    """Thread-safe, TTL-aware, in-process replacement for a Redis client"""
+
+    def __init__(
+        self, store: _MemoryStore | None = None, decode_responses: bool = False
+    ) -> None:
+        """Create an in-memory Redis client
+
+        Args:
+            store (Optional[_MemoryStore]): Keyspace to use. Defaults to a new, empty keyspace.
+            decode_responses (bool, optional): Decode responses to str. Defaults to False.
+        """
+        self._store = store or _MemoryStore()
+        self.decode_responses = decode_responses
+
+    # Internal helpers
+
+    def _out(self, value: Any) -> Any:
+        if not self.decode_responses:
+            return value
+        if isinstance(value, bytes):
+            return value.decode()
+        if isinstance(value, dict):
+            return {self._out(k): self._out(v) for k, v in value.items()}
+        if isinstance(value, set):
+            return {self._out(item) for item in value}
+        if isinstance(value, list):
+            return [self._out(item) for item in value]
+        return value
+
+    def _get_typed(self, name: Any, type_: type) -> Any:
+        key = _key(name)
+        self._store.purge(key)
+        value = self._store.data.get(key)
+        if value is not None and type(value) is not type_:
+            raise ResponseError(_WRONGTYPE)
+        return value
+
+    def _create_typed(self, name: Any, type_: type) -> Any:
+        value = self._get_typed(name, type_)
+        if value is None:
+            value = type_()
+            self._store.data[_key(name)] = value
+        return value
+
+    # Connection
+
+    def ping(self) -> bool:
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        """Run a command by name, e.g. as used to GET values without decoding them"""
+        client = self
+        if NEVER_DECODE in options and self.decode_responses:
+            # Run the command on an undecoded client sharing the same data
+            client = MemoryRedis(self._store)
+        return getattr(client, str(args[0]).lower())(*args[1:])
+
+    def pipeline(self, transaction: bool = True) -> "MemoryPipeline":
+        return MemoryPipeline(self)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False) -> "MemoryPubSub":
+        return MemoryPubSub(self._store)
+
+    # Keys
+
+    def delete(self, *names: Any) -> int:
+        with self._store.lock:
+            deleted = 0
+            for name in names:
+                self._store.purge(_key(name))
+                deleted += self._store.remove(_key(name))
+            return deleted
+
+    def exists(self, *names: Any) -> int:
+        with self._store.lock:
+            count = 0
+            for name in names:
+                self._store.purge(_key(name))
+                count += _key(name) in self._store.data
+            return count
+
+    def expire(
+        self,
+        name: Any,
+        time: int | datetime.timedelta,
+        nx: bool = False,
+        xx: bool = False,
+        gt: bool = False,
+        lt: bool = False,
+    ) -> bool:
+        with self._store.lock:
+            key = _key(name)
+            if not self.exists(key):
+                return False
+            current = self._store.expires.get(key)
+            new = _now() + _seconds(time)
+            # Keys without an expiry count as having an infinite TTL
+            if (nx and current is not None) or (xx and current is None):
+                return False
+            if gt and (current is None or new <= current):
+                return False
+            if lt and current is not None and new >= current:
+                return False
+            self._store.expires[key] = new
+            self._store.touch(key)
+            return True
+
+    def persist(self, name: Any) -> bool:
+        with self._store.lock:
+            key = _key(name)
+            self._store.purge(key)
+            if self._store.expires.pop(key, None) is None:
+                return False
+            self._store.touch(key)
+            return True
+
+    def ttl(self, name: Any) -> int:
+        with self._store.lock:
+            key = _key(name)
+            if not self.exists(key):
+                return -2
+            expires_at = self._store.expires.get(key)
+            if expires_at is None:
+                return -1
+            return max(round(expires_at - _now()), 0)
+
+    def scan_iter(self, match: str | None = None, count: int | None = None) -> Iterator:
+        with self._store.lock:
+            for key in list(self._store.data):
+                self._store.purge(key)
+            keys = [
+                key
+                for key in self._store.data
+                if match is None or fnmatch.fnmatchcase(key, _key(match))
+            ]
+        for key in keys:
+            yield key if self.decode_responses else key.encode()
+
+    def flushdb(self) -> bool:
+        with self._store.lock:
+            for key in list(self._store.data):
+                self._store.remove(key)
+            return True
+
+    # Strings
+
+    def get(self, name: Any) -> Any:
+        with self._store.lock:
+            return self._out(self._get_typed(name, bytes))
+
+    def set(
+        self,
+        name: Any,
+        value: Any,
+        ex: int | datetime.timedelta | None = None,
+        px: int | None = None,
+        nx: bool = False,
+        xx: bool = False,
+        keepttl: bool = False,
+    ) -> bool | None:
+        with self._store.lock:
+            key = _key(name)
+            exists = self.exists(key)
+            if (nx and exists) or (xx and not exists):
+                return None
+            expires_at = self._store.expires.get(key) if keepttl else None
+            self._store.remove(key)
+            self._store.data[key] = _encode(value)
+            if ex is not None:
+                expires_at = _now() + _seconds(ex)
+            elif px is not None:
+                expires_at = _now() + px / 1000
+            if expires_at is not None:
+                self._store.expires[key] = expires_at
+            self._store.touch(key)
+            return True
+
+    # Hashes
+
+    def hset(
+        self,
+        name: Any,
+        key: Any = None,
+        value: Any = None,
+        mapping: dict | None = None,
+    ) -> int:
+        with self._store.lock:
+            items = dict(mapping or {})
+            if key is not None:
+                items[key] = value
+            hash_ = self._create_typed(name, dict)
+            added = 0
+            for field, field_value in items.items():
+                added += _encode(field) not in hash_
+                hash_[_encode(field)] = _encode(field_value)
+            self._store.touch(_key(name))
+            return added
+
+    def hget(self, name: Any, key: Any) -> Any:
+        with self._store.lock:
+            hash_ = self._get_typed(name, dict) or {}
+            return self._out(hash_.get(_encode(key)))
+
+    def hgetall(self, name: Any) -> dict:
+        with self._store.lock:
+            return self._out(dict(self._get_typed(name, dict) or {}))
+
+    def hdel(self, name: Any, *keys: Any) -> int:
+        with self._store.lock:
+            hash_ = self._get_typed(name, dict) or {}
+            deleted = sum(hash_.pop(_encode(key), None) is not None for key in keys)
+            if hash_ == {}:
+                self._store.remove(_key(name))
+            elif deleted:
+                self._store.touch(_key(name))
+            return deleted
+
+    def hincrby(self, name: Any, key: Any, amount: int = 1) -> int:
+        with self._store.lock:
+            hash_ = self._create_typed(name, dict)
+            value = int(hash_.get(_encode(key), b"0")) + amount
+            hash_[_encode(key)] = _encode(value)
+            self._store.touch(_key(name))
+            return value
+
+    def hincrbyfloat(self, name: Any, key: Any, amount: float = 1.0) -> float:
+        with self._store.lock:
+            hash_ = self._create_typed(name, dict)
+            value = float(hash_.get(_encode(key), b"0")) + amount
+            hash_[_encode(key)] = _encode(value)
+            self._store.touch(_key(name))
+            return value
+
+    # Sets
+
+    def sadd(self, name: Any, *values: Any) -> int:
+        with self._store.lock:
+            set_ = self._create_typed(name, set)
+            encoded = {_encode(value) for value in values}
+            added = len(encoded - set_)
+            set_ |= encoded
+            self._store.touch(_key(name))
+            return added
+
+    def srem(self, name: Any, *values: Any) -> int:
+        with self._store.lock:
+            set_ = self._get_typed(name, set) or set()
+            encoded = {_encode(value) for value in values}
+            removed = len(encoded & set_)
+            set_ -= encoded
+            if set_ == set():
+                self._store.remove(_key(name))
+            elif removed:
+                self._store.touch(_key(name))
+            return removed
+
+    def smembers(self, name: Any) -> builtins.set:
+        with self._store.lock:
+            return self._out(set(self._get_typed(name, set) or set()))
+
+    def scard(self, name: Any) -> int:
+        with self._store.lock:
+            return len(self._get_typed(name, set) or set())
+
+    # Lists
+
+    def lpush(self, name: Any, *values: Any) -> int:
+        with self._store.lock:
+            list_ = self._create_typed(name, list)
+            for value in values:
+                list_.insert(0, _encode(value))
+            self._store.touch(_key(name))
+            return len(list_)
+
+    def rpush(self, name: Any, *values: Any) -> int:
+        with self._store.lock:
+            list_ = self._create_typed(name, list)
+            list_.extend(_encode(value) for value in values)
+            self._store.touch(_key(name))
+            return len(list_)
+
+    def llen(self, name: Any) -> int:
+        with self._store.lock:
+            return len(self._get_typed(name, list) or [])
+
+    def lrange(self, name: Any, start: int, end: int) -> list:
+        with self._store.lock:
+            items = list(self._get_typed(name, list) or [])
+        # Redis ranges are inclusive, and negative indexes count back from the end
+        start = max(start + len(items), 0) if start < 0 else start
+        end = end + len(items) if end < 0 else end
+        return self._out(items[start : end + 1])
+
+    def ltrim(self, name: Any, start: int, end: int) -> bool:
+        with self._store.lock:
+            list_ = self._get_typed(name, list)
+            if list_ is None:
+                return True
+            kept = self.lrange(name, start, end)
+            list_[:] = [_encode(item) for item in kept]
+            if not list_:
+                self._store.remove(_key(name))
+            else:
+                self._store.touch(_key(name))
+            return True
+
+    def lrem(self, name: Any, count: int, value: Any) -> int:
+        with self._store.lock:
+            list_ = self._get_typed(name, list) or []
+            # Negative counts remove from the tail, and zero removes every match
+            indexes = [i for i, item in enumerate(list_) if item == _encode(value)]
+            if count < 0:
+                indexes = indexes[::-1]
+            if count:
+                indexes = indexes[: abs(count)]
+            for i in sorted(indexes, reverse=True):
+                del list_[i]
+            if list_ == []:
+                self._store.remove(_key(name))
+            elif indexes:
+                self._store.touch(_key(name))
+            return len(indexes)
+
+    def lmove(
+        self, first_list: Any, second_list: Any, src: str = "LEFT", dest: str = "RIGHT"
+    ) -> Any:
+        with self._store.lock:
+            source = self._get_typed(first_list, list)
+            if not source:
+                return None
+            self._get_typed(second_list, list)
+            value = source.pop(0 if src.upper() == "LEFT" else -1)
+            if source == []:
+                self._store.remove(_key(first_list))
+            else:
+                self._store.touch(_key(first_list))
+            destination = self._create_typed(second_list, list)
+            if dest.upper() == "LEFT":
+                destination.insert(0, value)
+            else:
+                destination.append(value)
+            self._store.touch(_key(second_list))
+            return self._out(value)
+
+    def blmove(
+        self,
+        first_list: Any,
+        second_list: Any,
+        timeout: float,
+        src: str = "LEFT",
+        dest: str = "RIGHT",
+    ) -> Any:
+        # Poll rather than block, since there is no server to wake us up
+        deadline = _now() + timeout
+        while True:
+            value = self.lmove(first_list, second_list, src=src, dest=dest)
+            if value is not None or (timeout and _now() >= deadline):
+                return value
+            time.sleep(0.05)
+
+    # Sorted sets
+
+    def zadd(
+        self,
+        name: Any,
+        mapping: dict,
+        nx: bool = False,
+        xx: bool = False,
+    ) -> int:
+        with self._store.lock:
+            zset = self._create_typed(name, _SortedSet)
+            added = 0
+            for member, score in mapping.items():
+                exists = _encode(member) in zset
+                if (nx and exists) or (xx and not exists):
+                    continue
+                added += not exists
+                zset[_encode(member)] = _score(score)
+            if zset == {}:
+                self._store.remove(_key(name))
+            else:
+                self._store.touch(_key(name))
+            return added
+
+    def zrem(self, name: Any, *values: Any) -> int:
+        with self._store.lock:
+            zset = self._get_typed(name, _SortedSet) or _SortedSet()
+            removed = sum(
+                zset.pop(_encode(value), None) is not None for value in values
+            )
+            if zset == {}:
+                self._store.remove(_key(name))
+            elif removed:
+                self._store.touch(_key(name))
+            return removed
+
+    def zcard(self, name: Any) -> int:
+        with self._store.lock:
+            return len(self._get_typed(name, _SortedSet) or _SortedSet())
+
+    def zscore(self, name: Any, value: Any) -> float | None:
+        with self._store.lock:
+            zset = self._get_typed(name, _SortedSet) or _SortedSet()
+            return zset.get(_encode(value))
+
+    def zrange(
+        self,
+        name: Any,
+        start: int,
+        end: int,
+        desc: bool = False,
+        withscores: bool = False,
+    ) -> list:
+        with self._store.lock:
+            items = (self._get_typed(name, _SortedSet) or _SortedSet()).ordered()
+        if desc:
+            items.reverse()
+        # Redis ranges are inclusive, and negative indexes count back from the end
+        start = max(start + len(items), 0) if start < 0 else start
+        end = end + len(items) if end < 0 else end
+        items = items[start : end + 1]
+        if withscores:
+            return [(self._out(member), score) for member, score in items]
+        return [self._out(member) for member, _ in items]
+
+    def zrevrange(
+        self, name: Any, start: int, end: int, withscores: bool = False
+    ) -> list:
+        return self.zrange(name, start, end, desc=True, withscores=withscores)
+
+    def zrangebyscore(
+        self,
+        name: Any,
+        min: Any,
+        max: Any,
+        withscores: bool = False,
+    ) -> list:
+        with self._store.lock:
+            items = (self._get_typed(name, _SortedSet) or _SortedSet()).ordered()
+        items = [item for item in items if _score(min) <= item[1] <= _score(max)]
+        if withscores:
+            return [(self._out(member), score) for member, score in items]
+        return [self._out(member) for member, _ in items]
+
+    def zremrangebyscore(self, name: Any, min: Any, max: Any) -> int:
+        with self._store.lock:
+            members = self.zrangebyscore(name, min, max)
+            return self.zrem(name, *members) if members else 0
+
+    # Pub/sub
+
+    def publish(self, channel: Any, message: Any) -> int:
+        with self._store.lock:
+            handlers = list(self._store.subscribers.get(_key(channel), []))
+        # Deliver outside the lock where possible, as handlers may use the client
+        for handler in handlers:
+            handler({"type": "message", "channel": _key(channel), "data": message})
+        return len(handlers)
+
+
+class MemoryPipeline:
+    """Queue of commands run atomically against a MemoryRedis keyspace.
+
+    Supports optimistic locking with `watch()`, as redis-py pipelines do:
+    commands run immediately after `watch()` until `multi()` is called, and
+    `execute()` raises WatchError if a watched key changed in the meantime.
+    """
+
+    def __init__(self, client: MemoryRedis) -> None:
+        self._client = client
+        self._stack: list[tuple[Callable, tuple, dict]] = []
+        self._watched: dict[str, int] = {}
+        self._multi = False
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.reset()
+
+    def __len__(self) -> int:
+        return len(self._stack)
+
+    def __getattr__(self, name: str) -> Callable:
+        command = getattr(self._client, name)
+
+        def queue(*args: Any, **kwargs: Any) -> Any:
+            # Watching, but not yet in a transaction, so run immediately
+            if self._watched and not self._multi:
+                return command(*args, **kwargs)
+            self._stack.append((command, args, kwargs))
+            return self
+
+        return queue
+
+    def watch(self, *names: Any) -> None:
+        with self._client._store.lock:
+            for name in names:
+                key = _key(name)
+                self._client._store.purge(key)
+                self._watched[key] = self._client._store.versions.get(key, 0)
+
+    def multi(self) -> None:
+        self._multi = True
+
+    def reset(self) -> None:
+        self._stack = []
+        self._watched = {}
+        self._multi = False
+
+    def execute(self, raise_on_error: bool = True) -> list[Any]:
+        store = self._client._store
+        with store.lock:
+            for key, version in self._watched.items():
+                store.purge(key)
+                if store.versions.get(key, 0) != version:
+                    self.reset()
+                    raise WatchError("Watched variable changed.")
+            results: list[Any] = []
+            for command, args, kwargs in self._stack:
+                try:
+                    results.append(command(*args, **kwargs))
+                except ResponseError as e:
+                    results.append(e)
+        self.reset()
+
+        if raise_on_error:
+            for result in results:
+                if isinstance(result, ResponseError):
+                    raise result
+        return results
+
+
+class _MemoryPubSubWorker:
+    """Stand-in for a redis-py pub/sub worker thread. Messages are delivered on publish."""
+
+    def __init__(self, pubsub: "MemoryPubSub") -> None:
+        self._pubsub = pubsub
+
+    def stop(self) -> None:
+        self._pubsub.close()
+
+
+class MemoryPubSub:
+    """Pub/sub subscription, delivering messages to handlers as soon as they are published"""
+
+    def __init__(self, store: _MemoryStore) -> None:
+        self._store = store
+        self._handlers: dict[str, Callable[[dict[str, Any]], None]] = {}
+
+    def subscribe(self, **handlers: Callable[[dict[str, Any]], None]) -> None:
+        with self._store.lock:
+            for channel, handler in handlers.items():
+                self._store.subscribers.setdefault(channel, []).append(handler)
+                self._handlers[channel] = handler
+
+    def run_in_thread(
+        self, sleep_time: float = 0.0, daemon: bool = False
+    ) -> _MemoryPubSubWorker:
+        # No need for a thread, since handlers are called directly on publish
+        return _MemoryPubSubWorker(self)
+
+    def close(self) -> None:
+        with self._store.lock:
+            for channel, handler in self._handlers.items():
+                self._store.subscribers.get(channel, []).remove(handler)
+            self._handlers = {}
@@ -48,19 +48,23 @@ class ChannelGroupModel(OrmModel):
     )
 
 
-async def get_channels(mirth: MirthAPI, redis: Redis) -> list[ChannelModel]:
+async def get_channels(
+    mirth: MirthAPI, redis: Redis, refresh: bool = False
+) -> list[ChannelModel]:
     """Get a list of Mirth channel info
 
     Args:
         mirth (MirthAPI): API instance
         redis (Redis): Redis cache instance
+        refresh (bool, optional): Fetch the channel info from Mirth, even if
+            cached. Defaults to False.
 
     Returns:
         list[ChannelModel]: List of channel infos
     """
-    cache = BasicCache(redis, CacheKey.MIRTH_CHANNEL_INFO)
+    cache = BasicCache(redis, CacheKey.MIRTH_CHANNEL_INFO, local=True)
 
-    if not cache.exists:
+    if refresh or not cache.exists:
         channel_info: list[ChannelModel] = await mirth.channel_info()
         cache.set(channel_info, expire=settings.cache_mirth_channel_seconds)
 
@@ -77,7 +81,7 @@ async def get_groups(mirth: MirthAPI, redis: Redis) -> list[ChannelGroup]:
     Returns:
         list[ChannelGroup]: List of channel groups
     """
-    cache = BasicCache(redis, CacheKey.MIRTH_GROUPS)
+    cache = BasicCache(redis, CacheKey.MIRTH_GROUPS, local=True)
 
     if not cache.exists:
         groups: list[ChannelGroup] = await mirth.groups()
@@ -218,7 +222,7 @@ async def get_mirth_all(mirth: MirthAPI, redis: Redis) -> list[ChannelGroupModel
 
 
 async def get_channel_map(
-    mirth: MirthAPI, redis: Redis, by_name: bool = False
+    mirth: MirthAPI, redis: Redis, by_name: bool = False, refresh: bool = False
 ) -> dict[str, ChannelModel]:
     """Fetch a mapping of channel IDs -> ChannelModel objects.
     To reduce load on the Mirth server, channel mappings will
@@ -228,11 +232,13 @@ async def get_channel_map(
         mirth (MirthAPI): Mirth API instance
         redis (Redis): Redis instance for map caching
         by_name (bool, optional): Use channel name as the returned keys. Defaults to False.
+        refresh (bool, optional): Reload the channels from Mirth, even if cached.
+            Defaults to False.
 
     Returns:
         dict[str, ChannelModel]: Mapping of channel ID or name to ChannelModel objects
     """
-    channels: list[ChannelModel] = await get_channels(mirth, redis)
+    channels: list[ChannelModel] = await get_channels(mirth, redis, refresh=refresh)
 
     channel_map: dict[str, ChannelModel] = {
         str(channel.id): channel for channel in channels
@@ -242,6 +248,26 @@ async def get_channel_map(
     return {channel.name: channel for channel in channel_map.values()}
 
 
+def get_cached_channel_map(redis: Redis) -> dict[str, ChannelModel] | None:
+    """Fetch the mapping of channel IDs -> ChannelModel objects from the cache
+    only, without ever contacting Mirth.
+
+    Args:
+        redis (Redis): Redis instance for map caching
+
+    Returns:
+        Optional[dict[str, ChannelModel]]: Mapping of channel ID to ChannelModel
+            objects, or None if the channel info is not cached
+    """
+    cache = BasicCache(redis, CacheKey.MIRTH_CHANNEL_INFO, local=True)
+    if not cache.exists:
+        return None
+    return {
+        str(channel.id): channel
+        for channel in (ChannelModel(**channel) for channel in cache.get())
+    }
+
+
 async def get_channel_from_name(
     name: str, mirth: MirthAPI, redis: Redis
 ) -> Channel | None:
@@ -1,13 +1,21 @@
 from typing import Generic, TypeVar
 
 from fastapi import Query
+from fastapi_pagination import create_page, resolve_params
 from fastapi_pagination import paginate as paginate_sequence
 from fastapi_pagination.default import Page as BasePage
 from fastapi_pagination.default import Params as BaseParams
 from fastapi_pagination.ext.sqlalchemy import paginate
 from fastapi_pagination.utils import disable_installed_extensions_check
 
-__all__ = ["Page", "Params", "paginate", "paginate_sequence"]
+__all__ = [
+    "Page",
+    "Params",
+    "create_page",
+    "paginate",
+    "paginate_sequence",
+    "resolve_params",
+]
 
 T = TypeVar("T")  # pylint: disable=invalid-name
 
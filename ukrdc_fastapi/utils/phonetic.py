@@ -0,0 +1,70 @@
+import re
+import unicodedata
+from collections.abc import Iterable
+
+# Soundex digit for each consonant. Vowels, H, W and Y have no digit.
+_SOUNDEX_DIGITS = {
+    letter: digit
+    for letters, digit in [
+        ("BFPV", "1"),
+        ("CGJKQSXZ", "2"),
+        ("DT", "3"),
+        ("L", "4"),
+        ("MN", "5"),
+        ("R", "6"),
+    ]
+    for letter in letters
+}
+
+
+def _ascii_letters(word: str) -> str:
+    """Upper-case a word, dropping accents and anything other than A-Z"""
+    decomposed = unicodedata.normalize("NFKD", word)
+    return re.sub(r"[^A-Z]", "", decomposed.upper())
+
+
+def soundex(word: str) -> str | None:
+    """American Soundex code of a word, e.g. "S530" for both Smith and Smyth
+
+    Args:
+        word (str): Word to encode
+
+    Returns:
+        Optional[str]: Soundex code, or None if the word has no letters
+    """
+    letters = _ascii_letters(word)
+    if not letters:
+        return None
+
+    code = letters[0]
+    last_digit = _SOUNDEX_DIGITS.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_DIGITS.get(letter, "")
+        if digit and digit != last_digit:
+            code += digit
+            if len(code) == 4:
+                break
+        # Letters with the same digit either side of H or W are coded once,
+        # but vowels between them separate them
+        if letter not in "HW":
+            last_digit = digit
+
+    return code.ljust(4, "0")
+
+
+def phonetic_keys(names: Iterable[str | None]) -> set[str]:
+    """Phonetic keys of every word in a list of names
+
+    Args:
+        names (Iterable[Optional[str]]): Names, e.g. a given and family name
+
+    Returns:
+        set[str]: Phonetic keys
+    """
+    keys: set[str] = set()
+    for name in names:
+        for word in re.split(r"[\s\-']+", name or ""):
+            key = soundex(word)
+            if key:
+                keys.add(key)
+    return keys
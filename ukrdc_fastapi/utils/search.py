@@ -2,15 +2,37 @@ import datetime
 import re
 from collections.abc import Iterable, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import (
+    ColumnExpressionArgument,
+    Connection,
+    Engine,
+    Float,
+    Select,
+    SQLColumnExpression,
+    String,
+    case,
+    cast,
+    false,
+    func,
+    inspect,
+    literal,
+    select,
+    text,
+    union,
+    union_all,
+)
 from sqlalchemy.orm import Session
-from sqlalchemy.sql.expression import or_
+from sqlalchemy.sql.expression import ColumnElement, literal_column, or_
 from sqlalchemy.sql.functions import concat
 from stdnum.gb import nhs  # type:ignore
 from stdnum.util import isdigits  # type:ignore
-from ukrdc_sqla.ukrdc import Facility, Name, Patient, PatientNumber, PatientRecord
+from ukrdc_sqla.ukrdc import Name, Patient, PatientNumber, PatientRecord
 
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.models.search import PhoneticName
 from ukrdc_fastapi.utils import parse_date
+from ukrdc_fastapi.utils.facility_codes import facility_codes
+from ukrdc_fastapi.utils.phonetic import phonetic_keys
 
 
 class SearchSet:
@@ -80,8 +102,7 @@ class SearchSet:
         Add a list of strings to the search query set.
         Each string will be added to any search query group in which it is valid
         """
-        stmt = select(Facility.facilitycode)
-        facility_codes = ukrdc3.scalars(stmt).all()
+        known_facility_codes = facility_codes.get(ukrdc3)
 
         for item in terms:
             item = item.strip()
@@ -99,7 +120,7 @@ class SearchSet:
             self.add_pid(item)
 
             # Match facility codes
-            if item in facility_codes:
+            if item in known_facility_codes:
                 self.add_facility(item)
 
             # Absolutely anything can be a name
@@ -135,90 +156,404 @@ def _convert_query_to_pg_like(item: str) -> str:
     return f"{item}%"
 
 
-def records_from_mrn_no(
-    ukrdc3: Session, mrn_nos: Iterable[str]
-) -> Sequence[PatientRecord]:
+def _name_expressions() -> list[SQLColumnExpression[str | None]]:
+    """Each way a name can be written, which full name search terms are matched against"""
+    return [
+        concat(Name.given, " ", Name.family),
+        concat(Name.family, " ", Name.given),
+        Name.given,
+        Name.family,
+    ]
+
+
+def _full_name_conditions(names: Iterable[str]) -> list[ColumnElement[bool]]:
+    """Name conditions matching any of a list of full name search terms"""
+    conditions: list[ColumnElement[bool]] = []
+
+    for name in names:
+        query_term: str = _convert_query_to_pg_like(name).upper()
+
+        conditions.extend(
+            expression.like(query_term) for expression in _name_expressions()
+        )
+
+    return conditions
+
+
+def ukrdcids_from_mrn_no(mrn_nos: Iterable[str]) -> Select[tuple[str | None]]:
     """
-    Patient Records from MRN/NHS/HSC/CHI/RADAR number.
+    Select UKRDC IDs from MRN/NHS/HSC/CHI/RADAR number.
     """
-    return ukrdc3.scalars(
-        select(PatientRecord)
+    return (
+        select(PatientRecord.ukrdcid)
+        .select_from(PatientRecord)
         .join(Patient)
         .join(PatientNumber)
         .where(PatientNumber.patientid.in_(mrn_nos))
-    ).all()
+    )
 
 
-def records_from_pid(
-    ukrdc3: Session, pid_nos: Iterable[str]
-) -> Sequence[PatientRecord]:
+def ukrdcids_from_pid(pid_nos: Iterable[str]) -> Select[tuple[str | None]]:
     """
-    Finds Patient Records from PIDs
+    Select UKRDC IDs from PIDs
     """
-    return ukrdc3.scalars(
-        select(PatientRecord).where(PatientRecord.pid.in_(pid_nos))
-    ).all()
+    return select(PatientRecord.ukrdcid).where(PatientRecord.pid.in_(pid_nos))
 
 
-def records_from_ukrdcid(
-    ukrdc3: Session, ukrdcids: Iterable[str]
-) -> Sequence[PatientRecord]:
+def ukrdcids_from_ukrdcid(ukrdcids: Iterable[str]) -> Select[tuple[str | None]]:
     """
-    Finds Patient Records from UKRDC IDs
+    Select UKRDC IDs with records matching a list of UKRDC IDs
     """
-    return ukrdc3.scalars(
-        select(PatientRecord).where(PatientRecord.ukrdcid.in_(ukrdcids))
-    ).all()
+    return select(PatientRecord.ukrdcid).where(PatientRecord.ukrdcid.in_(ukrdcids))
 
 
-def records_from_facility(
-    ukrdc3: Session, facilities: Iterable[str]
-) -> Sequence[PatientRecord]:
+def ukrdcids_from_facility(facilities: Iterable[str]) -> Select[tuple[str | None]]:
     """
-    Finds Patient Records from facilities
+    Select UKRDC IDs from facilities
     """
     ignore_extracts = {"PVMIG", "HSMIG"}
-    return ukrdc3.scalars(
-        select(PatientRecord)
+    return (
+        select(PatientRecord.ukrdcid)
         .where(PatientRecord.sendingfacility.in_(facilities))
         .where(PatientRecord.sendingextract.notin_(ignore_extracts))
-    ).all()
+    )
+
+
+def ukrdcids_from_full_name(names: Iterable[str]) -> Select[tuple[str | None]]:
+    """Select UKRDC IDs from full name"""
+    return (
+        select(PatientRecord.ukrdcid)
+        .select_from(PatientRecord)
+        .join(Patient)
+        .join(Name)
+        .where(or_(*_full_name_conditions(names)))
+    )
+
+
+def ukrdcids_from_dob(dobs: Iterable[str | datetime.date]) -> Select[tuple[str | None]]:
+    """Select UKRDC IDs from date of birth"""
+    conditions = [Patient.birth_time == dob for dob in dobs]
+    return (
+        select(PatientRecord.ukrdcid)
+        .select_from(PatientRecord)
+        .join(Patient)
+        .where(or_(*conditions))
+    )
+
+
+# Trigram index over `_full_name_expression`, used by fuzzy name search.
+# The indexed expression must exactly match the one used in queries.
+NAME_TRIGRAM_INDEX = "ix_name_full_name_trgm"
+_NAME_TRIGRAM_INDEX_DDL = (
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {NAME_TRIGRAM_INDEX} ON name "
+    "USING gin ((coalesce(given, '') || ' ' || coalesce(family, '')) gin_trgm_ops)"
+)
+
+
+def create_name_trigram_index(engine: Engine) -> None:
+    """Create the pg_trgm extension, and the trigram index used by fuzzy name search.
+
+    The index is built concurrently, so the name table stays writable meanwhile.
+
+    Args:
+        engine (Engine): UKRDC3 database engine
+    """
+    # CREATE INDEX CONCURRENTLY can't run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(text(_NAME_TRIGRAM_INDEX_DDL))
+
+
+def _full_name_expression() -> ColumnElement[str]:
+    """Given and family name, as indexed by the name trigram index"""
+    empty: ColumnElement[str] = literal_column("''")
+    return (
+        func.coalesce(Name.given, empty)
+        + literal_column("' '")
+        + func.coalesce(Name.family, empty)
+    )
+
+
+def _fuzzy_term(name: str) -> str:
+    """Fuzzy search terms are never exact, so drop any quotes"""
+    return name.strip('"')
 
 
-def records_from_full_name(
-    ukrdc3: Session, names: Iterable[str]
-) -> Sequence[PatientRecord]:
-    """Finds Ids from full name"""
-    conditions = []
+def set_fuzzy_name_threshold(ukrdc3: Session, threshold: float) -> None:
+    """Set the minimum word similarity of fuzzy name matches, for the rest of
+    the current transaction
 
+    Args:
+        ukrdc3 (Session): SQLAlchemy session
+        threshold (float): Minimum word similarity, from 0 to 1
+    """
+    ukrdc3.execute(
+        select(
+            func.set_config("pg_trgm.word_similarity_threshold", str(threshold), True)
+        )
+    )
+
+
+def ukrdcids_from_fuzzy_name(names: Iterable[str]) -> Select[tuple[str | None]]:
+    """Select UKRDC IDs from full name, tolerating typos.
+
+    Matches names with a word similarity of at least the current
+    `pg_trgm.word_similarity_threshold` (see `set_fuzzy_name_threshold`) to
+    any of the terms, using the name trigram index.
+    """
+    # Custom operators bind like ||, so the name expression needs parentheses
+    full_name = _full_name_expression().self_group()
+    conditions = [literal(_fuzzy_term(name)).op("<%")(full_name) for name in names]
+    return (
+        select(PatientRecord.ukrdcid)
+        .select_from(PatientRecord)
+        .join(Patient)
+        .join(Name)
+        .where(or_(*conditions))
+    )
+
+
+def create_phonetic_name_table(bind: Engine | Connection) -> None:
+    """Create the phonetic name index table, if it doesn't exist yet.
+
+    The table lives in the UKRDC3 database, but isn't part of its schema. It is
+    filled by the `build_phonetic_name_index` repeated task.
+
+    Args:
+        bind (Engine | Connection): UKRDC3 database engine or connection
+    """
+    PhoneticName.metadata.create_all(bind)
+
+
+def phonetic_name_table_exists(ukrdc3: Session) -> bool:
+    """Has the phonetic name index table been created
+
+    Args:
+        ukrdc3 (Session): SQLAlchemy session
+
+    Returns:
+        bool: Does the table exist
+    """
+    return inspect(ukrdc3.connection()).has_table(PhoneticName.__tablename__)
+
+
+def ukrdcids_from_phonetic_name(names: Iterable[str]) -> Select[tuple[str | None]]:
+    """Select UKRDC IDs from full name, matching names which sound alike.
+
+    A record matches a term if its names share the phonetic key of every
+    word in the term, using the phonetic name index (see
+    `build_phonetic_name_index`).
+    """
+    matches = []
     for name in names:
-        query_term: str = _convert_query_to_pg_like(name).upper()
+        keys = phonetic_keys([_fuzzy_term(name)])
+        if keys:
+            matches.append(
+                select(PhoneticName.pid)
+                .where(PhoneticName.key.in_(keys))
+                .group_by(PhoneticName.pid)
+                .having(func.count(PhoneticName.key.distinct()) == len(keys))
+            )
+
+    # Terms with no letters match nothing
+    if not matches:
+        return select(PatientRecord.ukrdcid).where(false())
+
+    return select(PatientRecord.ukrdcid).where(
+        PatientRecord.pid.in_(union(*matches).subquery().select())
+    )
+
+
+# Relevance of each kind of match. A UKRDC ID scores the best match of each
+# distinct search term it matched, summed, so exact IDs outrank exact names,
+# which outrank name prefixes, which outrank dates of birth.
+SCORE_EXACT_ID = 100.0
+SCORE_EXACT_NAME = 50.0
+SCORE_PREFIX_NAME = 20.0
+SCORE_PHONETIC_NAME = 15.0
+SCORE_DOB = 10.0
+SCORE_FACILITY = 5.0
+
+
+def _scored(
+    stmt: Select[tuple[str | None]],
+    term: ColumnExpressionArgument,
+    score: ColumnExpressionArgument | float,
+) -> Select:
+    """Add the matched search term and a relevance score to a UKRDC ID query"""
+    if isinstance(score, float):
+        score = literal(score)
+    return stmt.add_columns(
+        cast(term, String).label("term"), cast(score, Float).label("score")
+    )
+
+
+def _scored_full_name(name: str) -> Select:
+    """Score UKRDC IDs matching a full name term, exact names above prefixes"""
+    exact_name = name.strip('"').upper()
+    is_exact = or_(*(expression == exact_name for expression in _name_expressions()))
+    return _scored(
+        ukrdcids_from_full_name([name]),
+        literal(name),
+        case((is_exact, SCORE_EXACT_NAME), else_=SCORE_PREFIX_NAME),
+    )
+
+
+def _scored_fuzzy_name(name: str) -> Select:
+    """Score UKRDC IDs matching a fuzzy name term, by word similarity"""
+    similarity = func.word_similarity(_fuzzy_term(name), _full_name_expression())
+    return _scored(
+        ukrdcids_from_fuzzy_name([name]),
+        literal(name),
+        similarity * SCORE_EXACT_NAME,
+    )
+
+
+def _search_groups(
+    searchset: SearchSet, ukrdc3: Session, fuzzy: bool, phonetic: bool
+) -> list[list[Select]]:
+    """Scored UKRDC ID queries for each non-empty group of a search set.
+
+    Each group is a list of queries selecting `ukrdcid`, the matched `term`,
+    and its relevance `score`.
+    """
+    groups: list[list[Select]] = []
 
-        conditions.extend(
+    if searchset.ukrdc_numbers:
+        groups.append(
+            [
+                _scored(
+                    ukrdcids_from_ukrdcid(searchset.ukrdc_numbers),
+                    PatientRecord.ukrdcid,
+                    SCORE_EXACT_ID,
+                )
+            ]
+        )
+
+    if searchset.mrn_numbers:
+        groups.append(
+            [
+                _scored(
+                    ukrdcids_from_mrn_no(searchset.mrn_numbers),
+                    PatientNumber.patientid,
+                    SCORE_EXACT_ID,
+                )
+            ]
+        )
+
+    # Names are scored term by term, so matching more of the terms ranks higher
+    if searchset.names and phonetic:
+        groups.append(
             [
-                concat(Name.given, " ", Name.family).like(query_term),
-                concat(Name.family, " ", Name.given).like(query_term),
-                Name.given.like(query_term),
-                Name.family.like(query_term),
+                _scored(
+                    ukrdcids_from_phonetic_name([name]),
+                    literal(name),
+                    SCORE_PHONETIC_NAME,
+                )
+                for name in searchset.names
             ]
         )
+    elif searchset.names and fuzzy:
+        set_fuzzy_name_threshold(ukrdc3, settings.search_fuzzy_name_threshold)
+        groups.append([_scored_fuzzy_name(name) for name in searchset.names])
+    elif searchset.names:
+        groups.append([_scored_full_name(name) for name in searchset.names])
 
-    return ukrdc3.scalars(
-        select(PatientRecord).join(Patient).join(Name).where(or_(*conditions))
-    ).all()
+    if searchset.dates:
+        groups.append(
+            [_scored(ukrdcids_from_dob(searchset.dates), Patient.birth_time, SCORE_DOB)]
+        )
 
+    if searchset.pids:
+        groups.append(
+            [
+                _scored(
+                    ukrdcids_from_pid(searchset.pids), PatientRecord.pid, SCORE_EXACT_ID
+                )
+            ]
+        )
 
-def records_from_dob(
-    ukrdc3: Session, dobs: Iterable[str | datetime.date]
-) -> Sequence[PatientRecord]:
-    """Finds Ids from date of birth"""
-    conditions = [Patient.birth_time == dob for dob in dobs]
-    return ukrdc3.scalars(
-        select(PatientRecord).join(Patient).where(or_(*conditions))
-    ).all()
+    if searchset.facilities:
+        groups.append(
+            [
+                _scored(
+                    ukrdcids_from_facility(searchset.facilities),
+                    PatientRecord.sendingfacility,
+                    SCORE_FACILITY,
+                )
+            ]
+        )
+
+    return groups
+
+
+def ranked_ukrdcids(
+    groups: Sequence[Sequence[Select]],
+    within: Select[tuple[str | None]] | None = None,
+    limit: int | None = None,
+) -> Select[tuple[str, float]]:
+    """
+    Combine scored UKRDC ID queries for each search group into a single query,
+    selecting the UKRDC IDs matched by every group which matched anything,
+    most relevant first.
+
+    Groups matching nothing are ignored rather than emptying the result, so
+    a term which only makes sense as, say, a name doesn't cancel out the
+    rest of the search. A plain INTERSECT can't express that, so instead
+    each group's matches are tagged with the group index and unioned, and
+    IDs are kept if they appear in as many groups as matched anything.
+
+    Each ID scores the best match of each distinct term it matched, summed
+    over every term, and ties are broken by UKRDC ID so pages are stable.
+
+    Args:
+        groups (Sequence[Sequence[Select]]): Scored UKRDC ID queries, per group
+        within (Optional[Select[tuple[str | None]]]): Only rank UKRDC IDs selected
+            by this query
+        limit (Optional[int]): Maximum number of UKRDC IDs to select
+
+    Returns:
+        Select[tuple[str, float]]: Matching UKRDC IDs and their scores
+    """
+    matches = union_all(
+        *(
+            branch.where(PatientRecord.ukrdcid.isnot(None)).add_columns(
+                literal(index).label("grp")
+            )
+            for index, group in enumerate(groups)
+            for branch in group
+        )
+    ).cte("matches")
+
+    # An ID can match a term through many records, so keep only its best match
+    term_scores = (
+        select(
+            matches.c.ukrdcid,
+            matches.c.grp,
+            func.max(matches.c.score).label("score"),
+        )
+        .group_by(matches.c.ukrdcid, matches.c.grp, matches.c.term)
+        .subquery("term_scores")
+    )
 
+    matched_groups = select(func.count(matches.c.grp.distinct())).scalar_subquery()
 
-def search_ukrdcids(  # pylint: disable=too-many-branches
+    score = func.sum(term_scores.c.score).label("score")
+    stmt = (
+        select(term_scores.c.ukrdcid, score)
+        .group_by(term_scores.c.ukrdcid)
+        .having(func.count(term_scores.c.grp.distinct()) == matched_groups)
+        .order_by(score.desc(), term_scores.c.ukrdcid)
+        .limit(limit)
+    )
+
+    if within is not None:
+        stmt = stmt.where(term_scores.c.ukrdcid.in_(within))
+
+    return stmt
+
+
+def rank_ukrdcids(  # pylint: disable=too-many-arguments
     mrn_number: list[str],
     ukrdc_number: list[str],
     full_name: list[str],
@@ -227,10 +562,30 @@ def search_ukrdcids(  # pylint: disable=too-many-branches
     facility: list[str],
     search: list[str],
     ukrdc3: Session,
-) -> set[str]:
-    """Search the UKRDC for a set of search items, and return a set of matching UKRDC IDs"""
-    match_sets: list[set[str]] = []
+    fuzzy: bool = False,
+    phonetic: bool = False,
+    within: Select[tuple[str | None]] | None = None,
+    limit: int | None = None,
+) -> Select[tuple[str, float]] | None:
+    """Build a query selecting the UKRDC IDs matching a set of search items,
+    and their relevance scores, most relevant first.
+
+    If `fuzzy` is set, names are matched by trigram similarity rather than prefix,
+    tolerating typos. This needs the name trigram index (see `create_name_trigram_index`).
+
+    If `phonetic` is set, names are matched by how they sound instead, e.g.
+    Smith and Smyth. This takes precedence over `fuzzy`, and needs the phonetic
+    name index (see `build_phonetic_name_index`).
+
+    Args:
+        within (Optional[Select[tuple[str | None]]]): Only rank UKRDC IDs selected
+            by this query, e.g. those with records the user can access
+        limit (Optional[int]): Maximum number of UKRDC IDs to select
 
+    Returns:
+        Optional[Select[tuple[str, float]]]: Ranking query, or None if there is
+            nothing to search for
+    """
     searchset = SearchSet()
 
     # Add all explicit search terms to the search set
@@ -250,38 +605,43 @@ def search_ukrdcids(  # pylint: disable=too-many-branches
     # Add all implicit search terms to the search set
     searchset.add_terms(search, ukrdc3)
 
-    if searchset.ukrdc_numbers:
-        query = records_from_ukrdcid(ukrdc3, searchset.ukrdc_numbers)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
-
-    if searchset.mrn_numbers:
-        query = records_from_mrn_no(ukrdc3, searchset.mrn_numbers)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
+    groups = _search_groups(searchset, ukrdc3, fuzzy, phonetic)
+    if not groups:
+        return None
 
-    if searchset.names:
-        query = records_from_full_name(ukrdc3, searchset.names)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
+    return ranked_ukrdcids(groups, within=within, limit=limit)
 
-    if searchset.dates:
-        query = records_from_dob(ukrdc3, searchset.dates)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
 
-    if searchset.pids:
-        query = records_from_pid(ukrdc3, searchset.pids)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
-
-    if searchset.facilities:
-        query = records_from_facility(ukrdc3, searchset.facilities)
-        match_sets.append({record.ukrdcid for record in query if record.ukrdcid})
-
-    non_empty_sets: list[set[str]] = [
-        match_set for match_set in match_sets if match_set
-    ]
-
-    matched_ids: set[str]
-    if non_empty_sets:
-        matched_ids = set.intersection(*non_empty_sets)
-    else:
-        matched_ids = set()
+def search_ukrdcids(
+    mrn_number: list[str],
+    ukrdc_number: list[str],
+    full_name: list[str],
+    pids: list[str],
+    dob: list[str],
+    facility: list[str],
+    search: list[str],
+    ukrdc3: Session,
+    fuzzy: bool = False,
+    phonetic: bool = False,
+) -> set[str]:
+    """Search the UKRDC for a set of search items, and return a set of matching UKRDC IDs
 
-    return matched_ids
+    See `rank_ukrdcids` for the `fuzzy` and `phonetic` options.
+    """
+    stmt = rank_ukrdcids(
+        mrn_number,
+        ukrdc_number,
+        full_name,
+        pids,
+        dob,
+        facility,
+        search,
+        ukrdc3,
+        fuzzy=fuzzy,
+        phonetic=phonetic,
+    )
+    if stmt is None:
+        return set()
+
+    # Intersect the groups in the database, in a single round trip
+    return set(ukrdc3.scalars(stmt).all())
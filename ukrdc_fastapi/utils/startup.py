@@ -0,0 +1,39 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """
+    Time taken for this process to reach each stage of startup, measured from
+    the start of the app lifespan. Used to measure cold starts during deploys.
+
+    Stages:
+        serving: Lifespan startup finished, and requests are accepted
+        first_request: The first request was handled
+        ready: The readiness probe first reported all warm caches populated
+    """
+
+    def __init__(self) -> None:
+        self._started_at: float | None = None
+        self.stages: dict[str, float] = {}
+
+    def start(self) -> None:
+        """Start timing, discarding any previous measurements"""
+        self._started_at = time.perf_counter()
+        self.stages = {}
+
+    def mark(self, stage: str) -> None:
+        """Record the time a stage was first reached. Later calls are ignored.
+
+        Args:
+            stage (str): Startup stage name
+        """
+        if self._started_at is None or stage in self.stages:
+            return
+        self.stages[stage] = time.perf_counter() - self._started_at
+        logger.info(f"Startup reached {stage} after {self.stages[stage]:.2f}s")
+
+
+startup_timer = StartupTimer()
@@ -1,28 +1,162 @@
+import asyncio
 import datetime
+import heapq
 import inspect
+import json
 import logging
-from collections.abc import Callable
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterator
 from functools import wraps
+from itertools import islice
 from typing import Any, Literal
 from uuid import UUID, uuid4
 
 from fastapi import HTTPException
 from pydantic import Field
-from redis import Redis
+from redis import Redis, WatchError
+from redis.client import NEVER_DECODE
 
 from ukrdc_fastapi.config import settings
 from ukrdc_fastapi.dependencies.auth import UKRDCUser
-from ukrdc_fastapi.exceptions import TaskLockError, TaskNotFoundError
+from ukrdc_fastapi.exceptions import (
+    TaskLockError,
+    TaskNotFoundError,
+    TaskTimeoutError,
+)
 from ukrdc_fastapi.schemas.base import JSONModel
+from ukrdc_fastapi.utils.locks import acquire_lock, release_lock, renew_lock
 
 _LOCK_PREFIX = "_LOCK_"
 
+# Sorted sets of task keys, scored by creation time. Public tasks share one
+# index, and each owner has an index of their private tasks.
+_INDEX_PREFIX = "_INDEX_"
+_PUBLIC_INDEX_KEY = f"{_INDEX_PREFIX}public"
+# Sorted set of "<index key> <task key>" members, scored by task expiry time
+_EXPIRY_INDEX_KEY = "_EXPIRY_INDEX_"
+# Sorted set of unfinished task keys, scored by their last heartbeat time
+_HEARTBEAT_INDEX_KEY = "_HEARTBEAT_INDEX_"
+# Prefix for the list of chunks of each task's stored result
+_RESULT_PREFIX = "_RESULT_:"
+
+# List of queued jobs, waiting to be run by a worker process
+QUEUE_KEY = "_QUEUE_"
+# Prefix for each worker process's list of jobs it is currently running
+PROCESSING_KEY_PREFIX = "_QUEUE_PROCESSING_:"
+# Set of every worker process's processing list, so lists left by dead workers can be found
+WORKERS_KEY = "_QUEUE_WORKERS_"
+# Prefix for each worker process's liveness key, which expires if the worker dies
+WORKER_ALIVE_PREFIX = "_QUEUE_ALIVE_:"
+
 VisibilityType = Literal["public", "private"]
-StatusType = Literal["pending", "running", "finished", "failed"]
+StatusType = Literal["pending", "running", "finished", "failed", "cancelled"]
 
 logger = logging.getLogger(__name__)
 
 
+def _private_index_key(owner: str | None) -> str:
+    return f"{_INDEX_PREFIX}private:{owner or ''}"
+
+
+def _index_key(visibility: str | None, owner: str | None) -> str:
+    return _PUBLIC_INDEX_KEY if visibility == "public" else _private_index_key(owner)
+
+
+def _result_key(key: str) -> str:
+    return f"{_RESULT_PREFIX}{key}"
+
+
+# Functions which can be queued by name, and run by worker processes
+_JOBS: dict[str, Callable[..., Awaitable[None]]] = {}
+
+
+def job(name: str) -> Callable[[Callable], Callable]:
+    """Register a function as a job, which can be queued to run in a worker process.
+
+    Jobs are looked up by name in the worker, so must be registered at import
+    time of a module imported by the worker. Job arguments must be JSON
+    serialisable.
+
+    Args:
+        name (str): Unique job name
+    """
+
+    def decorator(func: Callable) -> Callable:
+        if name in _JOBS:
+            raise ValueError(f"Job {name} is already registered")
+        _JOBS[name] = func
+        return func
+
+    return decorator
+
+
+def get_job(name: str) -> Callable[..., Awaitable[None]]:
+    """Get a registered job function by name
+
+    Args:
+        name (str): Job name
+
+    Raises:
+        KeyError: No job is registered with this name
+
+    Returns:
+        Callable[..., Awaitable[None]]: Job function
+    """
+    return _JOBS[name]
+
+
+class TaskProgressSchema(JSONModel):
+    """Progress of a running or completed background task"""
+
+    processed: int = Field(..., description="Number of items processed so far")
+    total: int | None = Field(
+        None, description="Total number of items to process, if known"
+    )
+    rate: float | None = Field(
+        None, description="Mean number of items processed per second"
+    )
+    eta: datetime.datetime | None = Field(
+        None, description="Estimated finish timestamp, if the total is known"
+    )
+
+    @classmethod
+    def measure(
+        cls,
+        processed: int,
+        total: int | None,
+        started: datetime.datetime,
+        updated: datetime.datetime,
+    ) -> "TaskProgressSchema":
+        """Calculate the processing rate and estimated finish time from raw progress
+
+        Args:
+            processed (int): Number of items processed so far
+            total (Optional[int]): Total number of items to process, if known
+            started (datetime.datetime): Task start timestamp
+            updated (datetime.datetime): Timestamp of the last progress update
+
+        Returns:
+            TaskProgressSchema: Task progress
+        """
+        elapsed = (updated - started).total_seconds()
+        rate = processed / elapsed if processed and elapsed > 0 else None
+        eta = (
+            updated + datetime.timedelta(seconds=(total - processed) / rate)
+            if rate and total is not None
+            else None
+        )
+        return cls(processed=processed, total=total, rate=rate, eta=eta)
+
+
+class TaskResultSchema(JSONModel):
+    """Output stored by a background task, downloadable from `/tasks/{id}/result`"""
+
+    media_type: str = Field(..., description="Result media type")
+    filename: str | None = Field(None, description="Suggested download filename")
+    size: int = Field(..., description="Result size in bytes")
+
+
 class TrackableTaskSchema(JSONModel):
     """Base schema for a trackable background task"""
 
@@ -41,6 +175,21 @@ class TrackableTaskSchema(JSONModel):
     finished: datetime.datetime | None = Field(
         None, description="Task finish timestamp"
     )
+    heartbeat: datetime.datetime | None = Field(
+        None, description="Last time the running task reported it was alive"
+    )
+    timeout: float | None = Field(
+        None, description="Seconds the task may run for before it is stopped"
+    )
+    cancel_requested: bool = Field(
+        False, description="Has cancellation of the task been requested"
+    )
+    progress: TaskProgressSchema | None = Field(
+        None, description="Task progress, if reported by the task"
+    )
+    result: TaskResultSchema | None = Field(
+        None, description="Task result, if the task stored one"
+    )
 
     @classmethod
     def from_redis(cls, redis_dict: dict):
@@ -54,7 +203,199 @@ class TrackableTaskSchema(JSONModel):
                 normalized_dict[key] = None
             else:
                 normalized_dict[key] = value
-        return cls(**normalized_dict)
+
+        # Progress is stored raw, so the rate and ETA are calculated on read
+        processed = normalized_dict.pop("progress_processed", None)
+        total = normalized_dict.pop("progress_total", None)
+        updated = normalized_dict.pop("progress_updated", None)
+        started = normalized_dict.get("started")
+        progress = None
+        if processed is not None and updated and started:
+            progress = TaskProgressSchema.measure(
+                int(processed),
+                int(total) if total is not None else None,
+                datetime.datetime.fromisoformat(started),
+                datetime.datetime.fromisoformat(updated),
+            )
+
+        # Results are described by their own fields, set once the result is complete
+        result = None
+        media_type = normalized_dict.pop("result_media_type", None)
+        filename = normalized_dict.pop("result_filename", None)
+        size = normalized_dict.pop("result_size", None)
+        if media_type and size is not None:
+            result = TaskResultSchema(
+                media_type=media_type, filename=filename, size=int(size)
+            )
+
+        return cls.model_validate(
+            {**normalized_dict, "progress": progress, "result": result}
+        )
+
+
+class TaskProgress:
+    """
+    Handle for a running task to report its progress, passed to task functions
+    with a `progress` argument.
+
+    Updates are held in memory and written to Redis at most once every
+    `redis_tasks_progress_seconds`, plus once when the task ends, so they can
+    be reported for every item without becoming a hot write path. Updates may
+    be reported from any thread.
+    """
+
+    def __init__(self, task_redis: Redis, key: str):
+        self.task_redis = task_redis
+        self.key = key
+
+        self.processed: int = 0
+        self.total: int | None = None
+        self.updated: datetime.datetime | None = None
+
+        self._lock = threading.Lock()
+        self._written_at: float | None = None
+
+    def set_total(self, total: int) -> None:
+        """Set the total number of items the task will process
+
+        Args:
+            total (int): Total number of items
+        """
+        with self._lock:
+            self.total = total
+        self._changed()
+
+    def advance(self, count: int = 1) -> None:
+        """Record more items as processed
+
+        Args:
+            count (int, optional): Number of items processed. Defaults to 1.
+        """
+        with self._lock:
+            self.processed += count
+        self._changed()
+
+    def _changed(self) -> None:
+        self.updated = datetime.datetime.now()
+        if (
+            self._written_at is None
+            or time.monotonic() - self._written_at
+            >= settings.redis_tasks_progress_seconds
+        ):
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the latest progress to Redis now, if any has been reported"""
+        with self._lock:
+            if self.updated is None:
+                return
+            mapping = {
+                "progress_processed": self.processed,
+                "progress_total": self.total if self.total is not None else "",
+                "progress_updated": self.updated.isoformat(),
+            }
+            self._written_at = time.monotonic()
+        self.task_redis.hset(self.key, mapping=mapping)  # type: ignore[arg-type]
+
+    def response(self, started: datetime.datetime | None) -> TaskProgressSchema | None:
+        """Return the progress resource representation, if any has been reported
+
+        Args:
+            started (Optional[datetime.datetime]): Task start timestamp
+
+        Returns:
+            Optional[TaskProgressSchema]: Task progress
+        """
+        if self.updated is None or started is None:
+            return None
+        return TaskProgressSchema.measure(
+            self.processed, self.total, started, self.updated
+        )
+
+
+class TaskResult:
+    """
+    Handle for a running task to store a large output, passed to task functions
+    with a `result` argument.
+
+    Output is buffered, and appended to a Redis list in chunks of
+    `redis_tasks_result_chunk_bytes`, so it is never held in memory in full,
+    either while the task writes it or while it is downloaded. The result
+    expires along with its task.
+    """
+
+    def __init__(self, task_redis: Redis, key: str):
+        self.task_redis = task_redis
+        self.key = key
+        self.chunks_key = _result_key(key)
+
+        self.media_type: str = "application/octet-stream"
+        self.filename: str | None = None
+        self.size: int = 0
+
+        self._buffer = bytearray()
+        self._started = False
+        self._closed = False
+
+    def set_media_type(self, media_type: str, filename: str | None = None) -> None:
+        """Describe the result, for clients downloading it
+
+        Args:
+            media_type (str): Result media type, e.g. "text/csv"
+            filename (Optional[str], optional): Suggested download filename. Defaults to None.
+        """
+        self.media_type = media_type
+        self.filename = filename
+
+    def write(self, data: bytes | str) -> None:
+        """Append output to the result
+
+        Args:
+            data (Union[bytes, str]): Output to append. Strings are UTF-8 encoded.
+        """
+        if not self._started:
+            # Discard any partial result left by an interrupted earlier run
+            self.task_redis.delete(self.chunks_key)
+            self._started = True
+        if isinstance(data, str):
+            data = data.encode()
+        self._buffer += data
+        self.size += len(data)
+        chunk_size = settings.redis_tasks_result_chunk_bytes
+        while len(self._buffer) >= chunk_size:
+            self.task_redis.rpush(self.chunks_key, bytes(self._buffer[:chunk_size]))
+            del self._buffer[:chunk_size]
+
+    def close(self) -> None:
+        """Store any buffered output, and mark the result as complete"""
+        if not self._started or self._closed:
+            return
+        pipe = self.task_redis.pipeline()
+        if self._buffer:
+            pipe.rpush(self.chunks_key, bytes(self._buffer))
+        pipe.hset(
+            self.key,
+            mapping={
+                "result_media_type": self.media_type,
+                "result_filename": self.filename or "",
+                "result_size": self.size,
+            },
+        )
+        pipe.execute()
+        self._buffer.clear()
+        self._closed = True
+
+    def response(self) -> TaskResultSchema | None:
+        """Return the result resource representation, once the result is complete
+
+        Returns:
+            Optional[TaskResultSchema]: Task result
+        """
+        if not self._closed:
+            return None
+        return TaskResultSchema(
+            media_type=self.media_type, filename=self.filename, size=self.size
+        )
 
 
 class TrackableTask:
@@ -67,6 +408,9 @@ class TrackableTask:
         name: str | None = None,
         lock: str | None = None,
         visibility: VisibilityType = "public",
+        timeout: float | None = None,
+        restore: dict[str, str] | None = None,
+        joined: bool = False,
     ):
         self.task_redis: Redis = task_redis
         self.lock_redis: Redis = lock_redis
@@ -86,11 +430,62 @@ class TrackableTask:
         self.created: datetime.datetime = datetime.datetime.now()
         self.started: datetime.datetime | None = None
         self.finished: datetime.datetime | None = None
+        self.heartbeat: datetime.datetime | None = None
+        self.timeout: float | None = timeout
+        self.cancel_requested: bool = False
 
         self._func: Callable = func
         self._lock_key: str | None = f"{_LOCK_PREFIX}{self.lock}" if self.lock else None
+        # Index the task key was last added to
+        self._index_key: str | None = None
+        # Is this a duplicate request, sharing an existing task's execution
+        self.joined: bool = joined
+
+        if restore is None:
+            self._prime()
+            self._sync()
+            # Unstarted tasks are swept if their process dies before starting them
+            self.task_redis.zadd(_HEARTBEAT_INDEX_KEY, {self._key: time.time()})
+        else:
+            self._restore(restore)
+
+        self._progress = TaskProgress(self.task_redis, self._key)
+        self._result = TaskResult(self.task_redis, self._key)
+
+    @property
+    def progress(self) -> TaskProgressSchema | None:
+        """Progress reported by the task so far, if any"""
+        return self._progress.response(self.started)
+
+    @property
+    def result(self) -> TaskResultSchema | None:
+        """Result stored by the task, once complete"""
+        return self._result.response()
 
-        self._prime()
+    def _restore(self, task_dict: dict[str, str]):
+        """
+        Take over a task created elsewhere, e.g. by the API process that queued it.
+        The task's lock, if any, was acquired on its behalf, but may have been
+        released since, so must be reclaimed before running (see `_reclaim`).
+
+        Joined tasks only mirror the existing task, and never write it back.
+        """
+        task = TrackableTaskSchema.from_redis(task_dict)
+        self.id = task.id
+        self._key = self.id.hex
+        self.name = task.name
+        self.lock = task_dict.get("lock") or None
+        self._lock_key = f"{_LOCK_PREFIX}{self.lock}" if self.lock else None
+        self.visibility = task.visibility
+        self.owner = task.owner
+        self.created = task.created
+        self.timeout = task.timeout
+        if self.joined:
+            self.status = task.status
+            self.error = task.error
+            self.started = task.started
+            self.finished = task.finished
+            return
         self._sync()
 
     def _rdict(self):
@@ -106,6 +501,7 @@ class TrackableTask:
             "created": self.created.isoformat(),
             "started": self.started.isoformat() if self.started else "",
             "finished": self.finished.isoformat() if self.finished else "",
+            "timeout": self.timeout if self.timeout is not None else "",
         }
 
     def response(self) -> TrackableTaskSchema:
@@ -117,16 +513,36 @@ class TrackableTask:
         return TrackableTaskSchema.model_validate(self)
 
     def _sync(self):
-        self.task_redis.hset(self._key, mapping=self._rdict())
+        index_key = _index_key(self.visibility, self.owner)
+        pipe = self.task_redis.pipeline()
+        pipe.hset(self._key, mapping=self._rdict())
+        # Move the task between indexes if its visibility or owner changed
+        if self._index_key and self._index_key != index_key:
+            pipe.zrem(self._index_key, self._key)
+        pipe.zadd(index_key, {self._key: self.created.timestamp()})
+        pipe.execute()
+        self._index_key = index_key
+
+    def _expire(self, seconds: int):
+        """Expire the task after some time, and schedule removing it from its index"""
+        pipe = self.task_redis.pipeline()
+        pipe.expire(self._key, seconds)
+        pipe.expire(_result_key(self._key), seconds)
+        pipe.zadd(
+            _EXPIRY_INDEX_KEY, {f"{self._index_key} {self._key}": time.time() + seconds}
+        )
+        pipe.execute()
 
     def _prime(self):
         """
         Acquire the tasks lock prior to running.
-        The lock will automatically release after 60 seconds if the task is not started.
+        If the task is never started, e.g. because its process died, the sweeper
+        fails it and releases the lock. Once started, the task's heartbeat keeps the
+        lock alive. Queued tasks hold their lock without expiry until a worker
+        starts them.
         """
         if self.lock and self._lock_key:
             self._acquire()
-            self.lock_redis.expire(self._lock_key, settings.redis_tasks_expire_lock)
 
     def _acquire(self):
         """
@@ -135,26 +551,106 @@ class TrackableTask:
         thus depend on the task arguments.
         This means we can, for example, prevent the same export running for a single
         patient multiple times simultaneously.
+
+        The lock is set atomically, with the task key as its token, so only one of
+        several simultaneous tasks can acquire it, and only this task can release it.
         """
         # If we're working with a lockable function
-        if self.lock and self._lock_key:
-            # Check if the lock is already acquired
+        if not (self.lock and self._lock_key):
+            return
+        if not acquire_lock(
+            self.lock_redis,
+            self._lock_key,
+            settings.redis_tasks_expire_lock,
+            token=self._key,
+        ):
+            # If lock is already acquired, raise an error
             active_lock = self.lock_redis.get(self._lock_key)
-            if active_lock:
-                # If lock is already acquired, raise an error
-                lock_str = (
-                    active_lock.decode()
-                    if isinstance(active_lock, bytes)
-                    else active_lock
-                )
-                raise TaskLockError(f"Task {self.name} is locked by task {lock_str}")
-            # Acquire the lock
-            self.lock_redis.set(self._lock_key, self._key)
+            lock_str = (
+                active_lock.decode() if isinstance(active_lock, bytes) else active_lock
+            )
+            raise TaskLockError(
+                f"Task {self.name} is locked by task {lock_str}", task_id=lock_str
+            )
+
+    def _reclaim(self):
+        """
+        Make sure a restored task holds its lock before it runs. The lock may have
+        been released while the task waited, e.g. by the sweeper after the worker
+        running it died.
+
+        Raises:
+            TaskLockError: Another task has taken the lock meanwhile
+        """
+        if not (self.lock and self._lock_key):
+            return
+        if not renew_lock(
+            self.lock_redis,
+            self._lock_key,
+            self._key,
+            settings.redis_tasks_expire_lock,
+        ):
+            self._acquire()
 
     def _release(self):
         if self.lock and self._lock_key:
-            # Release the lock
-            self.lock_redis.delete(self._lock_key)
+            # Release the lock, unless it has expired and been taken by another task
+            release_lock(self.lock_redis, self._lock_key, self._key)
+
+    def _beat(self) -> bool:
+        """
+        Record that the task is still alive, and keep its lock from expiring.
+
+        Returns:
+            bool: Has cancellation of the task been requested
+        """
+        self.heartbeat = datetime.datetime.now()
+        pipe = self.task_redis.pipeline()
+        pipe.hset(self._key, "heartbeat", self.heartbeat.isoformat())
+        pipe.zadd(_HEARTBEAT_INDEX_KEY, {self._key: self.heartbeat.timestamp()})
+        pipe.hget(self._key, "cancel_requested")
+        cancel_requested = pipe.execute()[-1]
+        if self.lock and self._lock_key:
+            renew_lock(
+                self.lock_redis,
+                self._lock_key,
+                self._key,
+                settings.redis_tasks_expire_lock,
+            )
+        return bool(cancel_requested)
+
+    async def _heartbeat(self, runner: asyncio.Task) -> None:
+        """Beat until the task finishes, cancelling it if requested"""
+        while True:
+            await asyncio.sleep(settings.redis_tasks_heartbeat_seconds)
+            if self._beat():
+                logger.info(f"[{self.id}] Cancelling {self.name}")
+                self.cancel_requested = True
+                runner.cancel()
+                return
+
+    async def _run(self, *args: Any, **kwargs: Any) -> None:
+        """Run the task function alongside its heartbeat, within its timeout
+
+        Raises:
+            TaskTimeoutError: The task ran past its timeout
+        """
+        self._beat()
+        runner = asyncio.ensure_future(self._func(*args, **kwargs))
+        heartbeat = asyncio.ensure_future(self._heartbeat(runner))
+        timeout = asyncio.timeout(self.timeout)
+        try:
+            async with timeout:
+                await runner
+        except TimeoutError as e:
+            # The task function may raise TimeoutError itself, e.g. from a network call
+            if timeout.expired():
+                raise TaskTimeoutError(
+                    f"Task timed out after {self.timeout} seconds"
+                ) from e
+            raise
+        finally:
+            heartbeat.cancel()
 
     @property
     def tracked(self) -> Callable:
@@ -166,11 +662,35 @@ class TrackableTask:
 
         @wraps(self._func)
         async def wrapper(*args: Any, **kwargs: Any) -> None:
-            func_args = inspect.signature(self._func).bind(*args, **kwargs).arguments
+            # Joined tasks share the execution of the task they joined
+            if self.joined:
+                logger.info(f"[{self.id}] Joined running task {self.name}")
+                return
+
+            # Don't start tasks cancelled while they were pending
+            if self.task_redis.hget(self._key, "cancel_requested"):
+                logger.info(f"[{self.id}] Cancelled {self.name} before it started")
+                self.cancel_requested = True
+                self.status = "cancelled"
+                self.finished = datetime.datetime.now()
+                self._sync()
+                self._expire(settings.redis_tasks_expire)
+                self.task_redis.zrem(_HEARTBEAT_INDEX_KEY, self._key)
+                self._release()
+                return
+
+            signature = inspect.signature(self._func)
+            func_args = signature.bind_partial(*args, **kwargs).arguments
             func_args_str = ", ".join(
                 "{}={!r}".format(*item)  # pylint: disable=consider-using-f-string
                 for item in func_args.items()
             )
+            # Pass a progress handle to functions which can report progress
+            if "progress" in signature.parameters and "progress" not in func_args:
+                kwargs["progress"] = self._progress
+            # Pass a result handle to functions which store a result
+            if "result" in signature.parameters and "result" not in func_args:
+                kwargs["result"] = self._result
 
             # Update the task status to running
             logger.info(
@@ -180,18 +700,36 @@ class TrackableTask:
             self.started = datetime.datetime.now()
             self._sync()
 
-            # Remove the lock expiry now the task is running
-            if self.lock and self._lock_key:
-                self.lock_redis.persist(self._lock_key)
-
             try:
-                await self._func(*args, **kwargs)
+                # The heartbeat keeps the lock from expiring while the task runs
+                await self._run(*args, **kwargs)
+                self._result.close()
                 logger.info(f"[{self.id}] Finished {self.name} Successfully")
                 # Mark the task as finished
                 self.status = "finished"
                 self._sync()
                 # Expire the task after the configured time
-                self.task_redis.expire(self._key, settings.redis_tasks_expire)
+                self._expire(settings.redis_tasks_expire)
+            except asyncio.CancelledError:
+                if not self.cancel_requested:
+                    # Cancelled from outside, e.g. on shutdown, so fail the task
+                    self.status = "failed"
+                    self.error = "Task was interrupted"
+                    self._sync()
+                    self._expire(settings.redis_tasks_expire_error)
+                    raise
+                logger.info(f"[{self.id}] Cancelled {self.name}")
+                self.status = "cancelled"
+                self._sync()
+                self._expire(settings.redis_tasks_expire)
+            except TaskTimeoutError as e:
+                logger.error(
+                    f"[{self.id}] Timed out {self.name} after {self.timeout} seconds"
+                )
+                self.status = "failed"
+                self.error = str(e)
+                self._sync()
+                self._expire(settings.redis_tasks_expire_error)
             except Exception as e:
                 logger.exception(
                     f"[{self.id}] Failed Permanently {self.name} with error: {e}"  # noqa: TRY401
@@ -203,11 +741,13 @@ class TrackableTask:
                 # Sync to redis
                 self._sync()
                 # Expire the task after the configured time
-                self.task_redis.expire(self._key, settings.redis_tasks_expire_error)
+                self._expire(settings.redis_tasks_expire_error)
             finally:
                 self.finished = datetime.datetime.now()
                 # Sync to redis
                 self._sync()
+                self._progress.flush()
+                self.task_redis.zrem(_HEARTBEAT_INDEX_KEY, self._key)
                 # Release the lock
                 self._release()
 
@@ -220,22 +760,83 @@ class TaskTracker:
         self.lock_redis = lock_redis
         self.user = user
 
+    def _prune(self):
+        """Remove expired tasks from the task indexes"""
+        expired = self.task_redis.zrangebyscore(_EXPIRY_INDEX_KEY, "-inf", time.time())
+        if not expired:
+            return
+        pipe = self.task_redis.pipeline()
+        for member in expired:
+            index_key, key = str(member).rsplit(" ", 1)
+            pipe.zrem(index_key, key)
+        pipe.zrem(_EXPIRY_INDEX_KEY, *expired)
+        pipe.execute()
+
+    def get_page(
+        self, offset: int = 0, limit: int | None = None
+    ) -> tuple[list[TrackableTaskSchema], int]:
+        """Get a page of trackable task resource representations, newest first.
+
+        Only public tasks, and private tasks owned by the current user, are
+        included. Tasks are read from the creation time indexes, so only the
+        tasks up to the end of the page are touched.
+
+        Args:
+            offset (int, optional): Number of tasks to skip. Defaults to 0.
+            limit (Optional[int], optional): Maximum number of tasks. Defaults to None (all).
+
+        Returns:
+            tuple[list[TrackableTaskSchema], int]: Page of tasks, and total number of tasks
+        """
+        self._prune()
+
+        # Read the newest entries of each index visible to the user
+        index_keys = [_PUBLIC_INDEX_KEY, _private_index_key(self.user.email)]
+        stop = offset + limit - 1 if limit is not None else -1
+        pipe = self.task_redis.pipeline(transaction=False)
+        for index_key in index_keys:
+            pipe.zrevrange(index_key, 0, stop, withscores=True)
+            pipe.zcard(index_key)
+        results = pipe.execute()
+        total: int = sum(results[1::2])
+
+        # Merge the indexes by creation time, and fetch just this page of tasks
+        entries = heapq.merge(*results[::2], key=lambda entry: entry[1], reverse=True)
+        keys = [
+            key
+            for key, _ in islice(
+                entries, offset, offset + limit if limit is not None else None
+            )
+        ]
+        pipe = self.task_redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(key)
+
+        tasks: list[TrackableTaskSchema] = []
+        missing: list[str] = []
+        for key, task_dict in zip(keys, pipe.execute()):
+            if task_dict:
+                tasks.append(TrackableTaskSchema.from_redis(task_dict))
+            else:
+                missing.append(key)
+
+        # Tasks removed without going through the expiry index, e.g. by hand
+        if missing:
+            pipe = self.task_redis.pipeline(transaction=False)
+            for index_key in index_keys:
+                pipe.zrem(index_key, *missing)
+            pipe.execute()
+            total -= len(missing)
+
+        return tasks, total
+
     def get_all(self) -> list[TrackableTaskSchema]:
         """Get a list of all trackable task resource representations
 
         Returns:
-            list[TrackableTaskSchema]: List of tasks
+            list[TrackableTaskSchema]: List of tasks, newest first
         """
-        tasks: list[TrackableTaskSchema] = []
-        for key in self.task_redis.scan_iter():
-            # Convert Redis map to TrackableTaskSchema
-            task = TrackableTaskSchema.from_redis(self.task_redis.hgetall(key))  # type: ignore
-            # Only show public tasks or those owned by the current user
-            if task.visibility == "public" or task.owner == self.user.email:
-                tasks.append(task)
-
-        # Sort by created date
-        tasks.sort(key=lambda x: x.created, reverse=True)
+        tasks, _ = self.get_page()
         return tasks
 
     def get(self, key: str) -> TrackableTaskSchema:
@@ -255,12 +856,183 @@ class TaskTracker:
             raise TaskNotFoundError(f"Task {key} does not exist")
         return TrackableTaskSchema.from_redis(self.task_redis.hgetall(key))  # type: ignore
 
+    def iter_result(self, key: str) -> Iterator[bytes]:
+        """
+        Stream a task's stored result, fetching one chunk from Redis at a time
+
+        Args:
+            key (str): Task key (UUID hex)
+
+        Yields:
+            bytes: Next chunk of the result
+        """
+        chunks_key = _result_key(key)
+        index = 0
+        while True:
+            # Results are binary, so must skip the client's response decoding
+            chunk = self.task_redis.execute_command(
+                "LRANGE", chunks_key, index, index, **{NEVER_DECODE: []}
+            )
+            if not chunk:
+                return
+            yield chunk[0]
+            index += 1
+
+    def cancel(self, key: str) -> TrackableTaskSchema:
+        """
+        Request cancellation of a task. Cancellation is cooperative: a pending
+        task won't start, and a running task is cancelled at its next `await`
+        after its next heartbeat. Synchronous code already running in a thread
+        can't be interrupted, so runs to completion.
+
+        Args:
+            key (str): Task key (UUID hex)
+
+        Raises:
+            TaskNotFoundError: Task is expired or does not exist
+
+        Returns:
+            TrackableTaskSchema: Task resource representation
+        """
+        task = self.get(key)
+        if task.status in ("pending", "running"):
+            logger.info(f"[{task.id}] Cancellation requested by {self.user.email}")
+            self.task_redis.hset(key, "cancel_requested", "1")
+            task.cancel_requested = True
+        return task
+
+    def sweep(self) -> list[str]:
+        """
+        Fail tasks whose heartbeat has stopped, e.g. because the process running
+        them died, and release their locks. Safe to run from any process, at any
+        time, as live tasks are never swept.
+
+        Returns:
+            list[str]: Keys of the tasks swept
+        """
+        orphaned = self.task_redis.zrangebyscore(
+            _HEARTBEAT_INDEX_KEY,
+            "-inf",
+            time.time() - settings.redis_tasks_heartbeat_timeout,
+        )
+        swept: list[str] = []
+        for member in orphaned:
+            key = member.decode() if isinstance(member, bytes) else str(member)
+            # Only sweep the task if its heartbeat hasn't moved on since
+            with self.task_redis.pipeline() as pipe:
+                try:
+                    pipe.watch(key)
+                    task_dict: dict[str, str] = pipe.hgetall(key)  # type: ignore[assignment]
+                    if task_dict.get("status") not in ("pending", "running"):
+                        pipe.multi()
+                        pipe.zrem(_HEARTBEAT_INDEX_KEY, key)
+                        pipe.execute()
+                        continue
+                    # Unstarted tasks have no heartbeat, so get longer to start
+                    created = task_dict.get("created")
+                    if (
+                        task_dict.get("status") == "pending"
+                        and created
+                        and datetime.datetime.fromisoformat(created).timestamp()
+                        > time.time() - settings.redis_tasks_pending_timeout
+                    ):
+                        continue
+                    index_key = _index_key(
+                        task_dict.get("visibility"), task_dict.get("owner")
+                    )
+                    expires_at = time.time() + settings.redis_tasks_expire_error
+                    pipe.multi()
+                    pipe.hset(
+                        key,
+                        mapping={
+                            "status": "failed",
+                            "error": "Task stopped responding",
+                            "finished": datetime.datetime.now().isoformat(),
+                        },
+                    )
+                    pipe.expire(key, settings.redis_tasks_expire_error)
+                    pipe.expire(_result_key(key), settings.redis_tasks_expire_error)
+                    pipe.zadd(_EXPIRY_INDEX_KEY, {f"{index_key} {key}": expires_at})
+                    pipe.zrem(_HEARTBEAT_INDEX_KEY, key)
+                    pipe.execute()
+                except WatchError:
+                    # A heartbeat arrived while we were sweeping, so leave it
+                    continue
+
+            logger.warning(
+                f"[{key}] Failed {task_dict.get('name')}, as it stopped responding"
+            )
+            lock = task_dict.get("lock")
+            if lock:
+                release_lock(self.lock_redis, f"{_LOCK_PREFIX}{lock}", key)
+            swept.append(key)
+        return swept
+
+    def fail_queued(self, task_dict: dict[str, str], error: str) -> None:
+        """
+        Fail a queued task without running it, and release its lock if the task
+        still holds it.
+
+        Args:
+            task_dict (dict[str, str]): Task details, as queued
+            error (str): Error message
+        """
+        key = task_dict["id"]
+        index_key = _index_key(task_dict.get("visibility"), task_dict.get("owner"))
+        created = datetime.datetime.fromisoformat(task_dict["created"])
+        failed = {
+            **task_dict,
+            "status": "failed",
+            "error": error,
+            "finished": datetime.datetime.now().isoformat(),
+        }
+        pipe = self.task_redis.pipeline()
+        pipe.hset(key, mapping=failed)  # type: ignore[arg-type]
+        pipe.zadd(index_key, {key: created.timestamp()})
+        pipe.expire(key, settings.redis_tasks_expire_error)
+        pipe.zadd(
+            _EXPIRY_INDEX_KEY,
+            {f"{index_key} {key}": time.time() + settings.redis_tasks_expire_error},
+        )
+        pipe.execute()
+
+        lock = task_dict.get("lock")
+        if lock:
+            release_lock(self.lock_redis, f"{_LOCK_PREFIX}{lock}", key)
+
+    def requeue_orphaned_jobs(self) -> int:
+        """
+        Queue jobs again if the worker process running them has died, e.g. in a
+        container which was replaced, and so will never resume them itself.
+        Safe to run from any process, at any time, as jobs held by live workers
+        are never moved.
+
+        Returns:
+            int: Number of jobs queued again
+        """
+        requeued = 0
+        for member in self.task_redis.smembers(WORKERS_KEY):  # type: ignore[union-attr]
+            processing_key = (
+                member.decode() if isinstance(member, bytes) else str(member)
+            )
+            worker_id = processing_key.removeprefix(PROCESSING_KEY_PREFIX)
+            if self.task_redis.exists(f"{WORKER_ALIVE_PREFIX}{worker_id}"):
+                continue
+            # Move each job to the front of the queue, so it runs next
+            while self.task_redis.lmove(processing_key, QUEUE_KEY, "RIGHT", "RIGHT"):
+                requeued += 1
+            self.task_redis.srem(WORKERS_KEY, processing_key)
+            logger.warning(f"Recovered jobs of stopped worker {worker_id}")
+        return requeued
+
     def create(
         self,
         func: Callable,
         name: str | None = None,
         lock: str | None = None,
         visibility: VisibilityType = "public",
+        coalesce: bool = False,
+        timeout: float | None = None,
     ) -> TrackableTask:
         """Create, track, and start a new background task
 
@@ -269,19 +1041,115 @@ class TaskTracker:
             name (Optional[str], optional): Friendly task name. Defaults to None.
             lock (Optional[str], optional): Lock key to prevent multiple instances. Defaults to None.
             visibility (VisibilityType, optional): Task status visibility. Defaults to "public".
+            coalesce (bool, optional): If the lock is held, join the task holding it
+                instead of raising an error. Defaults to False.
+            timeout (Optional[float], optional): Seconds the task may run for before
+                it is cancelled and failed. Defaults to None (no timeout).
 
         Returns:
             TrackableTask: Task tracker object
         """
+        try:
+            return TrackableTask(
+                task_redis=self.task_redis,
+                lock_redis=self.lock_redis,
+                user=self.user,
+                func=func,
+                name=name,
+                lock=lock,
+                visibility=visibility,
+                timeout=timeout,
+            )
+        except TaskLockError as e:
+            if coalesce:
+                return self._join(func, e)
+            raise
+
+    def _join(self, func: Callable, error: TaskLockError) -> TrackableTask:
+        """
+        Join the task holding a lock, so duplicate requests share its execution.
+        Running a joined task does nothing, and its response is the existing task.
+
+        Args:
+            func (Callable): Function the duplicate request would have run
+            error (TaskLockError): Error raised acquiring the lock
+
+        Raises:
+            TaskLockError: If the task holding the lock can't be joined
+
+        Returns:
+            TrackableTask: Joined task tracker object
+        """
+        # The holder may have finished, or not yet have been stored
+        task_dict = self.task_redis.hgetall(error.task_id) if error.task_id else {}
+        if not task_dict:
+            raise error
+        # Don't share other users' private tasks
+        if (
+            task_dict.get("visibility") == "private"  # type: ignore[union-attr]
+            and task_dict.get("owner") != self.user.email  # type: ignore[union-attr]
+        ):
+            raise error
         return TrackableTask(
             task_redis=self.task_redis,
             lock_redis=self.lock_redis,
             user=self.user,
             func=func,
+            restore=task_dict,  # type: ignore[arg-type]
+            joined=True,
+        )
+
+    def enqueue(
+        self,
+        job_name: str,
+        kwargs: dict[str, Any] | None = None,
+        name: str | None = None,
+        lock: str | None = None,
+        visibility: VisibilityType = "public",
+        coalesce: bool = False,
+        timeout: float | None = None,
+    ) -> TrackableTask:
+        """
+        Create and track a new task, queued to run a registered job in a worker
+        process rather than in this process.
+
+        Args:
+            job_name (str): Registered job name
+            kwargs (Optional[dict[str, Any]], optional): JSON serialisable job arguments. Defaults to None.
+            name (Optional[str], optional): Friendly task name. Defaults to None.
+            lock (Optional[str], optional): Lock key to prevent multiple instances. Defaults to None.
+            visibility (VisibilityType, optional): Task status visibility. Defaults to "public".
+            coalesce (bool, optional): If the lock is held, join the task holding it
+                instead of raising an error. Defaults to False.
+            timeout (Optional[float], optional): Seconds the task may run for before
+                it is cancelled and failed. Defaults to None (no timeout).
+
+        Returns:
+            TrackableTask: Task tracker object
+        """
+        task = self.create(
+            get_job(job_name),
             name=name,
             lock=lock,
             visibility=visibility,
+            coalesce=coalesce,
+            timeout=timeout,
         )
+        if task.joined:
+            return task
+        # Queued tasks may wait for a worker indefinitely, so aren't swept until
+        # they start. If a worker dies running one, it is resumed from the queue.
+        self.task_redis.zrem(_HEARTBEAT_INDEX_KEY, task._key)
+        # Likewise, the lock is held without expiry until a worker starts the
+        # task, after which its heartbeat keeps the lock alive
+        if task._lock_key:
+            self.lock_redis.persist(task._lock_key)
+        # The task is queued along with its details, so the worker can run it
+        # even if the task's status has been cleared in the meantime
+        payload = {"job": job_name, "kwargs": kwargs or {}, "task": task._rdict()}
+        self.task_redis.lpush(QUEUE_KEY, json.dumps(payload))
+        logger.info(f"[{task.id}] Queued {task.name}")
+        return task
 
     def http_create(
         self,
@@ -289,23 +1157,39 @@ class TaskTracker:
         name: str | None = None,
         lock: str | None = None,
         visibility: VisibilityType = "public",
+        coalesce: bool = False,
+        timeout: float | None = None,
     ) -> TrackableTask:
         """
         Create, track, and start a new background task, returning HTTP exceptions
         if the task cannot be launched. Mostly used if you need to create a
         background task from within a router function.
 
+        With `coalesce`, identical requests share one execution: duplicates are
+        given the running task, whose `tracked` function does nothing.
+
         Args:
             func (Callable): Function to wrap and run in the background
             name (Optional[str], optional): Friendly task name. Defaults to None.
             lock (Optional[str], optional): Lock key to prevent multiple instances. Defaults to None.
             visibility (VisibilityType, optional): Task status visibility. Defaults to "public".
+            coalesce (bool, optional): If the lock is held, join the task holding it
+                instead of returning a 409 error. Defaults to False.
+            timeout (Optional[float], optional): Seconds the task may run for before
+                it is cancelled and failed. Defaults to None (no timeout).
 
         Returns:
             TrackableTask: Task tracker object
         """
         try:
-            return self.create(func, name=name, lock=lock, visibility=visibility)
+            return self.create(
+                func,
+                name=name,
+                lock=lock,
+                visibility=visibility,
+                coalesce=coalesce,
+                timeout=timeout,
+            )
         except TaskLockError as e:
             raise HTTPException(
                 status_code=409,
@@ -0,0 +1,187 @@
+"""
+Worker processes running queued background tasks, outside of the API process.
+
+Start with `python -m ukrdc_fastapi.worker [--concurrency N]`. Each worker
+process runs one job at a time, taking jobs from the queue in Redis and
+reporting their status through the task tracker, just like tasks run in the
+API process.
+
+While running a job, a worker keeps it in a processing list named after its
+host and slot number. If the worker dies mid-job, the job stays there, and
+is run again when that worker slot next starts. Workers also keep a liveness
+key alive, so if a worker never restarts, e.g. because its container was
+replaced by one with a new hostname, the sweep job queues its jobs again.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import signal
+import socket
+from types import FrameType
+
+from ukrdc_fastapi.config import settings
+from ukrdc_fastapi.dependencies import get_root_task_tracker
+from ukrdc_fastapi.dependencies.logging import configure_logging
+from ukrdc_fastapi.exceptions import TaskLockError
+from ukrdc_fastapi.utils.tasks import (
+    PROCESSING_KEY_PREFIX,
+    QUEUE_KEY,
+    WORKER_ALIVE_PREFIX,
+    WORKERS_KEY,
+    TaskTracker,
+    TrackableTask,
+    get_job,
+)
+
+logger = logging.getLogger(__name__)
+
+# Modules registering jobs, imported by each worker process
+JOB_MODULES = ["ukrdc_fastapi.tasks.repeated"]
+
+
+async def run_job(tracker: TaskTracker, payload: str | bytes) -> None:
+    """Run a single queued job, tracking its status
+
+    Args:
+        tracker (TaskTracker): Root task tracker
+        payload (str | bytes): Queued job, as added by `TaskTracker.enqueue`
+    """
+    queued = json.loads(payload)
+    try:
+        func = get_job(queued["job"])
+    except KeyError:
+        logger.error(f"Dropping queued task for unknown job {queued['job']}")
+        tracker.fail_queued(queued["task"], f"Unknown job {queued['job']}")
+        return
+
+    task = TrackableTask(
+        task_redis=tracker.task_redis,
+        lock_redis=tracker.lock_redis,
+        user=tracker.user,
+        func=func,
+        restore=queued["task"],
+    )
+    try:
+        task._reclaim()
+    except TaskLockError as e:
+        logger.error(f"[{task.id}] Dropping queued task {task.name}: {e}")
+        tracker.fail_queued(queued["task"], str(e))
+        return
+    await task.tracked(**queued["kwargs"])
+
+
+class Worker:
+    """Single worker process, running queued jobs one at a time"""
+
+    def __init__(self, slot: int, tracker: TaskTracker | None = None) -> None:
+        self.tracker = tracker or get_root_task_tracker()
+        worker_id = f"{socket.gethostname()}:{slot}"
+        self.processing_key = f"{PROCESSING_KEY_PREFIX}{worker_id}"
+        self.alive_key = f"{WORKER_ALIVE_PREFIX}{worker_id}"
+        self.stopping = False
+
+    def stop(self, *_: int | FrameType | None) -> None:
+        """Finish the current job, then exit"""
+        self.stopping = True
+
+    def _beat(self) -> None:
+        """Record that this worker is alive, so its jobs aren't queued again"""
+        pipe = self.tracker.task_redis.pipeline()
+        pipe.set(self.alive_key, 1, ex=settings.redis_tasks_heartbeat_timeout)
+        pipe.sadd(WORKERS_KEY, self.processing_key)
+        pipe.execute()
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(settings.redis_tasks_heartbeat_seconds)
+            self._beat()
+
+    async def _run(self, payload: str | bytes) -> None:
+        if isinstance(payload, bytes):
+            payload = payload.decode()
+        try:
+            await run_job(self.tracker, payload)
+        finally:
+            self.tracker.task_redis.lrem(self.processing_key, 1, payload)
+
+    async def run(self) -> None:
+        """Run queued jobs until stopped"""
+        task_redis = self.tracker.task_redis
+
+        self._beat()
+        heartbeat = asyncio.ensure_future(self._heartbeat())
+        try:
+            # Resume jobs interrupted when this worker slot last stopped
+            for interrupted in task_redis.lrange(self.processing_key, 0, -1):
+                logger.info("Resuming interrupted job")
+                await self._run(interrupted)
+
+            while not self.stopping:
+                # Atomically move the oldest job to our processing list
+                payload = task_redis.blmove(
+                    QUEUE_KEY,
+                    self.processing_key,
+                    settings.worker_poll_seconds,
+                    src="RIGHT",
+                    dest="LEFT",
+                )
+                if payload:
+                    await self._run(payload)
+        finally:
+            heartbeat.cancel()
+            # Our processing list is empty, unless we were interrupted
+            task_redis.delete(self.alive_key)
+
+
+def _worker_main(slot: int) -> None:
+    configure_logging()
+    for module in JOB_MODULES:
+        importlib.import_module(module)
+
+    worker = Worker(slot)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    logger.info(f"Worker {slot} waiting for jobs")
+    asyncio.run(worker.run())
+    logger.info(f"Worker {slot} stopped")
+
+
+def main() -> None:
+    """Start worker processes, and wait for them to finish"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.worker_concurrency,
+        help="Number of worker processes",
+    )
+    args = parser.parse_args()
+
+    if settings.redis_backend == "memory":
+        parser.error("Workers need a shared Redis backend, not the in-memory backend")
+
+    processes = [
+        multiprocessing.Process(
+            target=_worker_main, args=(slot,), name=f"worker-{slot}"
+        )
+        for slot in range(args.concurrency)
+    ]
+    for process in processes:
+        process.start()
+
+    def _stop(*_: int | FrameType | None) -> None:
+        for process in processes:
+            process.terminate()
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()